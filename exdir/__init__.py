@@ -1,7 +1,7 @@
 from . import core
 from . import plugin_interface
 from . import plugins
-from .core import File, validation, Attribute, Dataset, Group, Raw, Object
+from .core import File, validation, Attribute, Dataset, Group, Raw, Object, RaggedDataset, Table, SparseDataset, watch
 
 # TODO remove versioneer
 from . import _version
@@ -9,5 +9,9 @@ from .exdir_object import Object
 from .exdir_file import File
 from .attribute import Attribute
 from .dataset import Dataset
+from .ragged_dataset import RaggedDataset
+from .table import Table
+from .sparse_dataset import SparseDataset
 from .group import Group
 from .raw import Raw
+from .watcher import watch
@@ -0,0 +1,115 @@
+"""
+Access pattern hints for the data files of datasets.
+
+The hints are passed to the operating system with :code:`madvise` for
+memory maps and :code:`posix_fadvise` for the files themselves.
+They only affect performance, so hints that are not supported by the
+platform are ignored.
+
+- :code:`"normal"`: the default heuristics.
+- :code:`"sequential"`: the data will be read in order, so it can be read
+  ahead aggressively and dropped soon after it is read.
+- :code:`"random"`: the data will be read in no particular order, so
+  reading ahead is wasted.
+- :code:`"willneed"`: the data will be read soon and should be read into
+  memory in the background.
+- :code:`"dontneed"`: the data will not be read again soon, so it can be
+  dropped from memory.
+  Written data is written back first so that it can be dropped, which
+  keeps streaming writes from evicting other cached data.
+"""
+
+import mmap
+import os
+
+from . import flusher
+
+ADVICE = ["normal", "sequential", "random", "willneed", "dontneed"]
+
+_MADVISE = {
+    "normal": "MADV_NORMAL",
+    "sequential": "MADV_SEQUENTIAL",
+    "random": "MADV_RANDOM",
+    "willneed": "MADV_WILLNEED",
+    "dontneed": "MADV_DONTNEED",
+}
+
+_FADVISE = {
+    "normal": "POSIX_FADV_NORMAL",
+    "sequential": "POSIX_FADV_SEQUENTIAL",
+    "random": "POSIX_FADV_RANDOM",
+    "willneed": "POSIX_FADV_WILLNEED",
+    "dontneed": "POSIX_FADV_DONTNEED",
+}
+
+
+def assert_valid_advice(advice):
+    if advice not in ADVICE:
+        raise ValueError(
+            "Advice {} not recognized, advice must be one of {}".format(advice, ADVICE)
+        )
+
+
+def advise_file(path, advice, offset=0, length=0, written=False):
+    """
+    Give `advice` for the bytes `offset` to `offset + length` of the file
+    at `path`, or the rest of the file if `length` is 0.
+    If `written` is True and the advice is :code:`"dontneed"`, the range is
+    written back first.
+    """
+    assert_valid_advice(advice)
+    constant = getattr(os, _FADVISE[advice], None)
+    if constant is None or not hasattr(os, "posix_fadvise"):
+        return
+    descriptor = os.open(str(path), os.O_RDONLY)
+    try:
+        if advice == "dontneed" and written:
+            # only clean pages can be dropped
+            flusher.sync_range(descriptor, offset, length)
+        os.posix_fadvise(descriptor, offset, length, constant)
+    finally:
+        os.close(descriptor)
+
+
+def advise_memmap(memmap, advice, start=0, stop=None):
+    """
+    Give `advice` for the bytes `start` to `stop` of the data in the
+    NumPy memory map `memmap`.
+    """
+    assert_valid_advice(advice)
+    map_object = getattr(memmap, "_mmap", None)
+    constant = getattr(mmap, _MADVISE[advice], None)
+    if map_object is None or constant is None or not hasattr(map_object, "madvise"):
+        return
+    if stop is None:
+        stop = memmap.nbytes
+    if stop <= start:
+        return
+    # NumPy maps from the closest multiple of the allocation granularity
+    # before the data
+    data_offset = memmap.offset % mmap.ALLOCATIONGRANULARITY
+    first = data_offset + start
+    first -= first % mmap.PAGESIZE
+    last = min(data_offset + stop, len(map_object))
+    map_object.madvise(constant, first, last - first)
+
+
+def advise(memmap, path, advice, first_row=0, last_row=None):
+    """
+    Give `advice` for the rows `first_row` to `last_row` of `memmap`, which
+    maps the file at `path`, both to the memory map and the file.
+    """
+    if memmap.ndim > 0 and memmap.flags.c_contiguous:
+        if last_row is None:
+            last_row = memmap.shape[0]
+        start = first_row * memmap.strides[0]
+        stop = last_row * memmap.strides[0]
+    else:
+        start, stop = 0, memmap.nbytes
+    if stop <= start:
+        return
+    advise_memmap(memmap, advice, start, stop)
+    advise_file(
+        path, advice, memmap.offset + start, stop - start,
+        written=memmap.flags.writeable
+    )
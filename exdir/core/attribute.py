@@ -1,4 +1,5 @@
 from enum import Enum
+import io
 import exdir
 try:
     import ruamel_yaml as yaml
@@ -70,15 +71,19 @@ class Attribute:
             return attrs
 
     def __setitem__(self, name, value):
-        attrs = self._open_or_create()
-        key = name
-        sub_attrs = attrs
+        assert_file_writable(self.file)
+        # packed datasets are moved to their own folder, which holds the lock
+        self.parent._ensure_directory()
+        with self.file._locks.exclusive(self.parent.directory):
+            attrs = self._open_or_create()
+            key = name
+            sub_attrs = attrs
 
-        for i in self.path:
-            sub_attrs = sub_attrs[i]
-        sub_attrs[key] = value
+            for i in self.path:
+                sub_attrs = sub_attrs[i]
+            sub_attrs[key] = value
 
-        self._set_data(attrs)
+            self._set_data(attrs)
 
     def __contains__(self, name):
         if self.file.io_mode == OpenMode.FILE_CLOSED:
@@ -144,6 +149,7 @@ class Attribute:
 
     def _set_data(self, attrs):
         assert_file_writable(self.file)
+        self.parent._ensure_directory()
         plugins = self.file.plugin_manager.attribute_plugins.write_order
 
         if self.mode == self._Mode.ATTRIBUTES and len(plugins) > 0:
@@ -163,19 +169,30 @@ class Attribute:
         else:
             attribute_data_quoted = attrs
 
-        with self.filename.open("w", encoding="utf-8") as attribute_file:
-            yaml.YAML(typ="rt", pure=True).dump(
-                attribute_data_quoted,
-                attribute_file,
-            )
+        storage = self.file._storage
+        with io.StringIO() as buffer:
+            yaml.YAML(typ="rt", pure=True).dump(attribute_data_quoted, buffer)
+            text = buffer.getvalue()
+        with self.file._locks.exclusive(self.parent.directory):
+            # replaced at once, so that reads need no lock
+            storage.write_text(self.filename, text)
+        # the file is new after the replace, so its folder is synced too
+        self.file._syncer.written(self.filename, created=True)
 
     # TODO only needs filename, make into free function
     def _open_or_create(self):
         assert_file_open(self.file)
         attrs = {}
-        if self.filename.exists():  # NOTE str for Python 3.5 support
-            with self.filename.open("r", encoding="utf-8") as meta_file:
-                attrs = yaml.YAML(typ="safe", pure=True).load(meta_file)
+        storage = self.file._storage
+        with self.file._locks.shared(self.parent.directory):
+            if storage.exists(self.filename):
+                with storage.open(self.filename, "r") as meta_file:
+                    attrs = yaml.YAML(typ="safe", pure=True).load(meta_file)
+                return attrs
+        if self.mode == self._Mode.METADATA and getattr(self.parent, "_packed", False):
+            # packed datasets only have the default metadata
+            from .exdir_object import _default_metadata, DATASET_TYPENAME
+            attrs = _default_metadata(DATASET_TYPENAME)
         return attrs
 
     def __iter__(self):
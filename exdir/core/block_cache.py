@@ -0,0 +1,189 @@
+"""
+Cache of recently read blocks of data files.
+
+Datasets that are not memory-mapped read from storage on every indexing
+operation.
+Interactive use often reads overlapping windows of the same data again and
+again, so the blocks that were read are kept in a cache with a limited
+size, and the least recently used blocks are dropped first.
+
+Blocks are keyed by the file they belong to and their position in the
+file, so that all datasets stored in a file share the cached blocks.
+Writes invalidate the blocks they touch.
+"""
+
+import collections
+import threading
+
+import numpy as np
+
+
+class BlockCache:
+    """
+    A least recently used cache of fixed-size blocks of files.
+
+    Parameters
+    ----------
+    max_bytes: int
+        The maximum number of bytes kept in the cache.
+    block_bytes: int
+        The size of each block.
+        Blocks start at multiples of the block size in the file.
+    """
+    def __init__(self, max_bytes, block_bytes=1 << 20):
+        if max_bytes <= 0:
+            raise ValueError("Cache size must be positive, got {}".format(max_bytes))
+        if block_bytes <= 0:
+            raise ValueError("Cache block size must be positive, got {}".format(block_bytes))
+        self.max_bytes = max_bytes
+        self.block_bytes = block_bytes
+        self.cached_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # (filename, block index) -> bytes of the block
+        self._blocks = collections.OrderedDict()
+        # filename -> block indices in the cache
+        self._files = {}
+        # increased by every invalidation, so that blocks read before an
+        # invalidation are not cached after it
+        self._generation = 0
+        # filename -> generation of its last invalidation
+        self._invalidated = {}
+        self._cleared = 0
+        self._lock = threading.Lock()
+
+    def _file_generation(self, filename):
+        return max(self._invalidated.get(filename, 0), self._cleared)
+
+    def _insert(self, filename, index, block):
+        key = (filename, index)
+        old = self._blocks.pop(key, None)
+        if old is not None:
+            self.cached_bytes -= len(old)
+        self._blocks[key] = block
+        self._files.setdefault(filename, set()).add(index)
+        self.cached_bytes += len(block)
+        while self.cached_bytes > self.max_bytes and len(self._blocks) > 0:
+            (old_filename, old_index), old = self._blocks.popitem(last=False)
+            self._files[old_filename].discard(old_index)
+            self.cached_bytes -= len(old)
+            self.evictions += 1
+
+    def read(self, filename, start, stop, read_range):
+        """
+        Read the bytes `start` to `stop` of `filename`.
+
+        Blocks that are not in the cache are read with
+        `read_range(start, stop)`, which returns the bytes between two
+        positions in the file, with one call for each run of missing
+        blocks.
+        Reads larger than half the cache are not cached.
+
+        Returns
+        -------
+        numpy.ndarray
+            The bytes, as an array of :code:`uint8`.
+        """
+        if stop <= start:
+            return np.zeros(0, dtype=np.uint8)
+        if 2 * (stop - start) > self.max_bytes:
+            with self._lock:
+                self.misses += 1
+            return read_range(start, stop)
+
+        size = self.block_bytes
+        first = start // size
+        last = -(-stop // size)
+        blocks = {}
+        missing = []
+        with self._lock:
+            generation = self._file_generation(filename)
+            for index in range(first, last):
+                block = self._blocks.get((filename, index))
+                if block is None:
+                    missing.append(index)
+                else:
+                    self._blocks.move_to_end((filename, index))
+                    blocks[index] = block
+            self.hits += last - first - len(missing)
+            self.misses += len(missing)
+
+        # read each run of consecutive missing blocks at once
+        runs = []
+        for index in missing:
+            if len(runs) > 0 and runs[-1][1] == index:
+                runs[-1][1] = index + 1
+            else:
+                runs.append([index, index + 1])
+        for run_first, run_last in runs:
+            data = read_range(run_first * size, run_last * size)
+            with self._lock:
+                # the blocks may have been written while they were read
+                current = self._file_generation(filename) == generation
+                for index in range(run_first, run_last):
+                    block = data[(index - run_first) * size:(index - run_first + 1) * size]
+                    block = block.copy()
+                    blocks[index] = block
+                    if current and len(block) == size:
+                        # partial blocks at the end of a file may grow
+                        self._insert(filename, index, block)
+
+        result = np.concatenate([blocks[index] for index in range(first, last)])
+        return result[start - first * size:stop - first * size]
+
+    def invalidate(self, filename, start=None, stop=None):
+        """
+        Drop the cached blocks of `filename` that overlap the bytes `start`
+        to `stop`, or all its blocks if no range is given.
+        """
+        filename = str(filename)
+        with self._lock:
+            self._generation += 1
+            self._invalidated[filename] = self._generation
+            indices = self._files.get(filename)
+            if not indices:
+                return
+            if start is None:
+                dropped = list(indices)
+            else:
+                first = start // self.block_bytes
+                last = -(-stop // self.block_bytes)
+                dropped = [index for index in indices if first <= index < last]
+            for index in dropped:
+                block = self._blocks.pop((filename, index), None)
+                if block is not None:
+                    self.cached_bytes -= len(block)
+                indices.discard(index)
+            self.invalidations += len(dropped)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._cleared = self._generation
+            self._invalidated.clear()
+            self._blocks.clear()
+            self._files.clear()
+            self.cached_bytes = 0
+
+    def statistics(self):
+        """
+        Counters of the cache.
+
+        Returns
+        -------
+        dict
+            The number of block :code:`hits` and :code:`misses`, the number
+            of blocks dropped to stay within the size (:code:`evictions`)
+            and because they were written to (:code:`invalidations`),
+            and the number of :code:`cached_bytes`.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "cached_bytes": self.cached_bytes
+            }
@@ -0,0 +1,172 @@
+"""
+Summary statistics of blocks of rows in a dataset.
+
+The statistics of each block of `block_size` rows along the first axis are
+stored in a separate NumPy file in the dataset folder.
+Statistics of a range of rows are combined from the stored blocks that are
+fully covered by the range, so only the partially covered blocks at the
+edges of the range need to be read from the dataset itself.
+"""
+
+import numpy as np
+
+from . import npy
+
+STATS_FILENAME = "stats.npy"
+STATS_METANAME = "block_stats"
+BLOCK_SIZE_METANAME = "block_size"
+
+STATS_DTYPE = np.dtype([
+    ("min", np.float64),
+    ("max", np.float64),
+    ("sum", np.float64),
+    ("count", np.int64),
+    ("nan_count", np.int64),
+])
+
+
+def stats_filename(dataset_directory):
+    return dataset_directory / STATS_FILENAME
+
+
+def _assert_numeric(data):
+    if len(data.shape) == 0:
+        raise ValueError("Cannot compute block statistics of a scalar dataset")
+    if not (np.issubdtype(data.dtype, np.integer) or
+            np.issubdtype(data.dtype, np.floating) or
+            np.issubdtype(data.dtype, np.bool_)):
+        raise ValueError(
+            "Cannot compute block statistics of data type {}".format(data.dtype)
+        )
+
+
+def _summarize(values):
+    values = np.asarray(values, dtype=np.float64).ravel()
+    nan = np.isnan(values)
+    nan_count = int(np.count_nonzero(nan))
+    if nan_count > 0:
+        values = values[~nan]
+    if len(values) == 0:
+        return (np.nan, np.nan, 0.0, 0, nan_count)
+    return (values.min(), values.max(), values.sum(), len(values), nan_count)
+
+
+def _compute(data, block_size, first, last):
+    """
+    Compute the statistics of blocks `first` to `last` of `data`.
+    """
+    result = np.zeros(max(last - first, 0), dtype=STATS_DTYPE)
+    for i, block in enumerate(range(first, last)):
+        result[i] = _summarize(data[block * block_size:(block + 1) * block_size])
+    return result
+
+
+def build(dataset_directory, data, block_size):
+    """
+    Write the statistics of all blocks of `data`.
+    """
+    _assert_numeric(data)
+    if block_size < 1:
+        raise ValueError("Block size must be positive, got {}".format(block_size))
+    count = -(-len(data) // block_size)
+    npy.write(stats_filename(dataset_directory), _compute(data, block_size, 0, count))
+
+
+def update(dataset_directory, data, block_size, start, stop):
+    """
+    Update the statistics after the rows `start` to `stop` of `data` have
+    been written or appended.
+    """
+    filename = stats_filename(dataset_directory)
+    stats = np.load(str(filename), mmap_mode="r+", allow_pickle=False)
+    existing = len(stats)
+
+    first = start // block_size
+    last = min(-(-stop // block_size), existing)
+    if first < last:
+        stats[first:last] = _compute(data, block_size, first, last)
+        stats.flush()
+    del stats
+
+    count = -(-len(data) // block_size)
+    if count > existing:
+        npy.append(filename, _compute(data, block_size, existing, count))
+
+
+def _combine(blocks):
+    if len(blocks) == 0:
+        return (np.nan, np.nan, 0.0, 0, 0)
+    counted = blocks[blocks["count"] > 0]
+    if len(counted) == 0:
+        minimum = maximum = np.nan
+    else:
+        minimum = counted["min"].min()
+        maximum = counted["max"].max()
+    return (
+        minimum,
+        maximum,
+        blocks["sum"].sum(),
+        blocks["count"].sum(),
+        blocks["nan_count"].sum()
+    )
+
+
+def _to_dict(summary):
+    minimum, maximum, total, count, nan_count = summary
+    return {
+        "min": float(minimum),
+        "max": float(maximum),
+        "sum": float(total),
+        "count": int(count),
+        "nan_count": int(nan_count),
+        "mean": float(total) / count if count > 0 else np.nan
+    }
+
+
+def _rows(selection, length):
+    if selection is None:
+        return 0, length
+    if isinstance(selection, slice):
+        start, stop, step = selection.indices(length)
+        if step == 1:
+            return start, max(start, stop)
+    raise ValueError(
+        "Block statistics can only be computed for a contiguous range of rows, "
+        "got {}".format(selection)
+    )
+
+
+def compute(dataset_directory, data, block_size, selection=None):
+    """
+    Compute the statistics of the rows in `selection`.
+
+    If `block_size` is None, the statistics are computed directly from
+    `data`.
+
+    Returns
+    -------
+    dict
+        The minimum, maximum, sum, mean, count and nan count of the values,
+        where NaN values are not included in the count.
+    """
+    _assert_numeric(data)
+    start, stop = _rows(selection, len(data))
+    if block_size is None:
+        return _to_dict(_summarize(data[start:stop]))
+
+    first_full = -(-start // block_size)
+    last_full = stop // block_size
+    if first_full >= last_full:
+        return _to_dict(_summarize(data[start:stop]))
+
+    stats = np.load(
+        str(stats_filename(dataset_directory)),
+        mmap_mode="r",
+        allow_pickle=False
+    )
+    parts = np.array([
+        _summarize(data[start:first_full * block_size]),
+        _combine(np.asarray(stats[first_full:last_full])),
+        _summarize(data[last_full * block_size:stop])
+    ], dtype=STATS_DTYPE)
+    return _to_dict(_combine(parts))
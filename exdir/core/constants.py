@@ -7,8 +7,14 @@ VERSION_METANAME = "version"
 META_FILENAME = "exdir.yaml"
 ATTRIBUTES_FILENAME = "attributes.yaml"
 RAW_FOLDER_NAME = "__raw__"
+PACK_INDEX_FILENAME = "__pack__.index"
+# prefix of the hidden folders that transactions are built in
+STAGING_PREFIX = ".exdir-staging."
 
 # typenames
 DATASET_TYPENAME = "dataset"
 GROUP_TYPENAME = "group"
+RAGGED_DATASET_TYPENAME = "ragged_dataset"
+TABLE_TYPENAME = "table"
+SPARSE_DATASET_TYPENAME = "sparse_dataset"
 FILE_TYPENAME = "file"
@@ -1,8 +1,20 @@
 import numbers
+import os
+import time
+
 import numpy as np
 import exdir
 
 from . import exdir_object as exob
+from . import npy
+from . import sorted_index
+from . import block_stats
+from . import pyramid
+from . import pack
+from . import advice as access_advice
+from . import pread
+from . import parallel_write
+from . import sync
 from .mode import assert_file_open, OpenMode, assert_file_writable
 
 def _prepare_write(data, plugins, attrs, meta):
@@ -24,8 +36,39 @@ def _prepare_write(data, plugins, attrs, meta):
     return data, attrs, meta
 
 
+DATA_FILENAME = "data.npy"
+
+
 def _dataset_filename(dataset_directory):
-    return dataset_directory / "data.npy"
+    return dataset_directory / DATA_FILENAME
+
+
+def _first_axis_range(args, length):
+    """
+    Find the range of rows along the first axis that is touched by
+    indexing with `args`.
+    """
+    if isinstance(args, tuple):
+        if len(args) == 0:
+            return 0, length
+        args = args[0]
+    if isinstance(args, numbers.Integral):
+        index = int(args) + length if args < 0 else int(args)
+        return index, index + 1
+    if isinstance(args, slice):
+        rows = range(*args.indices(length))
+        if len(rows) == 0:
+            return 0, 0
+        return min(rows[0], rows[-1]), max(rows[0], rows[-1]) + 1
+    if isinstance(args, (list, np.ndarray)):
+        rows = np.asarray(args)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        if rows.size == 0:
+            return 0, 0
+        rows = np.where(rows < 0, rows + length, rows)
+        return int(rows.min()), int(rows.max()) + 1
+    return 0, length
 
 
 class Dataset(exob.Object):
@@ -36,15 +79,28 @@ class Dataset(exob.Object):
     --------
         This class modifies the view and it is possible to overwrite
         an existing dataset, which is different from the behavior in h5py.
+
+    Note
+    ----
+        A small dataset may be stored in the pack file of its group instead
+        of in its own folder, see the `pack_threshold` option of
+        :class:`.File`.
+        It is moved to its own folder as soon as it needs one, for instance
+        when attributes are set or its shape is changed.
     """
-    def __init__(self, root_directory, parent_path, object_name, file):
+    def __init__(self, root_directory, parent_path, object_name, file, packed=False):
         super(Dataset, self).__init__(
             root_directory=root_directory,
             parent_path=parent_path,
             object_name=object_name,
             file=file
         )
+        self._packed = packed
+        self._advice = None
         self._data_memmap = None
+        # the data file that is opened, to detect that it is replaced
+        self._data_inode = None
+        self._refreshed = 0.0
         self.plugin_manager = file.plugin_manager
         self.data_filename = str(_dataset_filename(self.directory))
 
@@ -52,6 +108,8 @@ class Dataset(exob.Object):
         assert_file_open(self.file)
         if len(self._data.shape) == 0:
             values = self._data
+            if isinstance(values, pread.PreadArray):
+                values = values[...]
         else:
             values = self._data[args]
 
@@ -88,32 +146,329 @@ class Dataset(exob.Object):
     def __setitem__(self, args, value):
         assert_file_writable(self.file)
 
+        plugins = self.plugin_manager.dataset_plugins.write_order
+        meta = self.meta.to_dict()
+        if len(plugins) > 0:
+            value, attrs, meta = _prepare_write(
+                data=value,
+                plugins=plugins,
+                attrs=self.attrs.to_dict(),
+                meta=meta
+            )
+        data = self._data
+        if isinstance(data, pread.PreadArray):
+            # writes of parts of rows read, change and write back the
+            # whole rows, which would undo the writes of other threads
+            with self.file._locks.local(self.directory):
+                data[args] = value
+        else:
+            data[args] = value
+        self.file._syncer.memmap_written(data, self._memmap_filename())
+        if len(plugins) > 0:
+            # only plugins can change the attributes and metadata
+            self.attrs = attrs
+            self.meta._set_data(meta)
+
+        if len(data.shape) > 0:
+            start, stop = _first_axis_range(args, data.shape[0])
+        else:
+            start, stop = 0, 1
+        if self.file._flusher is not None:
+            self.file._flusher.memmap_written(data, self._memmap_filename(), start, stop)
+        if self._current_advice() == "dontneed":
+            access_advice.advise(data, self._memmap_filename(), "dontneed", start, stop)
+        if len(data.shape) > 0:
+            with self.file._locks.local(self.directory):
+                self._update_derived(meta, start, stop)
+
+    def append(self, value):
+        """
+        Append rows to the dataset along the first axis.
+
+        The data file is grown in place, so existing data is not rewritten.
+
+        Parameters
+        ----------
+        value: list or numpy.array
+            The new rows. All axes except the first must match the dataset.
+        """
+        assert_file_writable(self.file)
+        if len(self._data.shape) == 0:
+            raise TypeError("Cannot append to a scalar dataset")
+        self._ensure_directory()
+
         value, attrs, meta = _prepare_write(
             data=value,
             plugins=self.plugin_manager.dataset_plugins.write_order,
             attrs=self.attrs.to_dict(),
             meta=self.meta.to_dict()
         )
-        self._data[args] = value
-        self.attrs = attrs
-        self.meta._set_data(meta)
+        value = np.asarray(value)
+        # rows appended by other threads are not interleaved
+        with self.file._locks.local(self.directory):
+            if sorted_index.INDEX_METANAME in meta:
+                sorted_index.assert_sorted_append(self._data, value)
+
+            start = self._data.shape[0]
+            storage = self.file._storage
+            size = storage.size(self.data_filename)
+            # the data is replaced when the storage cannot grow it in place
+            self._release_data()
+            storage.append_array(self.data_filename, value)
+            if self.file._block_cache is not None:
+                # the header is rewritten as well
+                self.file._block_cache.invalidate(self.data_filename)
+            self.file._syncer.written(self.data_filename)
+            new_size = storage.size(self.data_filename)
+            if self.file._flusher is not None:
+                self.file._flusher.written(self.data_filename, size, new_size)
+            if self._current_advice() == "dontneed":
+                access_advice.advise_file(
+                    self.data_filename, "dontneed", size, new_size - size, written=True
+                )
+            self.attrs = attrs
+            self.meta._set_data(meta)
+            self._update_derived(meta, start, self._data.shape[0])
 
-    def _reload_data(self):
+    def open_for_parallel_write(self):
+        """
+        Open the dataset for writes to disjoint parts of it from several
+        processes, for instance one channel per worker of a process pool.
+
+        Workers write to the returned handle like to the dataset, but
+        without reading or writing metadata or attributes on each write.
+        The process that opened the handle calls its :code:`commit` once
+        all workers are done, to sync the data, update the index,
+        statistics and levels of the dataset and set attributes.
+
+        Returns
+        -------
+        exdir.core.parallel_write.ParallelWriter
+        """
+        assert_file_writable(self.file)
+        exob._assert_local_storage(self.file, "Parallel writes")
+        if len(self.plugin_manager.dataset_plugins.write_order) > 0:
+            raise ValueError(
+                "Parallel writes are not supported with dataset plugins, "
+                "which may change the data or metadata on each write"
+            )
+        if len(self._data.shape) == 0:
+            raise TypeError("Cannot write to a scalar dataset in parallel")
+        self._ensure_directory()
+        with self.file._locks.local(self.directory):
+            # the data is written where it is, also in SWMR mode
+            inode = os.stat(self.data_filename).st_ino
+            return parallel_write.ParallelWriter(self, inode)
+
+    def _commit_parallel_write(self, writer, attrs):
+        assert_file_writable(self.file)
+        with self.file._locks.local(self.directory):
+            writer._assert_unchanged()
+            if self.file._block_cache is not None:
+                self.file._block_cache.invalidate(self.data_filename)
+            if self.file._syncer.mode != "none":
+                # synced now, whatever the mode, since the commit marks the
+                # end of the writes
+                sync.fsync_path(self.data_filename)
+            # the rows written by the workers are not known
+            self._rebuild_derived(self.meta.to_dict())
+        if attrs:
+            attributes = self.attrs
+            with self.file._locks.exclusive(self.directory):
+                values = attributes._open_or_create()
+                values.update(attrs)
+                attributes._set_data(values)
+
+    def _update_derived(self, meta, start, stop):
+        """
+        Update the data stored alongside the dataset after the rows
+        `start` to `stop` have been written.
+        """
+        if start >= stop:
+            return
+        if sorted_index.INDEX_METANAME in meta:
+            step = meta[sorted_index.INDEX_METANAME][sorted_index.STEP_METANAME]
+            sorted_index.update(self.directory, self._data, step, start, stop)
+        if block_stats.STATS_METANAME in meta:
+            block_size = meta[block_stats.STATS_METANAME][block_stats.BLOCK_SIZE_METANAME]
+            block_stats.update(self.directory, self._data, block_size, start, stop)
+        if pyramid.PYRAMID_METANAME in meta:
+            factors = meta[pyramid.PYRAMID_METANAME][pyramid.FACTORS_METANAME]
+            pyramid.update(self.directory, self._data, factors, start, stop)
+
+    def _rebuild_derived(self, meta):
+        """
+        Rebuild the data stored alongside the dataset after the entire
+        dataset has been replaced.
+        """
+        if sorted_index.INDEX_METANAME in meta:
+            step = meta[sorted_index.INDEX_METANAME][sorted_index.STEP_METANAME]
+            sorted_index.build(self.directory, self._data, step)
+        if block_stats.STATS_METANAME in meta:
+            block_size = meta[block_stats.STATS_METANAME][block_stats.BLOCK_SIZE_METANAME]
+            block_stats.build(self.directory, self._data, block_size)
+        if pyramid.PYRAMID_METANAME in meta:
+            factors = meta[pyramid.PYRAMID_METANAME][pyramid.FACTORS_METANAME]
+            pyramid.build(self.directory, self._data, factors)
+
+    def build_index(self, step=1024):
+        """
+        Build a sparse index of a one-dimensional dataset with values sorted
+        in increasing order, such as timestamps.
+
+        The index stores every `step`-th value in an index.npy file next to
+        the data and is kept up to date when the dataset is written to or
+        appended to.
+        It is used by :code:`time_slice` to find a range of values without
+        reading the entire dataset.
+
+        Parameters
+        ----------
+        step: int, optional
+            Number of rows between each value in the index.
+        """
+        assert_file_writable(self.file)
+        exob._assert_local_storage(self.file, "Sorted indexes")
+        self._ensure_directory()
+        sorted_index.build(self.directory, self._data, step)
+        self.meta[sorted_index.INDEX_METANAME] = {
+            sorted_index.STEP_METANAME: step
+        }
+
+    def time_bounds(self, start, stop):
+        """
+        Find the rows of a sorted dataset with values in the half-open
+        range from `start` to `stop`.
+
+        Uses the index built by :code:`build_index` if it exists.
+
+        Returns
+        -------
+        tuple
+            The first row with a value of at least `start` and the first row
+            with a value of at least `stop`.
+        """
         assert_file_open(self.file)
-        for plugin in self.plugin_manager.dataset_plugins.write_order:
-            plugin.before_load(self.data_filename)
+        meta = self.meta.to_dict()
+        step = None
+        # the derived files are not read from other storages, the data is
+        # searched instead
+        if sorted_index.INDEX_METANAME in meta and self.file._storage.local:
+            step = meta[sorted_index.INDEX_METANAME][sorted_index.STEP_METANAME]
+        return sorted_index.bounds(self.directory, self._data, step, start, stop)
+
+    def time_slice(self, start, stop):
+        """
+        Read the rows of a sorted dataset with values in the half-open
+        range from `start` to `stop`.
+
+        Equivalent to :code:`dataset[(dataset[:] >= start) & (dataset[:] < stop)]`,
+        but only reads the values needed to find the range.
+        See :code:`time_bounds` and :code:`build_index`.
+        """
+        first, last = self.time_bounds(start, stop)
+        return self[first:last]
 
+    def _ensure_directory(self):
+        """
+        Move a packed dataset out of the pack file of its group and into
+        its own folder.
+        """
+        if not self._packed:
+            return
+        assert_file_writable(self.file)
+        locks = self.file._locks
+        # the group is locked first, like when objects are created in it
+        with locks.exclusive(self.directory.parent), locks.local(self.directory):
+            if not self._packed:
+                return
+            if self.directory.exists():
+                # moved out of the pack by another handle
+                self._packed = False
+                self._release_data()
+                return
+            data = np.array(self._data)
+            group_pack = pack.get_pack(self.file, self.directory.parent)
+            exob._create_object_directory(
+                self.directory,
+                exob._default_metadata(exob.DATASET_TYPENAME),
+                self.file
+            )
+            self._packed = False
+            self._reset_data(data, None, None)
+            group_pack.remove(self.object_name)
+
+    def _reload_data(self):
+        """
+        Open the data and return the array, which is also kept until it is
+        released.
+        """
+        assert_file_open(self.file)
+        self._refreshed = time.monotonic()
         if self.file.io_mode == OpenMode.READ_ONLY:
             mmap_mode = "r"
         else:
             mmap_mode = "r+"
 
+        if self._packed and self.directory.exists():
+            # moved out of the pack by another handle
+            self._packed = False
+        elif (not self._packed and not self.directory.exists() and
+                pack.contains(self.file, self.directory.parent, self.object_name)):
+            # moved into the pack by Group.repack
+            self._packed = True
+
+        if self._packed:
+            group_pack = pack.get_pack(self.file, self.directory.parent)
+            if self.file.io_backend == "pread":
+                data = group_pack.pread(
+                    self.object_name, mmap_mode, cache=self.file._block_cache
+                )
+                self._data_memmap = data
+                self.file._open_maps.add(self, 1, 0)
+            else:
+                data = group_pack.memmap(self.object_name, mmap_mode)
+                self._data_memmap = data
+                self.file._open_maps.add(self, 1, data.nbytes)
+            self._apply_advice(data)
+            return data
+
+        for plugin in self.plugin_manager.dataset_plugins.write_order:
+            plugin.before_load(self.data_filename)
+
+        if self.file._storage.local:
+            # before opening, so that a file replaced in between is
+            # detected by the next refresh
+            self._data_inode = os.stat(self.data_filename).st_ino
         try:
-            self._data_memmap = np.load(self.data_filename, mmap_mode=mmap_mode, allow_pickle=False)
-            self.file._open_datasets[self.name] = self
+            if self.file.io_backend == "pread":
+                # nothing is mapped, but the open file counts towards
+                # the limit on open maps
+                data = pread.PreadArray(
+                    self.data_filename, mmap_mode, cache=self.file._block_cache,
+                    swmr=self.file.swmr
+                )
+                self._data_memmap = data
+                self.file._open_maps.add(self, 1, 0)
+            elif self.file.swmr:
+                data = npy.open_committed_memmap(self.data_filename, mmap_mode)
+                self._data_memmap = data
+                self.file._open_maps.add(self, 1, data.nbytes)
+            else:
+                data = self.file._storage.load_array(
+                    self.data_filename, mmap_mode, cache=self.file._block_cache
+                )
+                mapped_bytes = data.nbytes
+                if isinstance(data, pread.PreadArray):
+                    # read with requests, nothing is mapped
+                    mapped_bytes = 0
+                self._data_memmap = data
+                self.file._open_maps.add(self, 1, mapped_bytes)
+            self._apply_advice(data)
+            return data
         except ValueError as e:
             # Could be that it is a Git LFS file. Let's see if that is the case and warn if so.
-            with open(self.data_filename, "r", encoding="utf-8") as f:
+            with self.file._storage.open(self.data_filename, "r") as f:
                 test_string = "version https://git-lfs.github.com/spec/v1"
                 contents = f.read(len(test_string))
                 if contents == test_string:
@@ -125,28 +480,162 @@ class Dataset(exob.Object):
 
     def _reset_data(self, value, attrs, meta):
         assert_file_open(self.file)
-        self._data_memmap = np.lib.format.open_memmap(
-            self.data_filename,
-            mode="w+",
-            dtype=value.dtype,
-            shape=value.shape
-        )
+        if meta and sorted_index.INDEX_METANAME in meta:
+            # checked before the data is replaced, so that the data is never
+            # left next to an index of the old data
+            sorted_index.assert_indexable(np.asarray(value))
+        self._ensure_directory()
+        with self.file._locks.local(self.directory):
+            self._release_data()
+            if self.file._block_cache is not None:
+                self.file._block_cache.invalidate(self.data_filename)
+            if self.file.swmr:
+                # readers keep reading the file they have opened
+                npy.replace(self.data_filename, value)
+                self._data_inode = os.stat(self.data_filename).st_ino
+                if self.file.io_backend == "pread":
+                    data = pread.PreadArray(
+                        self.data_filename, "r+", cache=self.file._block_cache
+                    )
+                    self.file._open_maps.add(self, 1, 0)
+                else:
+                    data = npy.open_committed_memmap(self.data_filename, "r+")
+                    self.file._open_maps.add(self, 1, data.nbytes)
+                self._data_memmap = data
+            elif self.file.io_backend == "pread":
+                npy.write(self.data_filename, value)
+                data = pread.PreadArray(
+                    self.data_filename, "r+", cache=self.file._block_cache
+                )
+                self._data_memmap = data
+                self.file._open_maps.add(self, 1, 0)
+            else:
+                data = self.file._storage.save_array(self.data_filename, value)
+                self._data_memmap = data
+                self.file._open_maps.add(self, 1, data.nbytes)
+            self.file._syncer.memmap_written(data, self.data_filename)
+            self.file._syncer.written(self.data_filename, created=True)
+
+            # update attributes and plugin metadata
+            if attrs:
+                self.attrs = attrs
+
+            if meta:
+                self.meta._set_data(meta)
+                self._rebuild_derived(meta)
 
-        if len(value.shape) == 0:
-            # scalars need to be set with itemset
-            self._data_memmap.itemset(value)
-        else:
-            # replace the contents with the value
-            self._data_memmap[:] = value
+        return
 
-        # update attributes and plugin metadata
-        if attrs:
-            self.attrs = attrs
+    def build_stats(self, block_size=65536):
+        """
+        Store summary statistics of each block of `block_size` rows in a
+        stats.npy file next to the data.
 
-        if meta:
-            self.meta._set_data(meta)
+        The statistics are kept up to date when the dataset is written to
+        or appended to, and are used by :code:`stats` to summarize large
+        parts of the dataset without reading them.
 
-        return
+        Parameters
+        ----------
+        block_size: int, optional
+            Number of rows along the first axis in each block.
+        """
+        assert_file_writable(self.file)
+        exob._assert_local_storage(self.file, "Block statistics")
+        self._ensure_directory()
+        block_stats.build(self.directory, self._data, block_size)
+        self.meta[block_stats.STATS_METANAME] = {
+            block_stats.BLOCK_SIZE_METANAME: block_size
+        }
+
+    def stats(self, selection=None):
+        """
+        Summary statistics of a range of rows.
+
+        Uses the block statistics built by :code:`build_stats` if they
+        exist, in which case only the blocks that are partially covered
+        by `selection` are read from the dataset.
+
+        Parameters
+        ----------
+        selection: slice, optional
+            Contiguous range of rows along the first axis.
+            The entire dataset is used if not set.
+
+        Returns
+        -------
+        dict
+            The :code:`min`, :code:`max`, :code:`sum`, :code:`mean`,
+            :code:`count` and :code:`nan_count` of the values.
+            NaN values are ignored and counted in :code:`nan_count`.
+        """
+        assert_file_open(self.file)
+        meta = self.meta.to_dict()
+        block_size = None
+        if block_stats.STATS_METANAME in meta and self.file._storage.local:
+            block_size = meta[block_stats.STATS_METANAME][block_stats.BLOCK_SIZE_METANAME]
+        return block_stats.compute(self.directory, self._data, block_size, selection)
+
+    def build_pyramid(self, factors=(16, 256, 4096, 65536)):
+        """
+        Build downsampled levels of the dataset for fast overviews of long
+        signals.
+
+        Each level stores the minimum, maximum and mean of every bucket of
+        `factor` rows along the first axis in a pyramid_<factor>.npy file
+        next to the data.
+        The levels are kept up to date when the dataset is written to or
+        appended to, and are used by :code:`read_resolution`.
+
+        Parameters
+        ----------
+        factors: list of int, optional
+            Number of rows in each bucket for each level.
+            Levels are computed from the finest level their factor is a
+            multiple of.
+        """
+        assert_file_writable(self.file)
+        exob._assert_local_storage(self.file, "Pyramids")
+        self._ensure_directory()
+        meta = self.meta.to_dict()
+        old_factors = []
+        if pyramid.PYRAMID_METANAME in meta:
+            old_factors = meta[pyramid.PYRAMID_METANAME][pyramid.FACTORS_METANAME]
+        factors = pyramid.build(self.directory, self._data, factors, old_factors)
+        self.meta[pyramid.PYRAMID_METANAME] = {
+            pyramid.FACTORS_METANAME: factors
+        }
+
+    def read_resolution(self, selection=None, max_points=10000):
+        """
+        Read a range of rows at a resolution suitable for displaying
+        `max_points` values.
+
+        Picks the coarsest level built by :code:`build_pyramid` that still
+        has at least `max_points` buckets in `selection`, or reads the data
+        itself if there is no such level.
+
+        Parameters
+        ----------
+        selection: slice, optional
+            Contiguous range of rows along the first axis.
+            The entire dataset is used if not set.
+        max_points: int, optional
+            The number of points needed by the caller.
+
+        Returns
+        -------
+        dict
+            The :code:`factor` of the chosen level, the first row of each
+            bucket in :code:`rows` and the :code:`min`, :code:`max` and
+            :code:`mean` of the rows in each bucket.
+        """
+        assert_file_open(self.file)
+        meta = self.meta.to_dict()
+        factors = None
+        if pyramid.PYRAMID_METANAME in meta and self.file._storage.local:
+            factors = meta[pyramid.PYRAMID_METANAME][pyramid.FACTORS_METANAME]
+        return pyramid.read(self.directory, self._data, factors, selection, max_points)
 
     def set_data(self, data):
         """
@@ -200,6 +689,8 @@ class Dataset(exob.Object):
         tuple
             The shape of the dataset.
         """
+        if len(self.plugin_manager.dataset_plugins.read_order) == 0:
+            return self._data.shape
         return self[:].shape
 
     @property
@@ -213,6 +704,8 @@ class Dataset(exob.Object):
         np.int64
             The size of the dataset.
         """
+        if len(self.plugin_manager.dataset_plugins.read_order) == 0:
+            return self._data.size
         return self[:].size
 
     @property
@@ -226,6 +719,8 @@ class Dataset(exob.Object):
         numpy.dtype
             The NumPy data type of the dataset.
         """
+        if len(self.plugin_manager.dataset_plugins.read_order) == 0:
+            return self._data.dtype
         return self[:].dtype
 
     @property
@@ -273,9 +768,133 @@ class Dataset(exob.Object):
         return "<Exdir Dataset {} shape {} dtype {}>".format(
             self.name, self.shape, self.dtype)
 
+    def advise(self, advice, selection=None):
+        """
+        Tell the operating system how the data will be accessed, so that
+        it can read ahead or drop data from memory accordingly.
+
+        Parameters
+        ----------
+        advice: str
+            One of
+
+            - 'normal': the default behavior.
+            - 'sequential': the data will be read in order.
+            - 'random': the data will be read in no particular order.
+            - 'willneed': the data will be read soon and is read into memory
+              in the background.
+            - 'dontneed': the data will not be read again soon and can be
+              dropped from memory.
+        selection: int, slice or list, optional
+            The rows along the first axis the advice applies to.
+            If not set, the advice applies to the whole dataset and is kept
+            when the data is mapped again, and 'dontneed' is also applied
+            to the rows written from now on, so that streaming writes do
+            not fill the memory with data that is not read again.
+            Overrides the `advice` option of :class:`.File`.
+        """
+        assert_file_open(self.file)
+        access_advice.assert_valid_advice(advice)
+        if not self.file._storage.local:
+            # there are no files to give advice for
+            return
+        data = self._data
+        first, last = 0, None
+        if selection is None:
+            self._advice = advice
+        elif len(data.shape) > 0:
+            first, last = _first_axis_range(selection, data.shape[0])
+        access_advice.advise(data, self._memmap_filename(), advice, first, last)
+
+    def _current_advice(self):
+        if not self.file._storage.local:
+            return None
+        if self._advice is not None:
+            return self._advice
+        return self.file.advice
+
+    def _apply_advice(self, data):
+        current = self._current_advice()
+        if current is not None and current != "dontneed":
+            access_advice.advise(data, self._memmap_filename(), current)
+
+    def _memmap_filename(self):
+        if self._packed:
+            return pack.get_pack(self.file, self.directory.parent).data_filename
+        return self.data_filename
+
+    def _release_data(self):
+        """
+        Drop the memory map of the data, which is mapped again on the
+        next access.
+
+        Takes no locks, since it is called when other objects are opened.
+        Arrays already returned to other threads stay valid.
+        """
+        if self._data_memmap is not None:
+            self._data_memmap = None
+            self.file._open_maps.remove(self)
+
+    def refresh(self):
+        """
+        Make the rows committed by a writer in another process since the
+        dataset was opened or last refreshed visible, see the `swmr` option
+        of :class:`.File`.
+
+        Only the header of the data file is read.
+        Arrays returned before the refresh keep their shape.
+
+        Returns
+        -------
+        bool
+            True if the dataset has new rows or new data.
+        """
+        assert_file_open(self.file)
+        with self.file._locks.local(self.directory):
+            self._refreshed = time.monotonic()
+            data = self._data_memmap
+            if data is None or self._packed or not self.file._storage.local:
+                # read from the current file on the next access
+                return False
+            inode = os.stat(self.data_filename).st_ino
+            _, shape, _, _, offset = npy.read_committed_header(self.data_filename)
+            if inode == self._data_inode and tuple(shape) == data.shape:
+                return False
+            if self.file._block_cache is not None:
+                if inode == self._data_inode:
+                    # blocks at the end may have been cached before the
+                    # rows in them were committed
+                    self.file._block_cache.invalidate(
+                        self.data_filename,
+                        offset + data.nbytes,
+                        self.file._storage.size(self.data_filename)
+                    )
+                else:
+                    self.file._block_cache.invalidate(self.data_filename)
+            # mapping the whole file again reads nothing that is already
+            # cached by the operating system
+            self._release_data()
+            self._reload_data()
+        return True
+
+    def _refresh_due(self):
+        interval = self.file.refresh_interval
+        return interval is not None and time.monotonic() - self._refreshed >= interval
+
     @property
     def _data(self):
         assert_file_open(self.file)
-        if self._data_memmap is None:
-            self._reload_data()
-        return self._data_memmap
+        # the array may be released by another thread at any time, so it
+        # is read once
+        data = self._data_memmap
+        if data is not None and self._refresh_due():
+            self.refresh()
+            data = self._data_memmap
+        if data is not None:
+            self.file._open_maps.touch(self)
+            return data
+        with self.file._locks.local(self.directory):
+            data = self._data_memmap
+            if data is None:
+                data = self._reload_data()
+        return data
@@ -0,0 +1,312 @@
+"""
+Local disk cache of metadata files and blocks of datasets read from remote
+or slow storage.
+
+Each entry is stored in a file named after the key of the object and its
+version, such as the ETag reported by a server or the modification time
+and size of a file, so that entries of objects that have changed are never
+used.
+Entries are written to a temporary file and renamed into place, so that
+processes sharing a cache folder never read partially written entries.
+
+The cache keeps within a size budget by removing the least recently used
+entries.
+The order of use is saved in a manifest in the cache folder when the cache
+is flushed, so that a new session starts with the entries of the previous
+one.
+"""
+
+import collections
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+MANIFEST_FILENAME = "manifest.json"
+
+
+class DiskCache:
+    """
+    A cache of objects and fixed-size blocks of objects in a local folder.
+
+    Parameters
+    ----------
+    directory: str
+        The folder of the cache, created if it does not exist.
+    block_bytes: int, optional
+        The size of the cached blocks of large objects.
+    max_bytes: int, optional
+        The maximum number of bytes kept in the cache.
+        Unlimited by default.
+    """
+    def __init__(self, directory, block_bytes=1 << 20, max_bytes=None):
+        if block_bytes <= 0:
+            raise ValueError("Cache block size must be positive, got {}".format(block_bytes))
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError("Cache size must be positive, got {}".format(max_bytes))
+        self.directory = pathlib.Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.block_bytes = block_bytes
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # relative path of each entry -> size, least recently used first
+        self._entries = collections.OrderedDict()
+        self.cached_bytes = 0
+        self._lock = threading.Lock()
+        self._load_manifest()
+
+    def _load_manifest(self):
+        try:
+            with open(str(self.directory / MANIFEST_FILENAME), "r") as manifest_file:
+                entries = json.load(manifest_file)["entries"]
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            entries = self._scan()
+        for name, size in entries:
+            self._entries[name] = size
+            self.cached_bytes += size
+
+    def _scan(self):
+        """
+        The entries in the cache folder, oldest first, for caches without
+        a valid manifest.
+        """
+        entries = []
+        for root, _, filenames in os.walk(str(self.directory)):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, str(self.directory))
+                if name == MANIFEST_FILENAME or filename.startswith("tmp"):
+                    continue
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, pathlib.Path(name).as_posix(), stat.st_size))
+        return [(name, size) for _, name, size in sorted(entries)]
+
+    def flush(self):
+        """
+        Save the manifest of the cache.
+        """
+        with self._lock:
+            entries = list(self._entries.items())
+        contents = json.dumps({"entries": entries}).encode("utf-8")
+        self._write(self.directory / MANIFEST_FILENAME, contents)
+
+    def _folder(self, key, version):
+        digest = hashlib.sha256("{}\0{}".format(key, version).encode("utf-8")).hexdigest()
+        return "{}/{}".format(digest[:2], digest[2:])
+
+    def _load(self, name):
+        try:
+            with open(str(self.directory / name), "rb") as entry_file:
+                contents = entry_file.read()
+        except FileNotFoundError:
+            with self._lock:
+                size = self._entries.pop(name, None)
+                if size is not None:
+                    self.cached_bytes -= size
+            return None
+        with self._lock:
+            size = self._entries.pop(name, None)
+            if size is None:
+                # written by another process sharing the cache
+                self.cached_bytes += len(contents)
+            self._entries[name] = len(contents)
+        return contents
+
+    def _write(self, filename, contents):
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        descriptor, temporary_filename = tempfile.mkstemp(dir=str(filename.parent))
+        with os.fdopen(descriptor, "wb") as entry_file:
+            entry_file.write(contents)
+        os.replace(temporary_filename, str(filename))
+
+    def _store(self, name, contents):
+        if self.max_bytes is not None and len(contents) > self.max_bytes:
+            return
+        self._write(self.directory / name, contents)
+        with self._lock:
+            size = self._entries.pop(name, None)
+            if size is not None:
+                self.cached_bytes -= size
+            self._entries[name] = len(contents)
+            self.cached_bytes += len(contents)
+            evicted = []
+            while self.max_bytes is not None and self.cached_bytes > self.max_bytes:
+                old_name, old_size = self._entries.popitem(last=False)
+                self.cached_bytes -= old_size
+                self.evictions += 1
+                evicted.append(old_name)
+        for old_name in evicted:
+            self._remove(old_name)
+
+    def _remove(self, name):
+        path = self.directory / name
+        try:
+            path.unlink()
+            path.parent.rmdir()
+            path.parent.parent.rmdir()
+        except OSError:
+            # already removed, or the folder still has other entries
+            pass
+
+    def get(self, key, version, fetch):
+        """
+        The contents of the object `key`, fetched with :code:`fetch()` if
+        they are not in the cache.
+        """
+        name = self._folder(key, version) + "/object"
+        contents = self._load(name)
+        if contents is not None:
+            self.hits += 1
+            return contents
+        self.misses += 1
+        contents = fetch()
+        self._store(name, contents)
+        return contents
+
+    def read(self, key, version, size, start, stop, read_range):
+        """
+        Read the bytes `start` to `stop` of the object `key` with `size`
+        bytes.
+
+        Blocks that are not in the cache are read with
+        `read_range(start, stop)`, with one call for each run of missing
+        blocks.
+        """
+        stop = min(stop, size)
+        if stop <= start:
+            return b""
+        block_bytes = self.block_bytes
+        first = start // block_bytes
+        last = -(-stop // block_bytes)
+        folder = self._folder(key, version)
+
+        def block_name(index):
+            return "{}/{}.{}".format(folder, block_bytes, index)
+        blocks = {}
+        missing = []
+        for index in range(first, last):
+            block = self._load(block_name(index))
+            if block is None:
+                missing.append(index)
+            else:
+                blocks[index] = block
+        self.hits += last - first - len(missing)
+        self.misses += len(missing)
+
+        runs = []
+        for index in missing:
+            if len(runs) > 0 and runs[-1][1] == index:
+                runs[-1][1] = index + 1
+            else:
+                runs.append([index, index + 1])
+        for run_first, run_last in runs:
+            run_start = run_first * block_bytes
+            data = read_range(run_start, min(run_last * block_bytes, size))
+            for index in range(run_first, run_last):
+                offset = (index - run_first) * block_bytes
+                block = bytes(data[offset:offset + block_bytes])
+                blocks[index] = block
+                self._store(block_name(index), block)
+
+        contents = b"".join(blocks[index] for index in range(first, last))
+        return contents[start - first * block_bytes:stop - first * block_bytes]
+
+    def discard(self, key, version):
+        """
+        Remove the entries of a version of the object `key`.
+        """
+        folder = self._folder(key, version)
+        with self._lock:
+            names = [name for name in self._entries if name.startswith(folder + "/")]
+            for name in names:
+                self.cached_bytes -= self._entries.pop(name)
+        shutil.rmtree(str(self.directory / folder), ignore_errors=True)
+
+    def statistics(self):
+        """
+        Counters of the cache.
+
+        Returns
+        -------
+        dict
+            The number of entry :code:`hits` and :code:`misses`, the
+            number of entries removed to stay within the size
+            (:code:`evictions`) and the number of :code:`cached_bytes`.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "cached_bytes": self.cached_bytes
+            }
+
+
+def file_version(filename):
+    """
+    The version of a local file used to validate cache entries, made from
+    its modification time and size.
+    """
+    stat = os.stat(str(filename))
+    return "{}-{}".format(stat.st_mtime_ns, stat.st_size), stat.st_size
+
+
+class LocalFileCache:
+    """
+    Caches the blocks of data read by the 'pread' backend from local files
+    in a :class:`DiskCache`, with an optional :class:`.BlockCache` in
+    memory in front of it.
+
+    Entries are validated with the modification time and size of the file
+    on each read.
+    """
+    def __init__(self, disk_cache, memory_cache=None):
+        self.disk_cache = disk_cache
+        self.memory_cache = memory_cache
+        self._versions = {}
+
+    def read(self, filename, start, stop, read_range):
+        """
+        Read the bytes `start` to `stop` of `filename`, see
+        :meth:`.BlockCache.read`.
+        """
+        version, size = file_version(filename)
+        previous = self._versions.get(filename)
+        if previous != version:
+            if previous is not None:
+                self.disk_cache.discard(filename, previous)
+                if self.memory_cache is not None:
+                    self.memory_cache.invalidate(filename)
+            self._versions[filename] = version
+
+        def read_disk(start, stop):
+            contents = self.disk_cache.read(filename, version, size, start, stop, read_range)
+            return np.frombuffer(contents, dtype=np.uint8)
+        if self.memory_cache is None:
+            return read_disk(start, stop)
+        return self.memory_cache.read(filename, start, stop, read_disk)
+
+    def invalidate(self, filename, start=None, stop=None):
+        filename = str(filename)
+        if self.memory_cache is not None:
+            self.memory_cache.invalidate(filename, start, stop)
+        version = self._versions.pop(filename, None)
+        if version is not None:
+            self.disk_cache.discard(filename, version)
+
+    def clear(self):
+        if self.memory_cache is not None:
+            self.memory_cache.clear()
+        self._versions = {}
+
+    def statistics(self):
+        if self.memory_cache is None:
+            return {}
+        return self.memory_cache.statistics()
@@ -1,6 +1,3 @@
-import os
-import shutil
-import weakref
 try:
     import pathlib
 except ImportError as e:
@@ -16,6 +13,17 @@ from .group import Group
 from .. import utils
 from .mode import OpenMode
 from . import validation
+from . import open_maps
+from . import sync as sync_module
+from . import flusher
+from . import advice as access_advice
+from . import block_cache
+from . import disk_cache
+from . import locking as locking_module
+from . import storage as storage_module
+from . import handles
+
+IO_BACKENDS = ["mmap", "pread"]
 
 
 class File(Group):
@@ -65,22 +73,209 @@ class File(Group):
     plugins: list, optional
         A list of instantiated plugins or modules with a plugins()
         function that returns a list of plugins.
+    pack_threshold: int, optional
+        Datasets created with fewer bytes than this and without
+        attributes are stored together in a pack file in the folder of
+        their group instead of in separate folders.
+        Packed datasets are read like any other dataset and are moved to
+        their own folder when they are resized or given attributes.
+        Packing is disabled by default.
+    max_open_maps: int, optional
+        The maximum number of memory maps held by the datasets of the file.
+        When it is exceeded, the least recently used datasets release their
+        maps and map their files again on the next access.
+        Useful when reading very many datasets, since the number of memory
+        maps per process is limited by the operating system.
+        Unlimited by default.
+    max_mapped_bytes: int, optional
+        The maximum number of bytes mapped by the datasets of the file,
+        enforced in the same way as `max_open_maps`.
+        Unlimited by default.
+    sync: str, optional
+        When written data and metadata are synced to disk:
+
+        - 'none': never, the operating system decides. Fastest, but data
+          written before a crash or power loss may be lost. Memory maps of
+          datasets are still flushed when the file is closed.
+        - 'close': when the file is closed.
+        - 'batch': in a background thread every `sync_interval` seconds and
+          when the file is closed, so that the objects created in a group
+          in between are synced together with the group.
+        - 'always': right after each object, attribute file and dataset is
+          written. Slowest, but nothing that was written is lost.
+
+        The default is 'none'.
+    sync_interval: float, optional
+        Seconds between syncs in 'batch' mode. The default is 1 second.
+    flush_interval: float, optional
+        If set, a background thread writes back the data written to
+        datasets every `flush_interval` seconds, so that long-running
+        writers do not accumulate large amounts of dirty pages that the
+        operating system later writes back all at once.
+        Disabled by default.
+    flush_rate: int, optional
+        The maximum number of bytes per second written back by the
+        background thread. Unlimited by default.
+    advice: str, optional
+        The default access pattern hint for all datasets, one of 'normal',
+        'sequential', 'random', 'willneed' or 'dontneed'.
+        See :meth:`.Dataset.advise`.
+        The operating system defaults are used if not set.
+    io_backend: str, optional
+        How the data of datasets is accessed:
+
+        - 'mmap': with memory maps. Fast on local disks.
+        - 'pread': with explicit reads and writes of all rows covered by
+          each indexing operation. Recommended for network file systems
+          such as NFS and Lustre, where each page fault in a memory map can
+          become a separate request to the server.
+          Indexing returns copies of the data instead of views.
+
+        The default is 'mmap'.
+    cache_size: int, optional
+        If set, the blocks of data read by the 'pread' backend or from
+        remote storage are kept in a cache of this many bytes, so that
+        repeated reads of overlapping regions are served from memory.
+        Writes through this File invalidate the blocks they touch, but
+        changes made by other processes are not detected.
+        Disabled by default.
+    cache_block_size: int, optional
+        The size of the cached blocks. The default is 1 MiB.
+    cache_directory: str or exdir.core.disk_cache.DiskCache, optional
+        A local folder where the metadata and attribute files and the
+        blocks of data read by the 'pread' backend or from remote storage
+        are kept, so that they are not read again from slow or remote
+        storage, also by later sessions and other processes.
+        Entries are validated with the modification time and size of
+        files, or with the ETag reported by remote servers.
+        Disabled by default.
+    cache_directory_size: int, optional
+        The maximum size of the cache folder. When it is full, the least
+        recently used entries are removed. Unlimited by default.
+    locking: bool, optional
+        If True, objects are created and attributes are updated while
+        holding :code:`flock` locks on lock files in the object folders, so
+        that several processes can write to the same File without
+        creating conflicting names or losing attribute updates.
+        Waits for the locks are counted in :meth:`lock_statistics`.
+        The default is False.
+    swmr: bool, optional
+        Single-writer/multiple-reader mode, for reading datasets while
+        another process appends to them.
+        Readers only see the rows committed by the writer, which commits
+        the rows of each append after writing them, and see new rows after
+        :meth:`.Dataset.refresh`.
+        Writers replace the data of datasets with new files instead of
+        overwriting them, so that readers keep reading the old data.
+        Rows that already exist must not be changed while they are read.
+        The default is False.
+    refresh_interval: float, optional
+        In SWMR mode, datasets are refreshed when they are accessed at
+        least `refresh_interval` seconds after they were last refreshed.
+        By default, they are only refreshed by :meth:`.Dataset.refresh`.
+    storage: str or exdir.core.storage.Storage, optional
+        Where the folders and files of the File are stored:
+
+        - 'posix': on the file system.
+        - 'memory': in memory, see :class:`.MemoryStorage`.
+        - 'zip': read-only in a zip archive, see :class:`.ZipStorage`.
+
+        Or an instance of a storage, for instance a :class:`.MemoryStorage`
+        shared by several Files.
+        The default is 'zip' if `directory` ends with '.zip', an
+        :class:`.ObjectStoreStorage` for URLs like 's3://bucket/path', a
+        :class:`.WebStorage` for URLs like 'https://example.com/path' and
+        'posix' otherwise.
+        Ragged datasets, tables, sparse datasets, packs, indexes,
+        statistics and pyramids and the `pack_threshold`, `flush_interval`,
+        `advice`, `io_backend`, `locking` and `swmr` options need the file
+        system.
+        Other storages are not synced.
 
     """
 
     def __init__(self, directory, mode=None, allow_remove=False,
-                 name_validation=None, plugins=None):
-        self._open_datasets = weakref.WeakValueDictionary({})
+                 name_validation=None, plugins=None, pack_threshold=None,
+                 max_open_maps=None, max_mapped_bytes=None,
+                 sync="none", sync_interval=1.0,
+                 flush_interval=None, flush_rate=None, advice=None,
+                 io_backend="mmap", cache_size=None, cache_block_size=1 << 20,
+                 cache_directory=None, cache_directory_size=None,
+                 locking=False, swmr=False, refresh_interval=None, storage=None):
+        if storage is None and "://" in str(directory):
+            storage, directory = storage_module.from_url(str(directory))
+        if storage is None:
+            storage = "zip" if pathlib.Path(directory).suffix == ".zip" else "posix"
+        if isinstance(storage, str):
+            storage = storage_module.from_name(storage, directory)
+        if cache_directory is not None:
+            if not isinstance(cache_directory, disk_cache.DiskCache):
+                cache_directory = disk_cache.DiskCache(
+                    cache_directory, cache_block_size, cache_directory_size
+                )
+            storage = storage.with_disk_cache(cache_directory)
+        self._storage = storage
+        if not storage.local:
+            options = [
+                ("pack_threshold", pack_threshold),
+                ("flush_interval", flush_interval),
+                ("advice", advice),
+                ("io_backend", None if io_backend == "mmap" else io_backend),
+                ("locking", locking or None),
+                ("swmr", swmr or None)
+            ]
+            unsupported = [name for name, value in options if value is not None]
+            if len(unsupported) > 0:
+                raise ValueError(
+                    "The options {} are only supported for files "
+                    "on the file system".format(unsupported)
+                )
+            sync = "none"
+        if io_backend not in IO_BACKENDS:
+            raise ValueError(
+                "IO backend {} not recognized, "
+                "backend must be one of {}".format(io_backend, IO_BACKENDS)
+            )
+        self.io_backend = io_backend
+        if refresh_interval is not None:
+            if not swmr:
+                raise ValueError("refresh_interval is only used in SWMR mode")
+            if refresh_interval < 0:
+                raise ValueError(
+                    "Refresh interval must not be negative, got {}".format(refresh_interval)
+                )
+        self.swmr = swmr
+        self.refresh_interval = refresh_interval
+        self._block_cache = None
+        if cache_size is not None:
+            self._block_cache = block_cache.BlockCache(cache_size, cache_block_size)
+        if storage.local and storage.disk_cache is not None:
+            self._block_cache = disk_cache.LocalFileCache(storage.disk_cache, self._block_cache)
+        if advice is not None:
+            access_advice.assert_valid_advice(advice)
+        self.advice = advice
+        self._open_maps = open_maps.OpenMaps(max_open_maps, max_mapped_bytes)
+        self._locks = locking_module.Locks(locking)
+        self._syncer = sync_module.Syncer(sync, sync_interval)
+        self._flusher = None
+        if flush_interval is not None:
+            self._flusher = flusher.Flusher(flush_interval, flush_rate)
+        self._packs = {}
+        self.pack_threshold = pack_threshold
         directory = pathlib.Path(directory) #.resolve()
-        if directory.suffix != ".exdir":
+        if directory.suffix != ".exdir" and not isinstance(storage, storage_module.ZipStorage):
             directory = directory.with_suffix(directory.suffix + ".exdir")
-        self.user_mode = mode = mode or 'a'
+        self.user_mode = mode = mode or ('r' if storage.readonly else 'a')
         recognized_modes = ['a', 'r', 'r+', 'w', 'w-', 'x']
         if mode not in recognized_modes:
             raise ValueError(
                 "IO mode {} not recognized, "
                 "mode must be one of {}".format(mode, recognized_modes)
             )
+        if storage.readonly and mode != "r":
+            raise ValueError(
+                "The storage of {} is read-only, mode must be 'r'".format(directory)
+            )
 
         self.plugin_manager = exdir.plugin_interface.plugin_interface.Manager(plugins)
 
@@ -109,6 +304,31 @@ class File(Group):
             )
 
         self.name_validation = name_validation
+        # the options that the file is opened with by other processes
+        # when its objects are pickled, see the handles module
+        if isinstance(cache_directory, disk_cache.DiskCache):
+            cache_directory_size = cache_directory.max_bytes
+            cache_directory = str(cache_directory.directory)
+        self._options = {
+            "name_validation": name_validation,
+            "plugins": plugins,
+            "pack_threshold": pack_threshold,
+            "max_open_maps": max_open_maps,
+            "max_mapped_bytes": max_mapped_bytes,
+            "sync": sync,
+            "sync_interval": sync_interval,
+            "flush_interval": flush_interval,
+            "flush_rate": flush_rate,
+            "advice": advice,
+            "io_backend": io_backend,
+            "cache_size": cache_size,
+            "cache_block_size": cache_block_size,
+            "cache_directory": cache_directory,
+            "cache_directory_size": cache_directory_size,
+            "locking": locking,
+            "swmr": swmr,
+            "refresh_interval": refresh_interval
+        }
 
         if mode == "r":
             self.io_mode = OpenMode.READ_ONLY
@@ -122,9 +342,9 @@ class File(Group):
             file=self
         )
 
-        already_exists = directory.exists()
+        already_exists = storage.exists(directory)
         if already_exists:
-            if not exob.is_nonraw_object_directory(directory):
+            if not exob.is_nonraw_object_directory(directory, storage):
                 raise RuntimeError(
                     "Path '{}' already exists, but is not a valid exdir file.".format(directory)
                 )
@@ -140,7 +360,7 @@ class File(Group):
         elif mode == "w":
             if already_exists:
                 if allow_remove:
-                    shutil.rmtree(str(directory))  # NOTE str needed for Python 3.5
+                    storage.rmtree(directory)
                 else:
                     raise RuntimeError(
                         "File {} already exists. We won't delete the entire tree "
@@ -156,8 +376,15 @@ class File(Group):
                 should_create_directory = True
 
         if should_create_directory:
-            self.name_validation(directory.parent, directory.name)
-            exob._create_object_directory(directory, exob._default_metadata(exob.FILE_TYPENAME))
+            self.name_validation(storage.path(directory.parent), directory.name)
+            exob._create_object_directory(
+                directory,
+                exob._default_metadata(exob.FILE_TYPENAME),
+                self
+            )
+
+    def __reduce__(self):
+        return (handles.open_file, (handles.file_spec(self),))
 
     def close(self):
         """
@@ -165,19 +392,79 @@ class File(Group):
         Sets the OpenMode to FILE_CLOSED which denies access to any attribute or
         child
         """
-        import gc
-        for name, data_set in self._open_datasets.items():
-            # there are no way to close the memmap other than deleting all
-            # references to it, thus
-            try:
-                data_set._data_memmap.flush()
-                data_set._data_memmap.setflags(write=False) # TODO does not work
-            except AttributeError:
-                pass
-        # force garbage collection to clean weakrefs
-        gc.collect()
+        if self.io_mode == OpenMode.FILE_CLOSED:
+            return
+        if self._flusher is not None:
+            self._flusher.close()
+        for data_set in self._open_maps.owners():
+            memmap = getattr(data_set, "_data_memmap", None)
+            # arrays of other storages than the file system are not mapped
+            if hasattr(memmap, "flush") and memmap.flags.writeable:
+                memmap.flush()
+        self._syncer.close()
+        # there is no way to close a memmap other than deleting all
+        # references to it, so the objects drop their references
+        # and the maps are closed unless views of them are still in use
+        self._open_maps.release_all()
+        if self._block_cache is not None:
+            self._block_cache.clear()
+        self._storage.close()
         self.io_mode = OpenMode.FILE_CLOSED
 
+    def map_statistics(self):
+        """
+        Counters of the memory maps held by the datasets of the file.
+
+        Returns
+        -------
+        dict
+            :code:`open_maps` and :code:`mapped_bytes` held now,
+            the total number of :code:`maps` made,
+            the number of :code:`evictions` of least recently used datasets
+            and the number of :code:`remaps` of evicted datasets.
+        """
+        return self._open_maps.statistics()
+
+    def cache_statistics(self):
+        """
+        Counters of the block cache and the disk cache, see the
+        `cache_size` and `cache_directory` options.
+
+        Returns
+        -------
+        dict
+            The number of block :code:`hits` and :code:`misses`,
+            :code:`evictions` to stay within the size,
+            :code:`invalidations` by writes and the number of
+            :code:`cached_bytes` of the block cache, and the same counters
+            prefixed with :code:`disk_` for the disk cache, except
+            invalidations.
+            Empty if the caches are disabled.
+        """
+        statistics = {}
+        if self._block_cache is not None:
+            statistics.update(self._block_cache.statistics())
+        if self._storage.disk_cache is not None:
+            statistics.update({
+                "disk_" + name: value
+                for name, value in self._storage.disk_cache.statistics().items()
+            })
+        return statistics
+
+    def lock_statistics(self):
+        """
+        Counters of the locks taken with the `locking` option.
+
+        Returns
+        -------
+        dict
+            The number of lock :code:`acquisitions`, the number of them
+            that waited for another process or thread (:code:`contended`),
+            the total :code:`wait_seconds` and the
+            :code:`max_wait_seconds`.
+        """
+        return self._locks.statistics()
+
     def __enter__(self):
         return self
 
@@ -1,5 +1,5 @@
 from pathlib import Path
-import shutil
+import pathlib
 
 try:
     import ruamel_yaml as yaml
@@ -11,31 +11,61 @@ import exdir
 from .attribute import Attribute
 from .constants import *
 from .mode import assert_file_open, OpenMode
+from . import storage as storage_module
 
 
 def _resolve_path(path):
     return Path(path).resolve()
 
 
+def _storage(file):
+    if file is None:
+        return storage_module.POSIX
+    return file._storage
+
+
+def _assert_local_storage(file, feature):
+    """
+    Raise if `feature` needs the files of `file` to be on the file system,
+    but they are not.
+    """
+    if not file._storage.local:
+        raise NotImplementedError(
+            "{} are only supported for files on the file system".format(feature)
+        )
+
+
 def _assert_valid_name(name, container):
     """Check if name (dataset or group) is valid."""
-    container.file.name_validation(container.directory, name)
+    from . import pack
+    storage = container.file._storage
+    container.file.name_validation(storage.path(container.directory), name)
+    if pack.contains(container.file, container.directory, str(name)):
+        raise RuntimeError(
+            "'{}' already exists in '{}'".format(name, container.directory)
+        )
 
 
-def _create_object_directory(directory, metadata):
+def _create_object_directory(directory, metadata, file=None):
     """
     Create object directory and meta file if directory
     don't already exist.
+    The new files are written to the storage of `file` and synced
+    according to its sync mode.
     """
-    if directory.exists():
+    storage = _storage(file)
+    if storage.exists(directory):
         raise IOError("The directory '" + str(directory) + "' already exists")
-    valid_types = [DATASET_TYPENAME, FILE_TYPENAME, GROUP_TYPENAME]
+    valid_types = [
+        DATASET_TYPENAME, FILE_TYPENAME, GROUP_TYPENAME,
+        RAGGED_DATASET_TYPENAME, TABLE_TYPENAME, SPARSE_DATASET_TYPENAME
+    ]
     typename = metadata[EXDIR_METANAME][TYPE_METANAME]
     if typename not in valid_types:
         raise ValueError("{typename} is not a valid typename".format(typename=typename))
-    directory.mkdir()
+    storage.mkdir(directory)
     meta_filename = directory / META_FILENAME
-    with meta_filename.open("w", encoding="utf-8") as meta_file:
+    with storage.open(meta_filename, "w") as meta_file:
         if metadata == _default_metadata(typename):
             # if it is the default, we know how to print it fast
             metadata_string = (''
@@ -61,15 +91,36 @@ def _create_object_directory(directory, metadata):
             # NOTE workaround for Python 2.7
             meta_file.write(metadata_string.decode('utf8'))
 
+    if file is not None:
+        file._syncer.written(meta_filename, created=True)
+        file._syncer.written(directory, created=True)
+
 
-def _remove_object_directory(directory):
+def _create_child_directory(container, name, metadata):
+    """
+    Create the directory of the object `name` in `container`.
+    The folder of `container` is locked, so that only one thread creates
+    an object with a given name.
+    With locking, the name is also validated again, since another process
+    may have created a conflicting name since it was first validated.
+    """
+    file = container.file
+    with file._locks.exclusive(container.directory):
+        if file._locks.enabled:
+            _assert_valid_name(name, container)
+        _create_object_directory(container.directory / name, metadata, file)
+
+
+def _remove_object_directory(directory, file=None):
     """
     Remove object directory and meta file if directory exist.
     """
-    if not directory.exists():
+    storage = _storage(file)
+    if not storage.exists(directory):
         raise IOError("The directory '" + str(directory) + "' does not exist")
-    assert is_inside_exdir(directory)
-    shutil.rmtree(directory)
+    if storage.local:
+        assert is_inside_exdir(directory)
+    storage.rmtree(directory)
 
 
 def _default_metadata(typename):
@@ -81,19 +132,21 @@ def _default_metadata(typename):
     }
 
 
-def is_exdir_object(directory):
+def is_exdir_object(directory, storage=None):
     """
     WARNING: Does not test if inside exdir directory,
     only if the object can be an exdir object (i.e. a directory).
     """
-    return directory.is_dir()
+    storage = storage or storage_module.POSIX
+    return storage.is_dir(directory)
 
 
-def is_nonraw_object_directory(directory):
-    meta_filename = directory / META_FILENAME
-    if not meta_filename.exists():
+def is_nonraw_object_directory(directory, storage=None):
+    storage = storage or storage_module.POSIX
+    meta_filename = pathlib.PurePath(directory) / META_FILENAME
+    if not storage.exists(meta_filename):
         return False
-    with meta_filename.open("r", encoding="utf-8") as meta_file:
+    with storage.open(meta_filename, "r") as meta_file:
         meta_data = yaml.YAML(typ="safe", pure=True).load(meta_file)
 
         if not isinstance(meta_data, dict):
@@ -103,14 +156,20 @@ def is_nonraw_object_directory(directory):
             return False
         if TYPE_METANAME not in meta_data[EXDIR_METANAME]:
             return False
-        valid_types = [DATASET_TYPENAME, FILE_TYPENAME, GROUP_TYPENAME]
+        valid_types = [
+            DATASET_TYPENAME, FILE_TYPENAME, GROUP_TYPENAME,
+            RAGGED_DATASET_TYPENAME, TABLE_TYPENAME, SPARSE_DATASET_TYPENAME
+        ]
         if meta_data[EXDIR_METANAME][TYPE_METANAME] not in valid_types:
             return False
     return True
 
 
-def is_raw_object_directory(directory):
-    return is_exdir_object(directory) and not is_nonraw_object_directory(directory)
+def is_raw_object_directory(directory, storage=None):
+    return (
+        is_exdir_object(directory, storage) and
+        not is_nonraw_object_directory(directory, storage)
+    )
 
 
 def root_directory(path):
@@ -188,6 +247,18 @@ class Object:
         self.name = "/" + relative_name
         self.file = file
 
+    def __reduce__(self):
+        # pickled as a handle that is opened again in the receiving
+        # process, see the handles module
+        from . import handles
+        return (handles.reopen, (
+            handles.file_spec(self.file),
+            type(self),
+            str(self.parent_path),
+            self.object_name,
+            getattr(self, "_packed", False)
+        ))
+
     @property # TODO consider warning if file is closed
     def directory(self):
         return self.root_directory / self.relative_path
@@ -215,6 +286,14 @@ class Object:
             file=self.file,
         )
 
+    def _ensure_directory(self):
+        """
+        Make sure that the object has its own folder before its
+        metadata is written.
+        Only packed datasets are stored without a folder.
+        """
+        pass
+
     @property # TODO consider warning if file is closed,
     def attributes_filename(self):
         return self.directory / ATTRIBUTES_FILENAME
@@ -226,11 +305,12 @@ class Object:
     def create_raw(self, name):
         from .raw import Raw
         assert_file_open(self.file)
-        _assert_valid_name(name, self)
         directory_name = self.directory / name
-        if directory_name.exists():
-            raise FileExistsError("'{}' already exists in '{}'".format(name, self))
-        directory_name.mkdir()
+        with self.file._locks.exclusive(self.directory):
+            _assert_valid_name(name, self)
+            if self.file._storage.exists(directory_name):
+                raise FileExistsError("'{}' already exists in '{}'".format(name, self))
+            self.file._storage.mkdir(directory_name)
         return Raw(
             root_directory=self.root_directory,
             parent_path=self.relative_path,
@@ -242,19 +322,20 @@ class Object:
         from .raw import Raw
         assert_file_open(self.file)
         directory_name = self.directory / name
-        if directory_name.exists():
-            if is_nonraw_object_directory(directory_name):
-                raise FileExistsError(
-                    "Directory '{}' already exists, but is not raw.".format(directory_name)
+        with self.file._locks.exclusive(self.directory):
+            if self.file._storage.exists(directory_name):
+                if is_nonraw_object_directory(directory_name, self.file._storage):
+                    raise FileExistsError(
+                        "Directory '{}' already exists, but is not raw.".format(directory_name)
+                    )
+                return Raw(
+                    root_directory=self.root_directory,
+                    parent_path=self.relative_path,
+                    object_name=name,
+                    file=self.file
                 )
-            return Raw(
-                root_directory=self.root_directory,
-                parent_path=self.relative_path,
-                object_name=name,
-                file=self.file
-            )
 
-        return self.create_raw(name)
+            return self.create_raw(name)
 
     @property
     def parent(self):
@@ -0,0 +1,220 @@
+"""
+Background writeback of dirty pages for long-running writers.
+
+Data written to memory maps or appended to files stays in the page cache
+until the operating system decides to write it back.
+A process that writes for hours can accumulate gigabytes of dirty pages,
+and the writer is stalled when the kernel eventually writes them all back
+at once.
+The flusher keeps track of the byte ranges written to each file and writes
+them back in a background thread at a limited rate, so that the amount of
+dirty data and the write latency stay flat.
+
+On Linux, ranges are written back with :code:`sync_file_range`.
+Elsewhere the whole file is synced.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import threading
+import time
+
+# sync_file_range flags from <fcntl.h>
+SYNC_FILE_RANGE_WAIT_BEFORE = 1
+SYNC_FILE_RANGE_WRITE = 2
+SYNC_FILE_RANGE_WAIT_AFTER = 4
+
+# ranges are written back in pieces of at most this size so that the rate
+# limit is followed closely
+CHUNK_BYTES = 1 << 22
+
+
+def _load_sync_file_range():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        function = libc.sync_file_range
+    except (OSError, AttributeError, TypeError):
+        return None
+    function.argtypes = [ctypes.c_int, ctypes.c_int64, ctypes.c_int64, ctypes.c_uint]
+    function.restype = ctypes.c_int
+    return function
+
+
+_sync_file_range = _load_sync_file_range()
+
+
+def sync_range(descriptor, offset, nbytes):
+    """
+    Write back the given byte range of an open file and wait until it has
+    been written.
+    """
+    if _sync_file_range is not None:
+        flags = (
+            SYNC_FILE_RANGE_WAIT_BEFORE |
+            SYNC_FILE_RANGE_WRITE |
+            SYNC_FILE_RANGE_WAIT_AFTER
+        )
+        if _sync_file_range(descriptor, offset, nbytes, flags) == 0:
+            return
+    if hasattr(os, "fdatasync"):
+        os.fdatasync(descriptor)
+    else:
+        os.fsync(descriptor)
+
+
+class Flusher:
+    """
+    Writes back the dirty ranges of the files of a File in a background
+    thread.
+
+    Parameters
+    ----------
+    interval: float
+        Seconds between each pass over the dirty ranges.
+    max_bytes_per_second: int, optional
+        The maximum number of bytes written back per second.
+        Unlimited if not set.
+    """
+    def __init__(self, interval=1.0, max_bytes_per_second=None):
+        if interval <= 0:
+            raise ValueError("Flush interval must be positive, got {}".format(interval))
+        if max_bytes_per_second is not None and max_bytes_per_second <= 0:
+            raise ValueError(
+                "Flush rate must be positive, got {}".format(max_bytes_per_second)
+            )
+        self.interval = interval
+        self.max_bytes_per_second = max_bytes_per_second
+        self.flushed_bytes = 0
+        self.flushes = 0
+        # path -> [start, stop] of the written bytes
+        self._dirty = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def written(self, path, start, stop):
+        """
+        Record that the bytes `start` to `stop` of the file at `path`
+        were written.
+        """
+        if stop <= start:
+            return
+        path = str(path)
+        with self._lock:
+            dirty = self._dirty.get(path)
+            if dirty is None:
+                self._dirty[path] = [start, stop]
+            else:
+                dirty[0] = min(dirty[0], start)
+                dirty[1] = max(dirty[1], stop)
+        if self._thread is None:
+            self._start()
+
+    def memmap_written(self, memmap, path, first_row, last_row):
+        """
+        Record that the rows `first_row` to `last_row` of `memmap`, which
+        maps the file at `path`, were written.
+        """
+        if memmap.ndim > 0 and memmap.flags.c_contiguous:
+            row_bytes = memmap.strides[0]
+            self.written(
+                path,
+                memmap.offset + first_row * row_bytes,
+                memmap.offset + last_row * row_bytes
+            )
+        else:
+            self.written(path, memmap.offset, memmap.offset + memmap.nbytes)
+
+    @property
+    def dirty_bytes(self):
+        """
+        The number of bytes recorded as written and not yet written back.
+        """
+        with self._lock:
+            return sum(stop - start for start, stop in self._dirty.values())
+
+    def flush(self, budget=None):
+        """
+        Write back at most `budget` bytes of the dirty ranges, or all of
+        them if `budget` is None.
+
+        Returns
+        -------
+        int
+            The number of bytes written back.
+        """
+        flushed = 0
+        with self._lock:
+            paths = list(self._dirty.keys())
+        for path in paths:
+            if budget is not None and flushed >= budget:
+                break
+            with self._lock:
+                dirty = self._dirty.get(path)
+                if dirty is None:
+                    continue
+                start, stop = dirty
+                if budget is not None:
+                    stop = min(stop, start + budget - flushed, start + CHUNK_BYTES)
+                if stop >= dirty[1]:
+                    del self._dirty[path]
+                else:
+                    dirty[0] = stop
+            try:
+                descriptor = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                sync_range(descriptor, start, stop - start)
+            finally:
+                os.close(descriptor)
+            flushed += stop - start
+        self.flushed_bytes += flushed
+        if flushed > 0:
+            self.flushes += 1
+        return flushed
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None or self._stop.is_set():
+                return
+            self._thread = threading.Thread(
+                target=self._run,
+                name="exdir-flusher",
+                daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        last = time.monotonic()
+        budget = 0
+        while not self._stop.wait(self.interval):
+            if self.max_bytes_per_second is None:
+                self.flush()
+                continue
+            now = time.monotonic()
+            # unused budget is carried over for at most one interval
+            budget = min(
+                budget + (now - last) * self.max_bytes_per_second,
+                2 * self.interval * self.max_bytes_per_second
+            )
+            last = now
+            while budget >= 1 and not self._stop.is_set():
+                flushed = self.flush(int(budget))
+                budget -= flushed
+                if flushed == 0:
+                    break
+
+    def close(self):
+        """
+        Stop the background thread.
+        Ranges that are not written back yet are left to the sync mode of
+        the File.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            self._dirty = {}
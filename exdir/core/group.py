@@ -1,5 +1,8 @@
+import contextlib
 import os
 import re
+import shutil
+import uuid
 try:
     import pathlib
 except ImportError as e:
@@ -22,6 +25,11 @@ from .exdir_object import Object
 from .mode import assert_file_open, OpenMode, assert_file_writable
 from . import exdir_object as exob
 from . import dataset as ds
+from . import ragged_dataset as rds
+from . import table as tbl
+from . import sparse_dataset as sds
+from . import locking
+from . import pack
 from . import raw
 from .. import utils
 
@@ -146,13 +154,187 @@ class Group(Object):
         if prepared_data is None:
             raise TypeError("Could not create a meaningful dataset.")
 
-        dataset_directory = self.directory / name
-        exob._create_object_directory(dataset_directory, meta)
+        threshold = self.file.pack_threshold
+        if (threshold is not None and prepared_data.nbytes < threshold and
+                len(attrs) == 0 and meta == exob._default_metadata(exob.DATASET_TYPENAME)):
+            with self.file._locks.exclusive(self.directory):
+                # another thread may have created the object meanwhile
+                exob._assert_valid_name(name, self)
+                pack.get_pack(self.file, self.directory).add(name, prepared_data)
+            return self._dataset(name, packed=True)
+
+        exob._create_child_directory(self, name, meta)
 
         dataset = self._dataset(name)
         dataset._reset_data(prepared_data, attrs, None)  # meta already set above
         return dataset
 
+    def create_ragged_dataset(self, name, data=None, dtype=None, row_shape=()):
+        """
+        Create a ragged dataset, which stores rows of variable length.
+        This will create a folder on the filesystem with the given name,
+        an exdir.yaml file that identifies the folder as an Exdir
+        RaggedDataset, a values.npy file with the concatenated rows and
+        an offsets.npy file with the start of each row.
+
+        Parameters
+        ----------
+        name: str
+            Name of the ragged dataset to be created.
+        data: iterable of list or numpy.array, optional
+            The initial rows of the ragged dataset.
+            If not set, the ragged dataset is created without rows.
+        dtype: numpy.dtype, optional
+            Data type of the values.
+            Defaults to the data type of the first row in `data` or
+            float32 if `data` is empty.
+        row_shape: tuple, optional
+            Trailing shape of each row, for instance the number of samples
+            in each waveform of a spike.
+            Only used if `data` is empty.
+
+        Returns
+        -------
+        The newly created RaggedDataset.
+
+        Raises
+        ------
+        FileExistsError
+            If an object with the same `name` already exists.
+        """
+        assert_file_writable(self.file)
+        path = utils.path.name_to_asserted_group_path(name)
+        if len(path.parts) > 1:
+            subgroup = self.require_group(path.parent)
+            return subgroup.create_ragged_dataset(path.name, data, dtype, row_shape)
+
+        exob._assert_valid_name(name, self)
+
+        rows = [np.asarray(row) for row in (data if data is not None else [])]
+        if len(rows) > 0:
+            dtype = dtype or rows[0].dtype
+            row_shape = rows[0].shape[1:]
+        dtype = dtype or np.float32
+
+        exob._create_child_directory(
+            self, name, exob._default_metadata(exob.RAGGED_DATASET_TYPENAME)
+        )
+
+        ragged_dataset = self._ragged_dataset(name)
+        ragged_dataset._reset_data(rows, dtype, row_shape)
+        return ragged_dataset
+
+    def create_table(self, name, data=None, dtype=None):
+        """
+        Create a table of columns that share the same length.
+        This will create a folder on the filesystem with the given name,
+        an exdir.yaml file that identifies the folder as an Exdir Table
+        and lists its columns, and one NumPy file per column.
+
+        Parameters
+        ----------
+        name: str
+            Name of the table to be created.
+        data: dict or structured numpy.array, semi-optional
+            The initial columns of the table.
+            Cannot be set together with `dtype`, but must be set if `dtype`
+            is not set.
+        dtype: structured numpy.dtype, semi-optional
+            Names and data types of the columns of an empty table.
+            Cannot be set together with `data`, but must be set if `data`
+            is not set.
+
+        Returns
+        -------
+        The newly created Table.
+
+        Raises
+        ------
+        FileExistsError
+            If an object with the same `name` already exists.
+        """
+        assert_file_writable(self.file)
+        path = utils.path.name_to_asserted_group_path(name)
+        if len(path.parts) > 1:
+            subgroup = self.require_group(path.parent)
+            return subgroup.create_table(path.name, data, dtype)
+
+        exob._assert_valid_name(name, self)
+
+        if (data is None) == (dtype is None):
+            raise TypeError(
+                "Cannot create table. Exactly one of data or dtype must be set."
+            )
+        if data is None:
+            data = np.zeros(0, dtype=dtype)
+        columns = tbl._columns_from_data(data)
+        if len(columns) == 0:
+            raise TypeError("Cannot create a table without columns.")
+
+        exob._create_child_directory(
+            self, name, exob._default_metadata(exob.TABLE_TYPENAME)
+        )
+
+        table = self._table(name)
+        table._reset_data(columns)
+        return table
+
+    def create_sparse_dataset(self, name, data=None, shape=None, dtype=None):
+        """
+        Create a two-dimensional dataset that only stores its nonzero values.
+        This will create a folder on the filesystem with the given name,
+        an exdir.yaml file that identifies the folder as an Exdir
+        SparseDataset and stores its shape, and the indptr.npy, indices.npy
+        and values.npy files of the compressed sparse row format.
+
+        Parameters
+        ----------
+        name: str
+            Name of the sparse dataset to be created.
+        data: numpy.array, scipy.sparse matrix or tuple, semi-optional
+            The contents of the dataset, either as a dense array,
+            a SciPy sparse matrix or a tuple :code:`(values, (rows, columns))`
+            of coordinates, where duplicate coordinates are summed.
+            Must be set if `shape` is not set.
+        shape: tuple, semi-optional
+            Shape of the dataset. Defaults to the shape of `data`.
+            Creates a dataset with only zeros if `data` is not set.
+        dtype: numpy.dtype, optional
+            Data type of the dataset. Defaults to the data type of `data`
+            or float32 if `data` is not set.
+
+        Returns
+        -------
+        The newly created SparseDataset.
+
+        Raises
+        ------
+        FileExistsError
+            If an object with the same `name` already exists.
+        """
+        assert_file_writable(self.file)
+        path = utils.path.name_to_asserted_group_path(name)
+        if len(path.parts) > 1:
+            subgroup = self.require_group(path.parent)
+            return subgroup.create_sparse_dataset(path.name, data, shape, dtype)
+
+        exob._assert_valid_name(name, self)
+
+        if data is None:
+            if shape is None:
+                raise TypeError(
+                    "Cannot create sparse dataset. Missing shape or data keyword."
+                )
+            data = (np.zeros(0, dtype=dtype or np.float32), ([], []))
+
+        exob._create_child_directory(
+            self, name, exob._default_metadata(exob.SPARSE_DATASET_TYPENAME)
+        )
+
+        sparse_dataset = self._sparse_dataset(name)
+        sparse_dataset._reset_data(data, shape, dtype)
+        return sparse_dataset
+
     def create_group(self, name):
         """
         Create a group. This will create a folder on the filesystem with the
@@ -190,10 +372,95 @@ class Group(Object):
                 "'{}' already exists in '{}'".format(name, self.name)
             )
 
-        group_directory = self.directory / path
-        exob._create_object_directory(group_directory, exob._default_metadata(exob.GROUP_TYPENAME))
+        exob._create_child_directory(
+            self, path, exob._default_metadata(exob.GROUP_TYPENAME)
+        )
         return self._group(name)
 
+    @contextlib.contextmanager
+    def transaction(self, name):
+        """
+        Create the group `name` and the objects in it so that they appear
+        all at once, or not at all if an exception is raised or the
+        process crashes.
+
+            >>> with f.transaction("session_12") as session:
+            ...     session.create_dataset("lfp", data=lfp)
+            ...     session.attrs["rat"] = "Ola"
+            >>> f["session_12"]["lfp"]
+
+        The group is built in a hidden staging folder next to it and is
+        moved into place with a single rename when the block ends.
+        Unless the sync mode of the file is 'none', each file in the group
+        is synced once before the rename, instead of after each write, so
+        that the group is complete on disk once it is visible.
+
+        Objects returned inside the block refer to the staging folder and
+        cannot be used after it ends.
+        Staging folders left by crashed processes are ignored and can be
+        removed when no transaction is running.
+
+        Parameters
+        ----------
+        name: str
+            Name of the new group.
+
+        Raises
+        ------
+        FileExistsError
+            If an object with the same `name` already exists, also if it
+            was created by someone else during the transaction.
+        """
+        assert_file_writable(self.file)
+        exob._assert_local_storage(self.file, "Transactions")
+        path = utils.path.name_to_asserted_group_path(name)
+        if len(path.parts) > 1:
+            with self.require_group(path.parent).transaction(path.name) as group:
+                yield group
+            return
+
+        if name in self:
+            raise FileExistsError(
+                "'{}' already exists in '{}'".format(name, self.name)
+            )
+        exob._assert_valid_name(path, self)
+
+        staging_name = "{}{}.{}.{}".format(
+            exob.STAGING_PREFIX, name, os.getpid(), uuid.uuid4().hex[:8]
+        )
+        staging_directory = self.directory / staging_name
+        syncer = self.file._syncer
+        syncer.stage(staging_directory)
+        committed = False
+        try:
+            exob._create_object_directory(
+                staging_directory,
+                exob._default_metadata(exob.GROUP_TYPENAME),
+                self.file
+            )
+            yield self._group(staging_name)
+            syncer.unstage(staging_directory)
+            with self.file._locks.exclusive(self.directory):
+                if name in self:
+                    raise FileExistsError(
+                        "'{}' already exists in '{}'".format(name, self.name)
+                    )
+                exob._assert_valid_name(path, self)
+                try:
+                    # object folders are never empty, so this never
+                    # replaces an object created in the meantime
+                    os.rename(str(staging_directory), str(self.directory / name))
+                except OSError:
+                    raise FileExistsError(
+                        "'{}' already exists in '{}'".format(name, self.name)
+                    )
+            committed = True
+            syncer.written(self.directory / name, created=True)
+        finally:
+            if not committed:
+                syncer.unstage(staging_directory, sync=False)
+                shutil.rmtree(str(staging_directory), ignore_errors=True)
+
     def _group(self, name):
         return Group(
             root_directory=self.root_directory,
@@ -228,22 +495,23 @@ class Group(Object):
 
         group_directory = self.directory / name
 
-        if name in self:
-            current_object = self[name]
-            if isinstance(current_object, Group):
-                return current_object
-            else:
-                raise TypeError(
-                    "An object with name '{}' already "
-                    "exists, but it is not a Group.".format(name)
+        with self.file._locks.exclusive(self.directory):
+            if name in self:
+                current_object = self[name]
+                if isinstance(current_object, Group):
+                    return current_object
+                else:
+                    raise TypeError(
+                        "An object with name '{}' already "
+                        "exists, but it is not a Group.".format(name)
+                    )
+            elif self.file._storage.exists(group_directory):
+                raise FileExistsError(
+                    "Directory " + group_directory + " already exists, " +
+                    "but is not an Exdir object."
                 )
-        elif group_directory.exists():
-            raise FileExistsError(
-                "Directory " + group_directory + " already exists, " +
-                "but is not an Exdir object."
-            )
 
-        return self.create_group(name)
+            return self.create_group(name)
 
     def require_dataset(self, name, shape=None, dtype=None, exact=False,
                         data=None, fillvalue=None):
@@ -283,14 +551,15 @@ class Group(Object):
             initial value of `fillvalue`.
         """
         assert_file_open(self.file)
-        if name not in self:
-            return self.create_dataset(
-                name,
-                shape=shape,
-                dtype=dtype,
-                data=data,
-                fillvalue=fillvalue
-            )
+        with self.file._locks.exclusive(self.directory):
+            if name not in self:
+                return self.create_dataset(
+                    name,
+                    shape=shape,
+                    dtype=dtype,
+                    data=data,
+                    fillvalue=fillvalue
+                )
 
         current_object = self[name]
 
@@ -354,7 +623,9 @@ class Group(Object):
             return False
         path = utils.path.name_to_asserted_group_path(name)
         directory = self.directory / path
-        return exob.is_exdir_object(directory)
+        if exob.is_exdir_object(directory, self.file._storage):
+            return True
+        return pack.contains(self.file, directory.parent, path.name)
 
     def __getitem__(self, name):
         """
@@ -385,8 +656,12 @@ class Group(Object):
             raise KeyError(error_message)
 
         directory = self.directory / path
+        storage = self.file._storage
+
+        if not storage.exists(directory) and pack.contains(self.file, self.directory, str(path)):
+            return self._dataset(str(path), packed=True)
 
-        if exob.is_raw_object_directory(directory):  # TODO create one function that handles all Raw creation
+        if exob.is_raw_object_directory(directory, storage):  # TODO create one function that handles all Raw creation
             return raw.Raw(
                 root_directory=self.root_directory,
                 parent_path=self.relative_path,
@@ -394,19 +669,25 @@ class Group(Object):
                 file=self.file
             )
 
-        if not exob.is_nonraw_object_directory(directory):
+        if not exob.is_nonraw_object_directory(directory, storage):
             raise IOError(
                 "Directory '" + directory +
                 "' is not a valid exdir object."
             )
 
         meta_filename = directory / exob.META_FILENAME
-        with meta_filename.open("r", encoding="utf-8") as meta_file:
+        with storage.open(meta_filename, "r") as meta_file:
             meta_data = yaml.YAML(typ="safe", pure=True).load(meta_file)
         if meta_data[exob.EXDIR_METANAME][exob.TYPE_METANAME] == exob.DATASET_TYPENAME:
             return self._dataset(name)
         elif meta_data[exob.EXDIR_METANAME][exob.TYPE_METANAME] == exob.GROUP_TYPENAME:
             return self._group(name)
+        elif meta_data[exob.EXDIR_METANAME][exob.TYPE_METANAME] == exob.RAGGED_DATASET_TYPENAME:
+            return self._ragged_dataset(name)
+        elif meta_data[exob.EXDIR_METANAME][exob.TYPE_METANAME] == exob.TABLE_TYPENAME:
+            return self._table(name)
+        elif meta_data[exob.EXDIR_METANAME][exob.TYPE_METANAME] == exob.SPARSE_DATASET_TYPENAME:
+            return self._sparse_dataset(name)
         else:
             error_string = (
                 "Object {name} has data type {type}.\n"
@@ -417,8 +698,33 @@ class Group(Object):
             )
             raise NotImplementedError(error_string)
 
-    def _dataset(self, name):
+    def _dataset(self, name, packed=False):
         return ds.Dataset(
+            root_directory=self.root_directory,
+            parent_path=self.relative_path,
+            object_name=name,
+            file=self.file,
+            packed=packed
+        )
+
+    def _ragged_dataset(self, name):
+        return rds.RaggedDataset(
+            root_directory=self.root_directory,
+            parent_path=self.relative_path,
+            object_name=name,
+            file=self.file
+        )
+
+    def _table(self, name):
+        return tbl.Table(
+            root_directory=self.root_directory,
+            parent_path=self.relative_path,
+            object_name=name,
+            file=self.file
+        )
+
+    def _sparse_dataset(self, name):
+        return sds.SparseDataset(
             root_directory=self.root_directory,
             parent_path=self.relative_path,
             object_name=name,
@@ -464,7 +770,59 @@ class Group(Object):
             name of the existing child
         """
         assert_file_writable(self.file)
-        exob._remove_object_directory(self[name].directory)
+        obj = self[name]
+        if getattr(obj, "_packed", False):
+            pack.get_pack(self.file, obj.directory.parent).remove(obj.object_name)
+            return
+        exob._remove_object_directory(obj.directory, self.file)
+
+    def repack(self):
+        """
+        Compact the pack file of the group.
+
+        Space left by removed packed datasets is reclaimed.
+        If `pack_threshold` is set on the file, datasets in the group
+        that are smaller than the threshold and have no attributes are
+        moved from their own folders into the pack file.
+        Datasets in subgroups are not affected.
+
+        Datasets of the group that are already open are mapped again from
+        their new place on the next access, but arrays returned by them
+        before the repack keep referring to the old files.
+        """
+        assert_file_writable(self.file)
+        additions = {}
+        threshold = self.file.pack_threshold
+        default_meta = exob._default_metadata(exob.DATASET_TYPENAME)
+        if threshold is not None:
+            for name in self:
+                directory = self.directory / name
+                if not self.file._storage.exists(directory):
+                    continue
+                filenames = sorted(
+                    filename for filename in self.file._storage.listdir(directory)
+                    if filename != locking.LOCK_FILENAME
+                )
+                if filenames != [ds.DATA_FILENAME, exob.META_FILENAME]:
+                    # attributes, derived files or subfolders
+                    continue
+                obj = self[name]
+                if not isinstance(obj, ds.Dataset) or obj.meta.to_dict() != default_meta:
+                    continue
+                if obj._data.nbytes < threshold:
+                    additions[name] = np.array(obj._data)
+
+        group_pack = pack.get_pack(self.file, self.directory)
+        if len(additions) == 0 and group_pack.data_name is None:
+            return
+        # the old pack file and the folders of the moved datasets are
+        # removed, so open datasets must not keep writing to them
+        for owner in self.file._open_maps.owners():
+            if isinstance(owner, ds.Dataset) and owner.directory.parent == self.directory:
+                owner._release_data()
+        group_pack.repack(additions)
+        for name in additions:
+            exob._remove_object_directory(self.directory / name, self.file)
 
     def keys(self):
         """
@@ -501,9 +859,14 @@ class Group(Object):
         Iterate over all the objects in the group.
         """
         assert_file_open(self.file)
-        # NOTE os.walk is way faster than os.listdir + os.path.isdir
-        directories = next(os.walk(str(self.directory)))[1]
-        for name in sorted(directories):
+        storage = self.file._storage
+        names = set(
+            name for name in storage.subdirectories(self.directory)
+            if not name.startswith(exob.STAGING_PREFIX)
+        )
+        if storage.exists(self.directory / exob.PACK_INDEX_FILENAME):
+            names.update(pack.get_pack(self.file, self.directory).names())
+        for name in sorted(names):
             yield name
 
     def __len__(self):
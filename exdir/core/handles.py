@@ -0,0 +1,135 @@
+"""
+Pickling of Files, groups and datasets, for sending them to other
+processes, such as the workers of a :code:`ProcessPoolExecutor`.
+
+An object is pickled as a handle with the folder of its File, its path in
+the File, the mode and options of the File and its plugins.
+No data is pickled.
+When a handle is unpickled, the object is created again without reading
+anything, and its data is mapped on the first access as usual.
+The File is opened once per process and shared by all handles of it,
+with the options of the first handle, and closed when the process exits.
+Handles of writable Files are opened with mode 'r+', so that the File is
+never created or truncated again.
+"""
+
+import atexit
+import importlib
+import inspect
+import multiprocessing.util
+import os
+import pathlib
+import threading
+
+from .mode import OpenMode
+
+# (process, folder, mode) -> File
+_files = {}
+_lock = threading.Lock()
+# the process that registered close_all with multiprocessing
+_finalized_pid = None
+
+
+def _plugin_spec(plugins):
+    """
+    The plugins of a File, with modules replaced by their names, since
+    modules cannot be pickled.
+    """
+    if plugins is None:
+        return None
+    try:
+        plugins = list(plugins)
+    except TypeError:
+        plugins = [plugins]
+    return [
+        ("module", plugin.__name__) if inspect.ismodule(plugin) else ("plugin", plugin)
+        for plugin in plugins
+    ]
+
+
+def _plugins(spec):
+    if spec is None:
+        return None
+    return [
+        importlib.import_module(value) if kind == "module" else value
+        for kind, value in spec
+    ]
+
+
+def file_spec(file):
+    """
+    The folder, mode and options that `file` is opened with in other
+    processes.
+    """
+    from .storage import PosixStorage
+    if type(file._storage) is not PosixStorage:
+        raise TypeError(
+            "Only objects of Files on the file system can be pickled, "
+            "not of Files in {}".format(type(file._storage).__name__)
+        )
+    options = dict(file._options)
+    options["plugins"] = _plugin_spec(options["plugins"])
+    mode = "r" if file.io_mode == OpenMode.READ_ONLY else "r+"
+    return os.path.abspath(str(file.root_directory)), mode, options
+
+
+def open_file(spec):
+    """
+    The File of `spec` in this process, opened on first use.
+    """
+    from .exdir_file import File
+    directory, mode, options = spec
+    key = (os.getpid(), directory, mode)
+    with _lock:
+        _register_finalizer()
+        file = _files.get(key)
+        if file is None or file.io_mode == OpenMode.FILE_CLOSED:
+            options = dict(options)
+            options["plugins"] = _plugins(options["plugins"])
+            file = File(directory, mode=mode, **options)
+            _files[key] = file
+    return file
+
+
+def _register_finalizer():
+    """
+    Close the Files when a process started by multiprocessing exits.
+    Such processes exit without running atexit handlers, and finalizers
+    registered by the parent are dropped when they start, so each process
+    registers its own.
+    """
+    global _finalized_pid
+    if _finalized_pid != os.getpid():
+        multiprocessing.util.Finalize(None, close_all, exitpriority=10)
+        _finalized_pid = os.getpid()
+
+
+def reopen(spec, cls, parent_path, object_name, packed):
+    """
+    Create the object `object_name` of type `cls` in the File of `spec`.
+    """
+    file = open_file(spec)
+    kwargs = {}
+    if packed:
+        kwargs["packed"] = True
+    return cls(
+        root_directory=file.root_directory,
+        parent_path=pathlib.PurePosixPath(parent_path),
+        object_name=object_name,
+        file=file,
+        **kwargs
+    )
+
+
+def close_all():
+    """
+    Close the Files opened for handles by this process.
+    """
+    with _lock:
+        files = [file for (pid, _, _), file in _files.items() if pid == os.getpid()]
+        _files.clear()
+    for file in files:
+        file.close()
+
+
+atexit.register(close_all)
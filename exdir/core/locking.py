@@ -0,0 +1,189 @@
+"""
+Locks that coordinate threads and processes writing to the same File.
+
+Each object has a lock for the threads of a process, which is held while
+the object is changed: while objects are created in it and while its
+attributes, metadata or data files are replaced.
+Reads take no locks, since files are replaced at once and arrays are only
+replaced after they have been written.
+
+Without coordination between processes, two processes can create objects
+with conflicting names in the same group, since names are validated before
+the folder is created, and attribute updates can be lost, since each update
+reads the whole attribute file, changes it and writes it back.
+
+With the :code:`locking` option of File, each object folder also gets a
+lock file that is locked with :code:`flock`:
+
+- exclusively while an object is created in the folder, from the
+  validation of its name until its folder and metadata file exist,
+- exclusively while the attributes or metadata of the object are updated,
+- shared while they are read, so that readers never see partially written
+  files.
+
+Locks held by a thread can be taken again by the same thread, and are
+released when the outermost use ends.
+A shared lock is never upgraded to an exclusive one, since :code:`flock`
+releases the shared lock first, so sections that read and then write take
+the exclusive lock from the start.
+Objects are always locked after the groups that contain them, never the
+other way around, so threads do not deadlock.
+"""
+
+import contextlib
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOCK_FILENAME = ".exdir.lock"
+
+
+class _HeldLock:
+    def __init__(self, descriptor, exclusive):
+        self.descriptor = descriptor
+        self.exclusive = exclusive
+        self.count = 1
+
+
+class Locks:
+    """
+    The locks of the objects of a File.
+    The lock files of the object folders are only used if `enabled`.
+
+    Also counts how often and how long processes waited for each other.
+    """
+    def __init__(self, enabled=False):
+        if enabled and fcntl is None:
+            raise ValueError(
+                "Locking needs the fcntl module, which is not available on this platform"
+            )
+        self.enabled = enabled
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._held = threading.local()
+        self._lock = threading.Lock()
+        # object folder -> lock of the threads of this process
+        self._local = {}
+
+    def local(self, directory):
+        """
+        The lock of the object folder `directory` for the threads of this
+        process, a reentrant lock that is also a context manager.
+        """
+        key = str(directory)
+        lock = self._local.get(key)
+        if lock is None:
+            with self._lock:
+                lock = self._local.setdefault(key, threading.RLock())
+        return lock
+
+    @contextlib.contextmanager
+    def exclusive(self, directory):
+        """
+        Lock the object folder `directory` for writing by this thread and,
+        if enabled, this process, as a context manager.
+        """
+        with self.local(directory):
+            with self._hold(directory, True):
+                yield
+
+    def shared(self, directory):
+        """
+        Lock the object folder `directory` for reading by this process, if
+        enabled, as a context manager.
+        Other threads of the process are not excluded.
+        Lock files are not created for reading, so nothing is locked if
+        the lock file does not exist yet or cannot be opened.
+        """
+        return self._hold(directory, False)
+
+    @contextlib.contextmanager
+    def _hold(self, directory, exclusive):
+        if not self.enabled:
+            yield
+            return
+        filename = os.path.join(str(directory), LOCK_FILENAME)
+        held = getattr(self._held, "locks", None)
+        if held is None:
+            held = self._held.locks = {}
+        lock = held.get(filename)
+        if lock is not None:
+            if exclusive and not lock.exclusive:
+                # flock releases the shared lock before taking the
+                # exclusive one, so another process could change what
+                # was read in between
+                raise RuntimeError(
+                    "Cannot lock '{}' for writing while it is locked for "
+                    "reading, lock it for writing from the start".format(directory)
+                )
+            lock.count += 1
+            try:
+                yield
+            finally:
+                lock.count -= 1
+            return
+
+        descriptor = self._open(filename, exclusive)
+        if descriptor is None:
+            yield
+            return
+        try:
+            self._acquire(descriptor, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            held[filename] = _HeldLock(descriptor, exclusive)
+            try:
+                yield
+            finally:
+                del held[filename]
+                fcntl.flock(descriptor, fcntl.LOCK_UN)
+        finally:
+            os.close(descriptor)
+
+    def _open(self, filename, exclusive):
+        if exclusive:
+            return os.open(filename, os.O_RDWR | os.O_CREAT, 0o666)
+        # readers leave the folders unchanged, also in read-only Files
+        try:
+            return os.open(filename, os.O_RDONLY)
+        except OSError:
+            return None
+
+    def _acquire(self, descriptor, operation):
+        try:
+            fcntl.flock(descriptor, operation | fcntl.LOCK_NB)
+            waited = 0.0
+        except BlockingIOError:
+            start = time.monotonic()
+            fcntl.flock(descriptor, operation)
+            waited = time.monotonic() - start
+        with self._lock:
+            self.acquisitions += 1
+            if waited > 0.0:
+                self.contended += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def statistics(self):
+        """
+        Counters of the locks.
+
+        Returns
+        -------
+        dict
+            The number of :code:`acquisitions`, the number of them that had
+            to wait for another process or thread (:code:`contended`), the
+            total :code:`wait_seconds` and the :code:`max_wait_seconds`.
+        """
+        with self._lock:
+            return {
+                "acquisitions": self.acquisitions,
+                "contended": self.contended,
+                "wait_seconds": self.wait_seconds,
+                "max_wait_seconds": self.max_wait_seconds
+            }
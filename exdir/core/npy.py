@@ -0,0 +1,249 @@
+"""
+Helpers for working directly with NumPy ``.npy`` files on disk.
+
+The functions in this module are used by object types that need to grow
+their arrays along the first axis without rewriting the whole file.
+
+Appended rows are committed by rewriting the header after they have been
+written, so the shape in the header is the committed length of the array.
+Readers in other processes use :code:`read_committed_header`, which never
+returns a header that is being rewritten.
+"""
+
+import os
+import shutil
+import struct
+
+import numpy as np
+
+ARRAY_ALIGN = 64
+
+
+def _length_format(version):
+    if version == (1, 0):
+        return "<H"
+    return "<I"
+
+
+def _read_header(npy_file):
+    version = np.lib.format.read_magic(npy_file)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(npy_file)
+    elif version == (2, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(npy_file)
+    else:
+        raise ValueError(
+            "Unsupported NumPy file format version {}".format(version)
+        )
+    return version, shape, fortran_order, dtype, npy_file.tell()
+
+
+def header_size(prefix):
+    """
+    The number of bytes in the header of a NumPy file, from the first bytes
+    `prefix` of the file, which must include the header length.
+    """
+    magic = np.lib.format.MAGIC_PREFIX
+    length_offset = len(magic) + 2
+    if not prefix.startswith(magic) or len(prefix) < length_offset:
+        raise ValueError("Not a NumPy file")
+    length_format = _length_format(tuple(prefix[len(magic):length_offset]))
+    header_offset = length_offset + struct.calcsize(length_format)
+    if len(prefix) < header_offset:
+        raise ValueError("Truncated NumPy file")
+    length, = struct.unpack(length_format, prefix[length_offset:header_offset])
+    return header_offset + length
+
+
+def read_header(filename):
+    """
+    Read the header of a NumPy file.
+
+    Returns
+    -------
+    tuple
+        The shape, dtype and the offset of the array data in the file.
+    """
+    with open(str(filename), "rb") as npy_file:
+        _, shape, fortran_order, dtype, offset = _read_header(npy_file)
+    if fortran_order and len(shape) > 1:
+        raise ValueError(
+            "Fortran ordered arrays are not supported in '{}'".format(filename)
+        )
+    return shape, dtype, offset
+
+
+def read_committed_header(filename, header_offset=0, attempts=100):
+    """
+    Read the header of a NumPy file that may be appended to by a writer in
+    another process.
+
+    The header is read until two reads in a row agree and the shape fits
+    in the file, so that a header that is partially rewritten is never
+    returned.
+    Rows within the shape have been written before the header, since
+    :code:`append` writes the data first.
+
+    Returns
+    -------
+    tuple
+        The version, shape, Fortran order, dtype and data offset, like
+        :code:`_read_header`.
+    """
+    filename = str(filename)
+    previous = None
+    with open(filename, "rb") as npy_file:
+        for _ in range(attempts):
+            npy_file.seek(header_offset)
+            try:
+                header = _read_header(npy_file)
+            except ValueError:
+                header = None
+            if header is not None and header == previous:
+                _, shape, _, dtype, offset = header
+                size = os.fstat(npy_file.fileno()).st_size
+                if header_offset == 0 and offset + int(np.prod(shape)) * dtype.itemsize > size:
+                    header = None
+                else:
+                    return header
+            previous = header
+    raise ValueError("Could not read a consistent header from '{}'".format(filename))
+
+
+def open_committed_memmap(filename, mode):
+    """
+    Memory-map the committed rows of a NumPy file that may be appended to
+    by a writer in another process, see :code:`read_committed_header`.
+    """
+    _, shape, fortran_order, dtype, offset = read_committed_header(filename)
+    return np.memmap(
+        str(filename),
+        dtype=dtype,
+        mode=mode,
+        offset=offset,
+        shape=shape,
+        order="F" if fortran_order else "C"
+    )
+
+
+def _header_bytes(dtype, shape, version, size=None):
+    """
+    Build a header for an array of the given dtype and shape.
+
+    If `size` is given, the header is padded to exactly `size` bytes,
+    and None is returned if it does not fit.
+    Otherwise the header is padded to the next multiple of ARRAY_ALIGN
+    with room to spare for the first axis to grow.
+    """
+    header = "{{'descr': {!r}, 'fortran_order': False, 'shape': {!r}, }}".format(
+        np.lib.format.dtype_to_descr(dtype),
+        tuple(shape)
+    )
+    length_format = _length_format(version)
+    prefix_size = np.lib.format.MAGIC_LEN + struct.calcsize(length_format)
+    if size is None:
+        # leave room for the first axis to grow to a 21 digit number
+        minimum_size = prefix_size + len(header) + 1 + 21
+        size = -(-minimum_size // ARRAY_ALIGN) * ARRAY_ALIGN
+    padding = size - prefix_size - len(header) - 1
+    if padding < 0:
+        return None
+    header = header + " " * padding + "\n"
+    return (
+        np.lib.format.magic(*version) +
+        struct.pack(length_format, len(header)) +
+        header.encode("latin1")
+    )
+
+
+def write(filename, data):
+    """
+    Write `data` to a new NumPy file with room for appending to it.
+    """
+    data = np.asarray(data, order="C")
+    with open(str(filename), "wb") as npy_file:
+        npy_file.write(_header_bytes(data.dtype, data.shape, (1, 0)))
+        npy_file.write(data.tobytes())
+
+
+def replace(filename, data):
+    """
+    Write `data` to a new NumPy file with room for appending to it, which
+    atomically replaces `filename`.
+    Readers that have mapped the old file keep reading the old data.
+    """
+    filename = str(filename)
+    temporary_filename = filename + ".tmp"
+    write(temporary_filename, data)
+    os.replace(temporary_filename, filename)
+
+
+def append(filename, values):
+    """
+    Append `values` along the first axis of the array stored in `filename`.
+
+    The data is written before the header is updated, so that a reader
+    never sees a shape that covers data that has not been written yet.
+    The header is rewritten in place when it fits, otherwise the file is
+    rewritten with a larger header.
+
+    Returns
+    -------
+    tuple
+        The new shape of the stored array.
+    """
+    filename = str(filename)
+    with open(filename, "r+b") as npy_file:
+        version, shape, fortran_order, dtype, offset = _read_header(npy_file)
+        if len(shape) == 0:
+            raise TypeError("Cannot append to a scalar array in '{}'".format(filename))
+        if fortran_order and len(shape) > 1:
+            raise ValueError(
+                "Cannot append to Fortran ordered array in '{}'".format(filename)
+            )
+
+        values = np.ascontiguousarray(values, dtype=dtype)
+        if values.shape[1:] != shape[1:]:
+            raise ValueError(
+                "Cannot append values with shape {} to array with shape {}".format(
+                    values.shape, shape
+                )
+            )
+
+        new_shape = (shape[0] + values.shape[0],) + shape[1:]
+        header = _header_bytes(dtype, new_shape, version, size=offset)
+        if header is not None:
+            npy_file.seek(offset + int(np.prod(shape)) * dtype.itemsize)
+            npy_file.write(values.tobytes())
+            npy_file.flush()
+            npy_file.seek(0)
+            npy_file.write(header)
+            return new_shape
+
+    # the header did not fit, rewrite the whole file with a larger header
+    temporary_filename = filename + ".tmp"
+    with open(filename, "rb") as npy_file, open(temporary_filename, "wb") as new_file:
+        npy_file.seek(offset)
+        new_file.write(_header_bytes(dtype, new_shape, version))
+        shutil.copyfileobj(npy_file, new_file)
+        new_file.write(values.tobytes())
+    os.replace(temporary_filename, filename)
+    return new_shape
+
+
+def truncate(filename, length):
+    """
+    Shrink the array stored in `filename` to `length` elements along the first axis.
+    """
+    filename = str(filename)
+    with open(filename, "r+b") as npy_file:
+        version, shape, fortran_order, dtype, offset = _read_header(npy_file)
+        if len(shape) == 0 or shape[0] < length:
+            raise ValueError(
+                "Cannot truncate array with shape {} to length {}".format(shape, length)
+            )
+        new_shape = (length,) + shape[1:]
+        npy_file.seek(0)
+        npy_file.write(_header_bytes(dtype, new_shape, version, size=offset))
+        npy_file.truncate(offset + int(np.prod(new_shape)) * dtype.itemsize)
+    return new_shape
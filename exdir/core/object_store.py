@@ -0,0 +1,219 @@
+"""
+Read-only storage of Exdir files in S3-compatible object stores.
+
+Each file of an Exdir object is an object with the path of the file as
+its key, for instance as uploaded with :code:`aws s3 sync`.
+Folders are listed with :code:`ListObjectsV2` requests, metadata files are
+fetched with :code:`GET` requests and datasets are read with range
+requests for the bytes covered by each selection.
+
+Requests are signed with AWS Signature Version 4 when credentials are
+given, and sent anonymously otherwise.
+"""
+
+import datetime
+import hashlib
+import hmac
+import os
+import urllib.parse
+import xml.etree.ElementTree as ElementTree
+
+from . import remote
+
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+
+def _quote(value, safe="-_.~"):
+    return urllib.parse.quote(value, safe=safe)
+
+
+def _hmac(key, message):
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+def _query_string(query):
+    return "&".join(
+        "{}={}".format(_quote(name), _quote(str(value)))
+        for name, value in sorted(query.items())
+    )
+
+
+def sign(method, path, query, headers, access_key, secret_key, region, timestamp):
+    """
+    Compute the AWS Signature Version 4 authorization header of a request
+    to S3.
+
+    Parameters
+    ----------
+    method: str
+        The HTTP method.
+    path: str
+        The path of the request, already quoted.
+    query: dict
+        The query parameters, not quoted.
+    headers: dict
+        The headers to sign, which must include :code:`host`,
+        :code:`x-amz-content-sha256` and :code:`x-amz-date`.
+    timestamp: datetime.datetime
+        The time of the request in UTC.
+
+    Returns
+    -------
+    str
+        The value of the :code:`Authorization` header.
+    """
+    date = timestamp.strftime("%Y%m%d")
+    headers = {name.lower(): " ".join(str(value).split()) for name, value in headers.items()}
+    signed_headers = ";".join(sorted(headers))
+    canonical_request = "\n".join([
+        method,
+        path,
+        _query_string(query),
+        "".join("{}:{}\n".format(name, headers[name]) for name in sorted(headers)),
+        signed_headers,
+        headers["x-amz-content-sha256"]
+    ])
+    scope = "{}/{}/s3/aws4_request".format(date, region)
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256",
+        headers["x-amz-date"],
+        scope,
+        hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()
+    ])
+    key = _hmac(("AWS4" + secret_key).encode("utf-8"), date)
+    for part in (region, "s3", "aws4_request"):
+        key = _hmac(key, part)
+    signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+    return "AWS4-HMAC-SHA256 Credential={}/{}, SignedHeaders={}, Signature={}".format(
+        access_key, scope, signed_headers, signature
+    )
+
+
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _children(element, name):
+    return [child for child in element if _local_name(child.tag) == name]
+
+
+def _text(element, name):
+    for child in _children(element, name):
+        return child.text or ""
+    return ""
+
+
+class ObjectStoreStorage(remote.RemoteStorage):
+    """
+    Read-only access to Exdir files in a bucket of an S3-compatible object
+    store, such as Amazon S3, MinIO or Ceph.
+
+        >>> store = exdir.core.object_store.ObjectStoreStorage(
+        ...     "https://s3.example.com", "experiments",
+        ...     cache_directory="~/.cache/exdir"
+        ... )
+        >>> f = exdir.File("2019/session_12.exdir", mode="r", storage=store)
+
+    The directory of the File is the prefix of its keys in the bucket.
+    Files can also be opened with URLs such as
+    :code:`s3://experiments/2019/session_12.exdir`, using the endpoint in
+    the :code:`AWS_ENDPOINT_URL` environment variable.
+
+    Parameters
+    ----------
+    endpoint: str
+        The URL of the object store. Buckets are addressed by path.
+    bucket: str
+        The name of the bucket.
+    access_key: str, optional
+        The access key ID. Defaults to the :code:`AWS_ACCESS_KEY_ID`
+        environment variable.
+        Requests are not signed if there is no access key.
+    secret_key: str, optional
+        The secret access key. Defaults to the
+        :code:`AWS_SECRET_ACCESS_KEY` environment variable.
+    region: str, optional
+        The region used in signatures. Defaults to the
+        :code:`AWS_DEFAULT_REGION` environment variable or 'us-east-1'.
+    max_connections: int, optional
+        The maximum number of idle connections kept open.
+
+    See :class:`.RemoteStorage` for the other parameters.
+    """
+    def __init__(self, endpoint, bucket, access_key=None, secret_key=None,
+                 region=None, max_connections=8, **kwargs):
+        super().__init__(**kwargs)
+        self.endpoint = endpoint.rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key or os.environ.get("AWS_ACCESS_KEY_ID")
+        self.secret_key = secret_key or os.environ.get("AWS_SECRET_ACCESS_KEY")
+        self.region = region or os.environ.get("AWS_DEFAULT_REGION", "us-east-1")
+        self._base_path = urllib.parse.urlsplit(self.endpoint).path.rstrip("/")
+        self._pool = remote.ConnectionPool(self.endpoint, max_connections)
+
+    def url(self, key):
+        return "{}/{}/{}".format(self.endpoint, self.bucket, key)
+
+    def _request(self, key, query=None, headers=None):
+        query = query or {}
+        path = "{}/{}".format(self._base_path, _quote(self.bucket))
+        if key or not query:
+            path += "/" + _quote(key, safe="-_.~/")
+        headers = dict(headers or {})
+        if self.access_key is not None:
+            timestamp = datetime.datetime.now(datetime.timezone.utc)
+            headers["host"] = self._pool.host
+            headers["x-amz-date"] = timestamp.strftime("%Y%m%dT%H%M%SZ")
+            headers["x-amz-content-sha256"] = EMPTY_SHA256
+            headers["authorization"] = sign(
+                "GET", path, query, headers,
+                self.access_key, self.secret_key, self.region, timestamp
+            )
+        if query:
+            path += "?" + _query_string(query)
+        status, reason, _, body = self._pool.request("GET", path, headers)
+        remote._raise_for_status(status, reason, self.url(key))
+        return body
+
+    def _list(self, key):
+        prefix = key + "/" if key else ""
+        folders = set()
+        files = {}
+        token = None
+        while True:
+            query = {"list-type": "2", "prefix": prefix, "delimiter": "/"}
+            if token is not None:
+                query["continuation-token"] = token
+            result = ElementTree.fromstring(self._request("", query))
+            for common_prefix in _children(result, "CommonPrefixes"):
+                name = _text(common_prefix, "Prefix")[len(prefix):].rstrip("/")
+                if name:
+                    folders.add(name)
+            for content in _children(result, "Contents"):
+                name = _text(content, "Key")[len(prefix):]
+                if name and "/" not in name:
+                    files[name] = (int(_text(content, "Size")), _text(content, "ETag"))
+            if _text(result, "IsTruncated") != "true":
+                return folders, files
+            token = _text(result, "NextContinuationToken")
+
+    def _get(self, key, start=None, stop=None):
+        headers = {}
+        if start is not None:
+            headers["range"] = "bytes={}-{}".format(start, stop - 1)
+        return self._request(key, headers=headers)
+
+    def close(self):
+        super().close()
+        self._pool.close()
+
+
+def from_url(url, **kwargs):
+    """
+    Create the storage of a URL like :code:`s3://bucket/path` and return
+    it together with the directory of the File in it.
+    """
+    parsed = urllib.parse.urlsplit(url)
+    endpoint = os.environ.get("AWS_ENDPOINT_URL", "https://s3.amazonaws.com")
+    store = ObjectStoreStorage(endpoint, parsed.netloc, **kwargs)
+    return store, parsed.path.lstrip("/")
@@ -0,0 +1,211 @@
+"""
+Bookkeeping of the memory maps held by the objects of a File.
+
+Every dataset maps its data files lazily on first access and keeps the maps
+until it is released.
+Files with very many datasets can therefore run into the per-process limit
+on memory maps (:code:`vm.max_map_count` on Linux) or map more address space
+than is wanted.
+The objects register their maps here, and when a File has a budget the
+least recently used objects release their maps.
+They map their files again on the next access.
+"""
+
+import collections
+import threading
+import weakref
+
+
+class OpenMaps:
+    """
+    The objects of a File that hold memory maps, in least recently used order.
+
+    Objects register with :code:`add` after mapping their files, call
+    :code:`touch` when they use their maps and :code:`remove` when they
+    release their maps.
+    Objects that are evicted have their :code:`_release_data` method called.
+
+    Parameters
+    ----------
+    max_open_maps: int, optional
+        The maximum number of memory maps held at a time.
+    max_mapped_bytes: int, optional
+        The maximum number of bytes mapped at a time.
+
+    Note
+    ----
+    Arrays returned from datasets may be views of the maps.
+    A map is only closed when such views are also deleted.
+
+    The registry can be used from several threads.
+    Evicted objects release their maps after the registry is unlocked, so
+    that they can take their own locks.
+    """
+    def __init__(self, max_open_maps=None, max_mapped_bytes=None):
+        if max_open_maps is not None and max_open_maps < 1:
+            raise ValueError(
+                "max_open_maps must be positive, got {}".format(max_open_maps)
+            )
+        if max_mapped_bytes is not None and max_mapped_bytes < 0:
+            raise ValueError(
+                "max_mapped_bytes cannot be negative, got {}".format(max_mapped_bytes)
+            )
+        self.max_open_maps = max_open_maps
+        self.max_mapped_bytes = max_mapped_bytes
+        self.open_maps = 0
+        self.mapped_bytes = 0
+        self.maps = 0
+        self.evictions = 0
+        self.remaps = 0
+        # id(owner) -> [weak reference, number of maps, mapped bytes]
+        self._entries = collections.OrderedDict()
+        # id(owner) -> weak reference, for owners that were evicted
+        self._evicted = {}
+        # reentrant, since references may be collected while it is held
+        self._lock = threading.RLock()
+
+    @property
+    def bounded(self):
+        return self.max_open_maps is not None or self.max_mapped_bytes is not None
+
+    def _forget(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.open_maps -= entry[1]
+            self.mapped_bytes -= entry[2]
+
+    def _reference(self, owner, key):
+        def collected(reference, entries=self._entries, evicted=self._evicted):
+            # the maps of the owner are closed with it, unless there are
+            # views of them left
+            with self._lock:
+                entry = entries.get(key)
+                if entry is not None and entry[0] is reference:
+                    self._forget(key)
+                if evicted.get(key) is reference:
+                    del evicted[key]
+        return weakref.ref(owner, collected)
+
+    def add(self, owner, count=1, nbytes=0):
+        """
+        Register `count` new maps of `nbytes` bytes held by `owner` and
+        evict the least recently used objects if the budget is exceeded.
+        """
+        key = id(owner)
+        with self._lock:
+            self.maps += count
+            evicted = self._evicted.pop(key, None)
+            if evicted is not None and evicted() is owner:
+                self.remaps += 1
+
+            entry = self._entries.get(key)
+            if entry is None or entry[0]() is not owner:
+                self._forget(key)
+                entry = [self._reference(owner, key), 0, 0]
+                self._entries[key] = entry
+            else:
+                self._entries.move_to_end(key)
+            entry[1] += count
+            entry[2] += nbytes
+            self.open_maps += count
+            self.mapped_bytes += nbytes
+            released = self._evict()
+        for old_owner in released:
+            old_owner._release_data()
+
+    def touch(self, owner):
+        """
+        Mark the maps of `owner` as recently used.
+        """
+        if self.bounded:
+            key = id(owner)
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+
+    def remove(self, owner):
+        """
+        Unregister the maps of `owner` after it has released them.
+        """
+        key = id(owner)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0]() is owner:
+                self._forget(key)
+
+    def _over_budget(self):
+        if self.max_open_maps is not None and self.open_maps > self.max_open_maps:
+            return True
+        if self.max_mapped_bytes is not None and self.mapped_bytes > self.max_mapped_bytes:
+            return True
+        return False
+
+    def _evict(self):
+        """
+        Unregister the least recently used objects until the budget is met
+        and return them, so that they can release their maps.
+        """
+        released = []
+        # the most recently used object is kept even if it alone
+        # is over the budget
+        while self._over_budget() and len(self._entries) > 1:
+            key, entry = next(iter(self._entries.items()))
+            self._forget(key)
+            owner = entry[0]()
+            if owner is None:
+                continue
+            self.evictions += 1
+            self._evicted[key] = entry[0]
+            released.append(owner)
+        return released
+
+    def release_all(self):
+        """
+        Release the maps of all objects, for instance when the File is
+        closed.
+        Takes time proportional to the number of objects holding maps.
+        """
+        with self._lock:
+            owners = self.owners()
+            self._entries.clear()
+            self._evicted.clear()
+            self.open_maps = 0
+            self.mapped_bytes = 0
+        for owner in owners:
+            owner._release_data()
+
+    def owners(self):
+        """
+        The objects that currently hold maps, least recently used first.
+        """
+        owners = []
+        with self._lock:
+            entries = list(self._entries.values())
+        for entry in entries:
+            owner = entry[0]()
+            if owner is not None:
+                owners.append(owner)
+        return owners
+
+    def statistics(self):
+        """
+        Counters of the maps held by the objects of the File.
+
+        Returns
+        -------
+        dict
+            The number of currently open maps and mapped bytes, the total
+            number of maps made, the number of times objects were evicted
+            and the number of times evicted objects mapped their files again.
+        """
+        with self._lock:
+            return self._statistics()
+
+    def _statistics(self):
+        return {
+            "open_maps": self.open_maps,
+            "mapped_bytes": self.mapped_bytes,
+            "maps": self.maps,
+            "evictions": self.evictions,
+            "remaps": self.remaps
+        }
@@ -0,0 +1,257 @@
+"""
+Packed storage of small datasets.
+
+Instead of one folder with an exdir.yaml and a data.npy file per dataset,
+small datasets without attributes can be stored back to back in a single
+pack file in the folder of their group.
+Each entry in the pack file is a complete NumPy file, aligned to 64 bytes,
+so that it can be memory-mapped like a normal dataset.
+
+The pack index is a text file with one line per change::
+
+    #__pack__.0.data
+    name<TAB>offset<TAB>size
+    removed_name<TAB>-1<TAB>0
+
+The first line names the current pack file.
+Entries are only ever appended to the pack file and the index, in that
+order, so a reader never sees an index entry before its data is written.
+Removed entries leave unused space in the pack file that is reclaimed by
+:code:`repack`.
+The pack of a group is shared by the threads using a File, and changed by
+one of them at a time.
+"""
+
+import functools
+import os
+import threading
+import numpy as np
+
+from . import npy
+from .constants import PACK_INDEX_FILENAME
+
+ALIGNMENT = 64
+REMOVED = -1
+
+
+def _data_filename(generation):
+    return "__pack__.{}.data".format(generation)
+
+
+def _assert_packable_name(name):
+    if "\t" in name or "\n" in name or name.startswith("#"):
+        raise ValueError("Name '{}' cannot be stored in a pack".format(name))
+
+
+def _synchronized(method):
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return locked
+
+
+class Pack:
+    """
+    The pack of small datasets in the folder of a group.
+
+    Use :code:`get_pack` to get the cached pack of a group.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_filename = directory / PACK_INDEX_FILENAME
+        self.data_name = None
+        self.entries = {}
+        self._stat = None
+        self._lock = threading.RLock()
+
+    @property
+    def data_filename(self):
+        return self.directory / self.data_name
+
+    def _index_stat(self):
+        try:
+            stat = os.stat(str(self.index_filename))
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    @_synchronized
+    def refresh(self):
+        """
+        Reload the index if it has been changed since it was last read.
+        """
+        key = self._index_stat()
+        if key is None:
+            self.data_name = None
+            self.entries = {}
+            self._stat = None
+            return
+        if key == self._stat:
+            return
+
+        entries = {}
+        data_name = None
+        with self.index_filename.open("r", encoding="utf-8") as index_file:
+            for line in index_file:
+                line = line.rstrip("\n")
+                if line.startswith("#"):
+                    data_name = line[1:]
+                    continue
+                if not line:
+                    continue
+                name, offset, size = line.split("\t")
+                offset = int(offset)
+                if offset == REMOVED:
+                    entries.pop(name, None)
+                else:
+                    entries[name] = (offset, int(size))
+        self.data_name = data_name
+        self.entries = entries
+        self._stat = key
+
+    def _write_index_lines(self, lines):
+        """
+        Append to the index, which must be up to date before the call.
+        The in-memory entries are updated by the caller, so the index does
+        not need to be read again.
+        """
+        with self.index_filename.open("a", encoding="utf-8") as index_file:
+            index_file.write("".join(lines))
+        self._stat = self._index_stat()
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def names(self):
+        return list(self.entries.keys())
+
+    @_synchronized
+    def add(self, name, data):
+        """
+        Append `data` to the pack as an entry with the given name.
+        """
+        _assert_packable_name(name)
+        data = np.asarray(data, order="C")
+        self.refresh()
+        if self.data_name is None:
+            self.data_name = _data_filename(0)
+            self._write_index_lines(["#" + self.data_name + "\n"])
+
+        blob = npy._header_bytes(data.dtype, data.shape, (1, 0)) + data.tobytes()
+        with open(str(self.data_filename), "ab") as data_file:
+            end = data_file.tell()
+            padding = -end % ALIGNMENT
+            data_file.write(b"\0" * padding)
+            data_file.write(blob)
+        offset = end + padding
+
+        self._write_index_lines(["{}\t{}\t{}\n".format(name, offset, len(blob))])
+        self.entries[name] = (offset, len(blob))
+
+    @_synchronized
+    def remove(self, name):
+        """
+        Remove the entry with the given name from the index.
+        """
+        self.refresh()
+        self._write_index_lines(["{}\t{}\t0\n".format(name, REMOVED)])
+        self.entries.pop(name, None)
+
+    @_synchronized
+    def memmap(self, name, mode):
+        """
+        Memory-map the array of the entry with the given name.
+        """
+        offset, _ = self.entries[name]
+        with open(str(self.data_filename), "rb") as data_file:
+            data_file.seek(offset)
+            _, shape, fortran_order, dtype, data_offset = npy._read_header(data_file)
+        return np.memmap(
+            str(self.data_filename),
+            dtype=dtype,
+            mode=mode,
+            offset=data_offset,
+            shape=shape,
+            order="F" if fortran_order else "C"
+        )
+
+    @_synchronized
+    def pread(self, name, mode, cache=None):
+        """
+        Open the array of the entry with the given name for access with
+        explicit reads and writes.
+        """
+        from .pread import PreadArray
+        offset, _ = self.entries[name]
+        return PreadArray(self.data_filename, mode, header_offset=offset, cache=cache)
+
+    def read(self, name):
+        return np.array(self.memmap(name, "r"))
+
+    @_synchronized
+    def repack(self, additions=None):
+        """
+        Write the live entries and `additions` to a new pack file and
+        switch to it by atomically replacing the index.
+        """
+        self.refresh()
+        additions = additions or {}
+        generation = 0
+        if self.data_name is not None:
+            generation = int(self.data_name.split(".")[1]) + 1
+        new_data_name = _data_filename(generation)
+
+        lines = ["#" + new_data_name + "\n"]
+        offset = 0
+        with open(str(self.directory / new_data_name), "wb") as data_file:
+            arrays = [(name, self.read(name)) for name in self.entries]
+            arrays.extend(additions.items())
+            for name, data in arrays:
+                _assert_packable_name(name)
+                data = np.asarray(data, order="C")
+                blob = npy._header_bytes(data.dtype, data.shape, (1, 0)) + data.tobytes()
+                padding = -offset % ALIGNMENT
+                data_file.write(b"\0" * padding)
+                offset += padding
+                data_file.write(blob)
+                lines.append("{}\t{}\t{}\n".format(name, offset, len(blob)))
+                offset += len(blob)
+
+        temporary_filename = self.index_filename.with_name(PACK_INDEX_FILENAME + ".tmp")
+        with temporary_filename.open("w", encoding="utf-8") as index_file:
+            index_file.write("".join(lines))
+        os.replace(str(temporary_filename), str(self.index_filename))
+
+        old_data_name = self.data_name
+        self._stat = None
+        self.refresh()
+        if old_data_name is not None and old_data_name != new_data_name:
+            old_data_filename = self.directory / old_data_name
+            if old_data_filename.exists():
+                old_data_filename.unlink()
+
+
+def get_pack(file, directory):
+    """
+    Get the up to date pack of the group in `directory`,
+    cached on the given File.
+    """
+    key = str(directory)
+    pack = file._packs.get(key)
+    if pack is None:
+        pack = file._packs.setdefault(key, Pack(directory))
+    pack.refresh()
+    return pack
+
+
+def contains(file, directory, name):
+    """
+    Check if the pack of the group in `directory` has an entry `name`.
+    Packs are only used for files on the file system.
+    """
+    if not file._storage.local:
+        return False
+    if not (directory / PACK_INDEX_FILENAME).exists():
+        return False
+    return name in get_pack(file, directory)
@@ -0,0 +1,113 @@
+"""
+Writes to disjoint parts of one dataset from several processes, see
+:meth:`.Dataset.open_for_parallel_write`.
+"""
+
+import os
+
+import numpy as np
+
+from . import npy
+
+
+class ParallelWriter:
+    """
+    A handle for writing to the data of a dataset from other processes,
+    such as the workers of a :code:`ProcessPoolExecutor`.
+
+    The handle is pickled without its data.
+    Each process memory-maps the data file on its first write, and
+    assignments only change the values they are given, so processes may
+    write to any parts of the dataset that do not overlap, including
+    interleaved columns.
+    No metadata or attributes are read or written by the workers.
+    When all workers are done, :meth:`commit` is called once by the
+    process that opened the handle.
+
+    The dataset must not be given new data, appended to or resized while
+    the handle is in use.
+    """
+    def __init__(self, dataset, inode):
+        self.name = dataset.name
+        self.filename = dataset.data_filename
+        _, shape, fortran_order, dtype, offset = npy.read_committed_header(self.filename)
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self._fortran_order = fortran_order
+        self._offset = offset
+        self._inode = inode
+        # only in the process that opened the handle
+        self._dataset = dataset
+        self._memmap = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_dataset"] = None
+        state["_memmap"] = None
+        return state
+
+    def _assert_unchanged(self):
+        _, shape, fortran_order, dtype, offset = npy.read_committed_header(self.filename)
+        if (os.stat(self.filename).st_ino != self._inode or
+                (tuple(shape), fortran_order, dtype, offset) !=
+                (self.shape, self._fortran_order, self.dtype, self._offset)):
+            raise RuntimeError(
+                "The data of '{}' was replaced after it was opened "
+                "for parallel writes".format(self.name)
+            )
+
+    @property
+    def _data(self):
+        if self._memmap is None:
+            self._assert_unchanged()
+            self._memmap = np.memmap(
+                self.filename,
+                dtype=self.dtype,
+                mode="r+",
+                offset=self._offset,
+                shape=self.shape,
+                order="F" if self._fortran_order else "C"
+            )
+        return self._memmap
+
+    def __getitem__(self, args):
+        return self._data[args]
+
+    def __setitem__(self, args, value):
+        self._data[args] = value
+
+    def flush(self):
+        """
+        Write the values written by this process to disk.
+        Not needed for other processes to see them.
+        """
+        if self._memmap is not None:
+            self._memmap.flush()
+
+    def commit(self, attrs=None):
+        """
+        Sync the values written by all processes to disk, unless the sync
+        mode of the File is 'none', update the data stored alongside the
+        dataset, such as its index and statistics, and update its
+        attributes with `attrs`, each only once.
+
+        Must be called by the process that opened the handle, after the
+        other processes are done writing.
+
+        Parameters
+        ----------
+        attrs: dict, optional
+            Attributes to set on the dataset.
+        """
+        if self._dataset is None:
+            raise RuntimeError(
+                "Parallel writes to '{}' can only be committed by the "
+                "process that opened them".format(self.name)
+            )
+        self.flush()
+        self._dataset._commit_parallel_write(self, attrs)
+
+    def __repr__(self):
+        return "ParallelWriter({!r}, shape={}, dtype={})".format(
+            self.name, self.shape, self.dtype
+        )
@@ -0,0 +1,375 @@
+"""
+Access to data files with explicit reads and writes instead of memory maps.
+
+On network file systems such as NFS and Lustre, every page fault in a
+memory map can become a separate small request to the server.
+:code:`PreadArray` instead serves each indexing operation with a few large
+reads of the rows it covers, aligned to :code:`ALIGNMENT` bytes, and writes
+contiguous rows with a single write.
+
+It implements the parts of the :code:`numpy.memmap` interface that datasets
+use, so that datasets work the same with both backends.
+"""
+
+import numbers
+import os
+
+import numpy as np
+
+from . import npy
+
+# reads are aligned to and rounded up to multiples of this size
+ALIGNMENT = 1 << 16
+
+# the largest number of bytes requested in a single read or write call
+MAX_REQUEST_BYTES = 1 << 26
+
+# rows of fancy indexing are read one run at a time when reading all rows
+# between the first and last selected row reads more than this many
+# times the selected rows
+SPARSE_READ_FACTOR = 4
+
+
+def _read_into(descriptor, buffer, offset):
+    """
+    Read into `buffer` from `offset` and return the number of bytes read.
+    """
+    return os.preadv(descriptor, [buffer], offset)
+
+
+def _write_from(descriptor, buffer, offset):
+    """
+    Write `buffer` at `offset` and return the number of bytes written.
+    """
+    return os.pwrite(descriptor, buffer, offset)
+
+
+def read_exactly(descriptor, buffer, offset):
+    """
+    Fill `buffer` with the bytes from `offset`, with as few read calls as
+    possible.
+    Bytes past the end of the file are left as they are.
+    """
+    view = memoryview(buffer).cast("B")
+    position = 0
+    while position < len(view):
+        stop = min(len(view), position + MAX_REQUEST_BYTES)
+        count = _read_into(descriptor, view[position:stop], offset + position)
+        if count == 0:
+            break
+        position += count
+    return position
+
+
+def write_exactly(descriptor, buffer, offset):
+    view = memoryview(buffer).cast("B")
+    position = 0
+    while position < len(view):
+        stop = min(len(view), position + MAX_REQUEST_BYTES)
+        position += _write_from(descriptor, view[position:stop], offset + position)
+
+
+class _Flags:
+    def __init__(self, writeable):
+        self.writeable = writeable
+        self.c_contiguous = True
+
+
+class PreadArray:
+    """
+    An array stored in a NumPy file that is read with :code:`preadv` and
+    written with :code:`pwrite`.
+
+    Indexing returns new arrays, not views of the file.
+
+    Parameters
+    ----------
+    filename: str
+        The file containing the array.
+    mode: str
+        :code:`"r"` for read-only or :code:`"r+"` for read and write access.
+    header_offset: int
+        The position of the NumPy header in the file.
+    cache: BlockCache, optional
+        A cache of blocks of files that reads are served from.
+    swmr: bool, optional
+        If True, the header is read with :code:`npy.read_committed_header`,
+        for files that a writer in another process appends to.
+    """
+    # runs of rows separated by at most this many bytes are read with a
+    # single request
+    coalesce_bytes = 0
+
+    def __init__(self, filename, mode="r", header_offset=0, cache=None, swmr=False):
+        self.filename = str(filename)
+        if swmr:
+            header = npy.read_committed_header(self.filename, header_offset)
+        else:
+            with open(self.filename, "rb") as npy_file:
+                npy_file.seek(header_offset)
+                header = npy._read_header(npy_file)
+        self._set_header(header, mode)
+        flags = os.O_RDWR if mode != "r" else os.O_RDONLY
+        self._descriptor = os.open(self.filename, flags)
+        self._cache = cache
+
+    def _set_header(self, header, mode):
+        _, shape, fortran_order, dtype, offset = header
+        if fortran_order and len(shape) > 1:
+            raise ValueError(
+                "Fortran ordered arrays cannot be read with pread "
+                "in '{}'".format(self.filename)
+            )
+        if dtype.hasobject:
+            raise ValueError(
+                "Object arrays cannot be read with pread in '{}'".format(self.filename)
+            )
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.offset = offset
+        self.flags = _Flags(mode != "r")
+        self.mode = mode
+        self.reads = 0
+        self.writes = 0
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape, dtype=np.int64))
+
+    @property
+    def nbytes(self):
+        return self.size * self.dtype.itemsize
+
+    @property
+    def _row_bytes(self):
+        return int(np.prod(self.shape[1:], dtype=np.int64)) * self.dtype.itemsize
+
+    @property
+    def strides(self):
+        strides = []
+        stride = self.dtype.itemsize
+        for size in reversed(self.shape):
+            strides.insert(0, stride)
+            stride *= size
+        return tuple(strides)
+
+    def __len__(self):
+        if self.ndim == 0:
+            raise TypeError("len() of unsized object")
+        return self.shape[0]
+
+    def close(self):
+        if getattr(self, "_descriptor", None) is not None:
+            os.close(self._descriptor)
+            self._descriptor = None
+
+    def __del__(self):
+        self.close()
+
+    def flush(self):
+        # writes go directly to the file
+        pass
+
+    def _read_file_range(self, start, stop):
+        buffer = np.empty(stop - start, dtype=np.uint8)
+        count = read_exactly(self._descriptor, buffer, start)
+        self.reads += 1
+        return buffer[:count]
+
+    def _read_bytes(self, start, stop):
+        """
+        Read the data bytes `start` to `stop` with a read aligned to
+        ALIGNMENT in the file, or from the cache.
+        """
+        first = self.offset + start
+        if self._cache is not None:
+            return self._cache.read(
+                self.filename, first, self.offset + stop, self._read_file_range
+            )
+        aligned_first = first - first % ALIGNMENT
+        last = self.offset + stop
+        # the end is not rounded up past the end of the array, which is
+        # often the end of the file
+        aligned_last = min(-(-last // ALIGNMENT) * ALIGNMENT, self.offset + self.nbytes)
+        buffer = self._read_file_range(aligned_first, aligned_last)
+        return buffer[first - aligned_first:last - aligned_first]
+
+    def _read_rows(self, first, last):
+        """
+        Read the rows `first` to `last` into a new array.
+        """
+        if self.ndim == 0:
+            data = self._read_bytes(0, self.dtype.itemsize)
+            return data.view(self.dtype).reshape(())
+        last = max(first, last)
+        if last == first:
+            return np.empty((0,) + self.shape[1:], dtype=self.dtype)
+        data = self._read_bytes(first * self._row_bytes, last * self._row_bytes)
+        return data.view(self.dtype).reshape((last - first,) + self.shape[1:])
+
+    def _split_key(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if len(key) == 0:
+            return slice(None), ()
+        if key[0] is Ellipsis:
+            if len(key) - 1 >= self.ndim:
+                # the ellipsis is empty
+                return self._split_key(key[1:])
+            return slice(None), key
+        return key[0], key[1:]
+
+    def _rows(self, first_key):
+        """
+        Find the rows to read for an index along the first axis.
+
+        Returns
+        -------
+        tuple
+            The first and last row to read and the index into the rows.
+        """
+        length = self.shape[0]
+        if isinstance(first_key, numbers.Integral):
+            row = int(first_key)
+            if row < -length or row >= length:
+                raise IndexError(
+                    "index {} is out of bounds for axis 0 with size {}".format(row, length)
+                )
+            row %= length
+            return row, row + 1, 0
+        if isinstance(first_key, slice):
+            rows = range(*first_key.indices(length))
+            if len(rows) == 0:
+                return 0, 0, slice(0, 0)
+            first = min(rows[0], rows[-1])
+            last = max(rows[0], rows[-1]) + 1
+            stop = rows[-1] - first + rows.step
+            return first, last, slice(rows[0] - first, stop if stop >= 0 else None, rows.step)
+        if first_key is Ellipsis:
+            return 0, length, slice(None)
+        rows = np.asarray(first_key)
+        if rows.dtype == bool:
+            if len(rows) != length:
+                raise IndexError(
+                    "boolean index of length {} does not match axis 0 "
+                    "with size {}".format(len(rows), length)
+                )
+            rows = np.flatnonzero(rows)
+        rows = rows.astype(np.int64)
+        if np.any((rows < -length) | (rows >= length)):
+            raise IndexError("index is out of bounds for axis 0 with size {}".format(length))
+        rows = np.where(rows < 0, rows + length, rows)
+        if rows.size == 0:
+            return 0, 0, rows
+        first = int(rows.min())
+        last = int(rows.max()) + 1
+        return first, last, rows - first
+
+    def _gather(self, rows):
+        """
+        Read the given rows, one run of nearby rows at a time.
+        """
+        unique, inverse = np.unique(rows, return_inverse=True)
+        gap = 1 + self.coalesce_bytes // max(self._row_bytes, 1)
+        breaks = np.flatnonzero(np.diff(unique) > gap) + 1
+        runs = np.split(unique, breaks)
+
+        def read_run(run):
+            block = self._read_rows(run[0], run[-1] + 1)
+            if len(block) == len(run):
+                return block
+            return block[run - run[0]]
+        blocks = self._map(read_run, runs)
+        block = np.concatenate(blocks)
+        return block[inverse.reshape(rows.shape)]
+
+    def _map(self, function, items):
+        """
+        Apply `function` to each of `items`, which subclasses may do in
+        parallel.
+        """
+        return [function(item) for item in items]
+
+    def _is_field_key(self, key):
+        if isinstance(key, str):
+            return True
+        return (
+            isinstance(key, list) and len(key) > 0 and
+            all(isinstance(name, str) for name in key)
+        )
+
+    def __getitem__(self, key):
+        if self.ndim == 0:
+            return self._read_rows(0, 1)[key]
+        if self._is_field_key(key):
+            return self._read_rows(0, self.shape[0])[key]
+        first_key, rest = self._split_key(key)
+        first, last, local = self._rows(first_key)
+        if (isinstance(local, np.ndarray) and local.size > 0 and
+                (last - first) > SPARSE_READ_FACTOR * len(np.unique(local))):
+            return self._gather(local + first)[(slice(None),) + rest]
+        block = self._read_rows(first, last)
+        return block[(local,) + rest]
+
+    def __setitem__(self, key, value):
+        if self.mode == "r":
+            raise ValueError("assignment destination is read-only")
+        if self.ndim == 0:
+            data = np.array(value, dtype=self.dtype).reshape(())
+            write_exactly(self._descriptor, data.tobytes(), self.offset)
+            self._written(self.offset, self.offset + self.dtype.itemsize)
+            return
+        if self._is_field_key(key):
+            block = self._read_rows(0, self.shape[0]).copy()
+            block[key] = value
+            write_exactly(self._descriptor, block, self.offset)
+            self._written(self.offset, self.offset + self.nbytes)
+            return
+        first_key, rest = self._split_key(key)
+        first, last, local = self._rows(first_key)
+        if last == first:
+            return
+        whole_rows = all(
+            isinstance(part, slice) and part == slice(None) or part is Ellipsis
+            for part in rest
+        )
+        contiguous = (
+            isinstance(local, numbers.Integral) or
+            (isinstance(local, slice) and local.step == 1)
+        )
+        if contiguous and whole_rows:
+            block = np.empty((last - first,) + self.shape[1:], dtype=self.dtype)
+            block[local if isinstance(local, numbers.Integral) else slice(None)] = value
+        else:
+            # read, modify and write back the rows that are touched
+            block = self._read_rows(first, last).copy()
+            block[(local,) + rest] = value
+        write_exactly(
+            self._descriptor,
+            np.ascontiguousarray(block),
+            self.offset + first * self._row_bytes
+        )
+        self._written(
+            self.offset + first * self._row_bytes,
+            self.offset + last * self._row_bytes
+        )
+
+    def _written(self, start, stop):
+        self.writes += 1
+        if self._cache is not None:
+            self._cache.invalidate(self.filename, start, stop)
+
+    def __array__(self, dtype=None):
+        data = self[...]
+        if dtype is not None:
+            data = data.astype(dtype)
+        return data
+
+    def __repr__(self):
+        return "PreadArray({!r}, shape={}, dtype={})".format(
+            self.filename, self.shape, self.dtype
+        )
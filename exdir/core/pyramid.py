@@ -0,0 +1,204 @@
+"""
+Downsampled levels of long signals for fast overviews.
+
+Each level stores the minimum, maximum and mean of every bucket of
+`factor` rows along the first axis in a separate NumPy file in the dataset
+folder, with the shape ``(buckets, 3) + data.shape[1:]``.
+Levels are computed from the finest level they are a multiple of, so only
+the data itself is read for the finest level.
+"""
+
+import numpy as np
+
+from . import npy
+
+PYRAMID_METANAME = "pyramid"
+FACTORS_METANAME = "factors"
+
+MIN, MAX, MEAN = 0, 1, 2
+
+# number of source rows that are reduced at a time
+CHUNK_ROWS = 1 << 20
+
+
+def level_filename(dataset_directory, factor):
+    return dataset_directory / "pyramid_{}.npy".format(factor)
+
+
+def _bucket_count(length, factor):
+    return -(-length // factor)
+
+
+def _assert_numeric(data):
+    if len(data.shape) == 0:
+        raise ValueError("Cannot build a pyramid of a scalar dataset")
+    if not (np.issubdtype(data.dtype, np.integer) or
+            np.issubdtype(data.dtype, np.floating) or
+            np.issubdtype(data.dtype, np.bool_)):
+        raise ValueError(
+            "Cannot build a pyramid of data type {}".format(data.dtype)
+        )
+
+
+def _source(factor, factors):
+    """
+    Find the finest level that `factor` can be computed from.
+    """
+    source = 1
+    for candidate in factors:
+        if candidate < factor and factor % candidate == 0:
+            source = max(source, candidate)
+    return source
+
+
+def _compute(data, levels, length, factor, source, first, last):
+    """
+    Compute buckets `first` to `last` of the level with `factor` from the
+    level with factor `source` or from `data` if `source` is 1.
+    """
+    ratio = factor // source
+    result = np.zeros((max(last - first, 0), 3) + data.shape[1:], dtype=np.float64)
+    chunk_buckets = max(1, CHUNK_ROWS // ratio)
+    for chunk_first in range(first, last, chunk_buckets):
+        chunk_last = min(chunk_first + chunk_buckets, last)
+        source_first = chunk_first * ratio
+        source_last = min(chunk_last * ratio, _bucket_count(length, source))
+        if source == 1:
+            values = np.asarray(data[source_first:source_last], dtype=np.float64)
+            minimum = maximum = mean = values
+            counts = np.ones(len(values))
+        else:
+            level = np.asarray(levels[source][source_first:source_last])
+            minimum = level[:, MIN]
+            maximum = level[:, MAX]
+            mean = level[:, MEAN]
+            rows = np.arange(source_first, source_last) * source
+            counts = np.minimum(source, length - rows).astype(np.float64)
+
+        starts = np.arange(0, source_last - source_first, ratio)
+        weights = counts.reshape((-1,) + (1,) * (mean.ndim - 1))
+        out = result[chunk_first - first:chunk_last - first]
+        out[:, MIN] = np.minimum.reduceat(minimum, starts, axis=0)
+        out[:, MAX] = np.maximum.reduceat(maximum, starts, axis=0)
+        total = np.add.reduceat(mean * weights, starts, axis=0)
+        count = np.add.reduceat(counts, starts)
+        out[:, MEAN] = total / count.reshape((-1,) + (1,) * (total.ndim - 1))
+    return result
+
+
+def build(dataset_directory, data, factors, old_factors=()):
+    """
+    Write all levels of `data` for the given `factors`,
+    and remove levels for `old_factors` that are no longer used.
+    """
+    _assert_numeric(data)
+    factors = sorted(set(int(factor) for factor in factors))
+    if len(factors) == 0 or factors[0] < 2:
+        raise ValueError("Pyramid factors must be larger than 1, got {}".format(factors))
+
+    for factor in old_factors:
+        if factor not in factors:
+            filename = level_filename(dataset_directory, factor)
+            if filename.exists():
+                filename.unlink()
+
+    levels = {}
+    length = len(data)
+    for factor in factors:
+        source = _source(factor, factors)
+        level = _compute(data, levels, length, factor, source, 0, _bucket_count(length, factor))
+        npy.write(level_filename(dataset_directory, factor), level)
+        levels[factor] = level
+    return factors
+
+
+def update(dataset_directory, data, factors, start, stop):
+    """
+    Update the levels after the rows `start` to `stop` of `data` have been
+    written or appended.
+    Finer levels are updated first, since coarser levels are computed
+    from them.
+    """
+    length = len(data)
+    levels = {}
+    for factor in sorted(factors):
+        source = _source(factor, factors)
+        filename = level_filename(dataset_directory, factor)
+        level = np.load(str(filename), mmap_mode="r+", allow_pickle=False)
+        existing = len(level)
+
+        first = start // factor
+        last = min(_bucket_count(stop, factor), existing)
+        if first < last:
+            level[first:last] = _compute(data, levels, length, factor, source, first, last)
+            level.flush()
+        del level
+
+        count = _bucket_count(length, factor)
+        if count > existing:
+            npy.append(
+                filename,
+                _compute(data, levels, length, factor, source, existing, count)
+            )
+        levels[factor] = np.load(str(filename), mmap_mode="r", allow_pickle=False)
+
+
+def _rows(selection, length):
+    if selection is None:
+        return 0, length
+    if isinstance(selection, slice):
+        start, stop, step = selection.indices(length)
+        if step == 1:
+            return start, max(start, stop)
+    raise ValueError(
+        "Resolution reads require a contiguous range of rows, "
+        "got {}".format(selection)
+    )
+
+
+def read(dataset_directory, data, factors, selection, max_points):
+    """
+    Read the rows in `selection` from the coarsest level that still has at
+    least `max_points` buckets in the selection.
+    The data itself is read if no level is fine enough.
+
+    Returns
+    -------
+    dict
+        The :code:`factor` of the chosen level, the first row of each
+        bucket in :code:`rows`, and the :code:`min`, :code:`max` and
+        :code:`mean` of each bucket.
+    """
+    start, stop = _rows(selection, len(data))
+    factor = 1
+    for candidate in sorted(factors or []):
+        first = start // candidate
+        last = _bucket_count(stop, candidate)
+        if last - first >= max_points:
+            factor = candidate
+
+    if factor == 1:
+        values = np.asarray(data[start:stop])
+        return {
+            "factor": 1,
+            "rows": np.arange(start, stop),
+            "min": values,
+            "max": values,
+            "mean": values
+        }
+
+    first = start // factor
+    last = _bucket_count(stop, factor)
+    level = np.load(
+        str(level_filename(dataset_directory, factor)),
+        mmap_mode="r",
+        allow_pickle=False
+    )
+    buckets = np.asarray(level[first:last])
+    return {
+        "factor": factor,
+        "rows": np.arange(first, last) * factor,
+        "min": buckets[:, MIN],
+        "max": buckets[:, MAX],
+        "mean": buckets[:, MEAN]
+    }
@@ -0,0 +1,315 @@
+import numbers
+import numpy as np
+
+from . import exdir_object as exob
+from . import pread
+from .mode import assert_file_open, OpenMode, assert_file_writable
+
+
+def _values_filename(directory):
+    return directory / "values.npy"
+
+
+def _offsets_filename(directory):
+    return directory / "offsets.npy"
+
+
+def _concatenate_rows(rows, dtype, row_shape):
+    rows = [np.asarray(row, dtype=dtype) for row in rows]
+    for row in rows:
+        if row.ndim == 0 or row.shape[1:] != row_shape:
+            raise ValueError(
+                "Rows must be arrays with trailing shape {}, got shape {}".format(
+                    row_shape, row.shape
+                )
+            )
+    lengths = np.array([len(row) for row in rows], dtype=np.int64)
+    if len(rows) == 0:
+        values = np.zeros((0,) + row_shape, dtype=dtype)
+    else:
+        values = np.concatenate(rows)
+    return values, lengths
+
+
+class RaggedDataset(exob.Object):
+    """
+    A dataset of rows with variable length, such as spike trains.
+
+    All rows are stored back to back in a single :code:`values.npy` file,
+    while :code:`offsets.npy` holds the start of each row and the end of
+    the last row.
+    Row :code:`i` is therefore :code:`values[offsets[i]:offsets[i + 1]]`.
+
+    Indexing with an integer returns a single row, while indexing with a
+    slice, a list of integers or a boolean mask returns a list of rows.
+
+    Note
+    ----
+    Dataset plugins are not applied to ragged datasets.
+    """
+    def __init__(self, root_directory, parent_path, object_name, file):
+        super(RaggedDataset, self).__init__(
+            root_directory=root_directory,
+            parent_path=parent_path,
+            object_name=object_name,
+            file=file
+        )
+        # the offsets and the values, which are replaced together
+        self._memmaps = None
+
+    def _reset_data(self, rows, dtype, row_shape=()):
+        assert_file_open(self.file)
+        values, lengths = _concatenate_rows(rows, dtype, tuple(row_shape))
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        storage = self.file._storage
+        with self.file._locks.local(self.directory):
+            self._release_data()
+            storage.write_array(_values_filename(self.directory), values)
+            storage.write_array(_offsets_filename(self.directory), offsets)
+            self.file._syncer.written(_values_filename(self.directory), created=True)
+            self.file._syncer.written(_offsets_filename(self.directory), created=True)
+
+    def _release_data(self):
+        """
+        Drop the offsets and values, which are opened again on the next
+        access.
+
+        Takes no locks, since it is called when other objects are opened.
+        Arrays already returned to other threads stay valid.
+        """
+        if self._memmaps is not None:
+            self._memmaps = None
+            self.file._open_maps.remove(self)
+
+    def _reload_data(self):
+        """
+        Open the offsets and values and return them, which are also kept
+        until they are released.
+        """
+        assert_file_open(self.file)
+        storage = self.file._storage
+        cache = self.file._block_cache
+        memmaps = (
+            storage.load_array(_offsets_filename(self.directory), "r", cache=cache),
+            storage.load_array(_values_filename(self.directory), "r", cache=cache)
+        )
+        self._memmaps = memmaps
+        # arrays read with requests map nothing
+        mapped_bytes = sum(
+            array.nbytes for array in memmaps
+            if not isinstance(array, pread.PreadArray)
+        )
+        self.file._open_maps.add(self, 2, mapped_bytes)
+        return memmaps
+
+    @property
+    def _ragged(self):
+        """
+        The offsets and values, from the same version of the dataset.
+        """
+        assert_file_open(self.file)
+        # the arrays may be released by another thread at any time, so
+        # they are read once
+        memmaps = self._memmaps
+        if memmaps is not None:
+            self.file._open_maps.touch(self)
+            return memmaps
+        with self.file._locks.local(self.directory):
+            memmaps = self._memmaps
+            if memmaps is None:
+                memmaps = self._reload_data()
+        return memmaps
+
+    @property
+    def _values(self):
+        return self._ragged[1]
+
+    @property
+    def _offsets(self):
+        return self._ragged[0]
+
+    @property
+    def offsets(self):
+        """
+        The offsets of the rows into :code:`values`.
+        Has one more element than the number of rows.
+
+        Returns
+        -------
+        numpy.memmap
+        """
+        return self._offsets
+
+    @property
+    def values(self):
+        """
+        The values of all rows, concatenated.
+
+        Returns
+        -------
+        numpy.memmap
+        """
+        return self._values
+
+    @property
+    def lengths(self):
+        """
+        The length of each row.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        return np.diff(self._offsets)
+
+    @property
+    def dtype(self):
+        """
+        The NumPy data type of the values.
+        """
+        return self._values.dtype
+
+    @property
+    def row_shape(self):
+        """
+        The shape of each element in a row.
+        Empty for rows of scalars.
+        """
+        return self._values.shape[1:]
+
+    def __len__(self):
+        """The number of rows."""
+        return len(self._offsets) - 1
+
+    def _row(self, index):
+        offsets, values = self._ragged
+        count = len(offsets) - 1
+        if index < -count or index >= count:
+            raise IndexError(
+                "Row index {} is out of range for {} rows".format(index, count)
+            )
+        if index < 0:
+            index += count
+        start, stop = offsets[index:index + 2]
+        return values[start:stop]
+
+    def gather(self, indices):
+        """
+        Read multiple rows with a single read of the values.
+
+        Parameters
+        ----------
+        indices: list or numpy.ndarray
+            Integer row indices or a boolean mask.
+
+        Returns
+        -------
+        list of numpy.ndarray
+            The requested rows.
+        """
+        assert_file_open(self.file)
+        offsets, values = self._ragged
+        count = len(offsets) - 1
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            if len(indices) != count:
+                raise IndexError(
+                    "Boolean mask of length {} does not match {} rows".format(
+                        len(indices), count
+                    )
+                )
+            indices = np.flatnonzero(indices)
+        indices = indices.astype(np.int64).ravel()
+        if np.any((indices < -count) | (indices >= count)):
+            raise IndexError("Row indices out of range for {} rows".format(count))
+        indices = np.where(indices < 0, indices + count, indices)
+        if len(indices) == 0:
+            return []
+
+        starts = np.asarray(offsets[indices])
+        stops = np.asarray(offsets[indices + 1])
+        lengths = stops - starts
+        ends = np.cumsum(lengths)
+
+        if np.all(indices[1:] == indices[:-1] + 1):
+            # contiguous rows can be read as one block
+            block = np.asarray(values[starts[0]:stops[-1]])
+        else:
+            positions = np.repeat(starts - (ends - lengths), lengths)
+            positions += np.arange(len(positions), dtype=np.int64)
+            block = np.asarray(values[positions])
+
+        return np.split(block, ends[:-1])
+
+    def __getitem__(self, args):
+        assert_file_open(self.file)
+        if isinstance(args, numbers.Integral):
+            return self._row(int(args))
+        if isinstance(args, slice):
+            return self.gather(np.arange(len(self))[args])
+        return self.gather(args)
+
+    def __iter__(self):
+        """
+        Iterate over the rows.
+        """
+        assert_file_open(self.file)
+        offsets, values = self._ragged
+        offsets = np.asarray(offsets)
+        for start, stop in zip(offsets[:-1], offsets[1:]):
+            yield values[start:stop]
+
+    def append(self, row):
+        """
+        Append a single row.
+
+        Parameters
+        ----------
+        row: list or numpy.ndarray
+            The values of the new row.
+        """
+        self.extend([row])
+
+    def extend(self, rows):
+        """
+        Append multiple rows.
+
+        The values are written before the offsets, so a reader never
+        sees a row that has not been completely written.
+        Values left behind by an extend that was interrupted before its
+        offsets were written are discarded.
+
+        Parameters
+        ----------
+        rows: iterable of list or numpy.ndarray
+            The values of the new rows.
+        """
+        assert_file_writable(self.file)
+        storage = self.file._storage
+        values_filename = _values_filename(self.directory)
+        with self.file._locks.local(self.directory):
+            stored_offsets, stored_values = self._ragged
+            values, lengths = _concatenate_rows(
+                rows, stored_values.dtype, stored_values.shape[1:]
+            )
+            if len(lengths) == 0:
+                return
+            end = int(stored_offsets[-1])
+            offsets = end + np.cumsum(lengths)
+            # readers keep the arrays they have, which do not cover the
+            # new rows
+            self._release_data()
+            if len(stored_values) > end:
+                # values of an interrupted extend, which no offset points to
+                storage.truncate_array(values_filename, end)
+            storage.append_array(values_filename, values)
+            storage.append_array(_offsets_filename(self.directory), offsets)
+            self.file._syncer.written(values_filename)
+            self.file._syncer.written(_offsets_filename(self.directory))
+
+    def __repr__(self):
+        if self.file.io_mode == OpenMode.FILE_CLOSED:
+            return "<Closed Exdir RaggedDataset>"
+        return "<Exdir RaggedDataset {} rows {} dtype {}>".format(
+            self.name, len(self), self.dtype)
@@ -0,0 +1,377 @@
+"""
+Read-only storage of Exdir files on remote servers.
+
+Folders and metadata files are fetched when they are needed, and datasets
+are read with range requests for the bytes covered by each indexing
+operation, after their NumPy header has been parsed.
+Large reads are split into parts that are fetched in parallel, and
+fetched objects and blocks can be kept in a local disk cache, so that
+nothing is downloaded twice.
+
+Subclasses implement the requests for a kind of server.
+"""
+
+import concurrent.futures
+import http.client
+import io
+import pathlib
+import queue
+import threading
+import urllib.parse
+
+import numpy as np
+
+from . import npy
+from . import pread
+from . import storage
+from .disk_cache import DiskCache
+
+# the number of bytes fetched to parse the NumPy header of a dataset
+HEADER_BYTES = 4096
+
+
+class RemoteError(IOError):
+    pass
+
+
+def _raise_for_status(status, reason, url):
+    if status == 404:
+        raise FileNotFoundError("No such object: '{}'".format(url))
+    if status in (401, 403):
+        raise PermissionError("Access to '{}' denied: {} {}".format(url, status, reason))
+    if status >= 300:
+        raise RemoteError("Request for '{}' failed: {} {}".format(url, status, reason))
+
+
+class ConnectionPool:
+    """
+    Persistent connections to a server, reused between requests.
+
+    Parameters
+    ----------
+    url: str
+        The scheme and host of the server, such as
+        :code:`https://example.com:8443`.
+    max_connections: int
+        The maximum number of idle connections kept open.
+    timeout: float
+        Seconds to wait for the server.
+    """
+    def __init__(self, url, max_connections=8, timeout=60.0):
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme not in ("http", "https"):
+            raise ValueError("Unsupported URL scheme in '{}'".format(url))
+        self.scheme = parsed.scheme
+        self.host = parsed.netloc
+        self.timeout = timeout
+        self.requests = 0
+        self.connections = 0
+        self._idle = queue.LifoQueue(max_connections)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        with self._lock:
+            self.connections += 1
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, timeout=self.timeout)
+
+    def request(self, method, path, headers=None):
+        """
+        Send a request and read the whole response.
+
+        Returns
+        -------
+        tuple
+            The status, the reason, the headers with lowercase names and
+            the body.
+        """
+        headers = dict(headers or {})
+        with self._lock:
+            self.requests += 1
+        for attempt in range(2):
+            try:
+                connection = self._idle.get_nowait()
+                reused = True
+            except queue.Empty:
+                connection = self._connect()
+                reused = False
+            try:
+                connection.request(method, path, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, ConnectionError, OSError):
+                connection.close()
+                if reused and attempt == 0:
+                    # the server closed the idle connection, try a new one
+                    continue
+                raise
+            response_headers = {name.lower(): value for name, value in response.getheaders()}
+            if response.will_close:
+                connection.close()
+            else:
+                try:
+                    self._idle.put_nowait(connection)
+                except queue.Full:
+                    connection.close()
+            return response.status, response.reason, response_headers, body
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class RemoteArray(pread.PreadArray):
+    """
+    A read-only array in a NumPy file on a remote server, read with range
+    requests.
+    """
+    def __init__(self, remote_storage, key, cache=None):
+        self.filename = remote_storage.url(key)
+        self._storage = remote_storage
+        self._key = key
+        self._descriptor = None
+        self._cache = cache
+        self.coalesce_bytes = remote_storage.coalesce_bytes
+        header = remote_storage.read_range(key, 0, HEADER_BYTES)
+        size = npy.header_size(header)
+        if size > len(header):
+            # headers of structured data types with many fields can be
+            # longer than what is fetched up front
+            header += remote_storage.read_range(key, len(header), size)
+        self._set_header(npy._read_header(io.BytesIO(header)), "r")
+
+    def _read_file_range(self, start, stop):
+        self.reads += 1
+        data = self._storage.read_range(self._key, start, stop)
+        return np.frombuffer(data, dtype=np.uint8)
+
+    def _map(self, function, items):
+        return self._storage.map(function, items)
+
+
+class RemoteStorage(storage.Storage):
+    """
+    Base class of read-only storages on remote servers.
+
+    Folders are listed once and the listing is kept until the storage is
+    closed.
+    Subclasses implement :code:`url`, :code:`_list` and :code:`_get`.
+
+    Parameters
+    ----------
+    cache_directory: str, optional
+        A local folder where fetched metadata files and blocks of datasets
+        are kept, so that they are not fetched again, also by other
+        processes and later sessions.
+    cache_block_size: int, optional
+        The size of the cached blocks of datasets.
+    cache_max_bytes: int, optional
+        The maximum size of the cache, unlimited by default.
+    part_size: int, optional
+        Reads larger than this are split into parts that are fetched in
+        parallel.
+    max_workers: int, optional
+        The maximum number of parallel requests.
+    coalesce_bytes: int, optional
+        Rows of datasets separated by at most this many bytes are read
+        with a single request, since an extra request often takes longer
+        than transferring the bytes in between.
+    """
+    readonly = True
+
+    def __init__(self, cache_directory=None, cache_block_size=1 << 20,
+                 cache_max_bytes=None, part_size=8 << 20, max_workers=8,
+                 coalesce_bytes=256 << 10):
+        self.part_size = part_size
+        self.max_workers = max_workers
+        self.coalesce_bytes = coalesce_bytes
+        self.disk_cache = None
+        if cache_directory is not None:
+            self.disk_cache = DiskCache(cache_directory, cache_block_size, cache_max_bytes)
+        self._listings = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._worker = threading.local()
+
+    def url(self, key):
+        """
+        The URL of the object `key`.
+        """
+        raise NotImplementedError
+
+    def _list(self, key):
+        """
+        List the folder `key`.
+
+        Returns
+        -------
+        tuple
+            The set of names of the folders and a dict with the size and
+            version of each file in the folder.
+        """
+        raise NotImplementedError
+
+    def _get(self, key, start=None, stop=None):
+        """
+        Fetch the object `key`, or its bytes `start` to `stop`.
+        """
+        raise NotImplementedError
+
+    def _key(self, path):
+        key = pathlib.PurePath(str(path)).as_posix()
+        return "" if key == "." else key.lstrip("/")
+
+    def _listing(self, key):
+        with self._lock:
+            if key in self._listings:
+                return self._listings[key]
+        listing = self._list(key)
+        with self._lock:
+            self._listings[key] = listing
+        return listing
+
+    def _split(self, key):
+        if "/" in key:
+            return key.rsplit("/", 1)
+        return "", key
+
+    def _stat(self, key):
+        """
+        The size and version of the file `key`, or None if it does not exist.
+        """
+        folder, name = self._split(key)
+        return self._listing(folder)[1].get(name)
+
+    def _assert_writable(self):
+        raise IOError("Remote storage is read-only")
+
+    def exists(self, path):
+        key = self._key(path)
+        return self.is_dir(path) or self._stat(key) is not None
+
+    def is_dir(self, path):
+        key = self._key(path)
+        if key == "":
+            return True
+        folder, name = self._split(key)
+        return name in self._listing(folder)[0]
+
+    def listdir(self, path):
+        folders, files = self._listing(self._key(path))
+        return sorted(folders) + sorted(files)
+
+    def subdirectories(self, path):
+        return sorted(self._listing(self._key(path))[0])
+
+    def size(self, path):
+        stat = self._stat(self._key(path))
+        if stat is None:
+            raise FileNotFoundError("No such object: '{}'".format(self.url(self._key(path))))
+        return stat[0]
+
+    def read_object(self, key):
+        """
+        The contents of the object `key`.
+        """
+        stat = self._stat(key)
+        if stat is None:
+            raise FileNotFoundError("No such object: '{}'".format(self.url(key)))
+        if self.disk_cache is None:
+            return self._get(key)
+        return self.disk_cache.get(key, stat[1], lambda: self._get(key))
+
+    def read_range(self, key, start, stop):
+        """
+        The bytes `start` to `stop` of the object `key`.
+        """
+        stat = self._stat(key)
+        if stat is None:
+            raise FileNotFoundError("No such object: '{}'".format(self.url(key)))
+        size, version = stat
+        stop = min(stop, size)
+        if stop <= start:
+            return b""
+
+        def fetch(start, stop):
+            return self._fetch_range(key, start, stop)
+        if self.disk_cache is None:
+            return fetch(start, stop)
+        return self.disk_cache.read(key, version, size, start, stop, fetch)
+
+    def _fetch_range(self, key, start, stop):
+        """
+        Fetch the bytes `start` to `stop` of `key` in parts of at most
+        `part_size` bytes, in parallel.
+        """
+        parts = [
+            (part_start, min(part_start + self.part_size, stop))
+            for part_start in range(start, stop, self.part_size)
+        ]
+        return b"".join(self.map(lambda part: self._get(key, *part), parts))
+
+    def map(self, function, items):
+        """
+        Apply `function` to each of `items` in parallel.
+        """
+        items = list(items)
+        if len(items) <= 1 or getattr(self._worker, "active", False):
+            # requests made by workers are sent by the worker itself,
+            # waiting for other workers could use up all of them
+            return [function(item) for item in items]
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="exdir-remote",
+                    initializer=self._start_worker
+                )
+            executor = self._executor
+        return list(executor.map(function, items))
+
+    def _start_worker(self):
+        self._worker.active = True
+
+    def open(self, path, mode="r"):
+        if mode.replace("b", "") != "r":
+            self._assert_writable()
+        stream = io.BytesIO(self.read_object(self._key(path)))
+        if "b" not in mode:
+            return io.TextIOWrapper(stream, encoding="utf-8")
+        return stream
+
+    def load_array(self, path, mode, cache=None):
+        if mode != "r":
+            self._assert_writable()
+        return RemoteArray(self, self._key(path), cache=cache)
+
+    def mkdir(self, path):
+        self._assert_writable()
+
+    def rmtree(self, path):
+        self._assert_writable()
+
+    def save_array(self, path, value):
+        self._assert_writable()
+
+    def append_array(self, path, values):
+        self._assert_writable()
+
+    def with_disk_cache(self, disk_cache):
+        if self.disk_cache is not None and self.disk_cache is not disk_cache:
+            raise ValueError("The storage already has a disk cache")
+        self.disk_cache = disk_cache
+        return self
+
+    def close(self):
+        with self._lock:
+            self._listings = {}
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+        if self.disk_cache is not None:
+            self.disk_cache.flush()
+
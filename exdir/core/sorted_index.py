@@ -0,0 +1,103 @@
+"""
+Sparse index of datasets sorted along their first axis.
+
+The index stores every `step`-th value of the dataset in a separate NumPy
+file in the dataset folder.
+A lookup performs a binary search in the index and then reads at most
+`step` values of the dataset itself.
+"""
+
+import numpy as np
+
+from . import npy
+
+INDEX_FILENAME = "index.npy"
+INDEX_METANAME = "sorted_index"
+STEP_METANAME = "step"
+
+
+def index_filename(dataset_directory):
+    return dataset_directory / INDEX_FILENAME
+
+
+def assert_indexable(data):
+    if len(data.shape) != 1:
+        raise ValueError(
+            "Only one-dimensional datasets can be indexed, "
+            "got shape {}".format(data.shape)
+        )
+
+
+def build(dataset_directory, data, step):
+    """
+    Write the index of `data`, sampling every `step`-th value.
+    """
+    assert_indexable(data)
+    if step < 1:
+        raise ValueError("Index step must be positive, got {}".format(step))
+    npy.write(index_filename(dataset_directory), np.asarray(data[::step]))
+
+
+def update(dataset_directory, data, step, start, stop):
+    """
+    Update the index after the rows `start` to `stop` of `data` have been
+    written or appended.
+    """
+    filename = index_filename(dataset_directory)
+    index = np.load(str(filename), mmap_mode="r+", allow_pickle=False)
+    existing = len(index)
+
+    first = -(-start // step)
+    last = min(-(-stop // step), existing)
+    if first < last:
+        index[first:last] = data[first * step:last * step:step]
+        index.flush()
+    del index
+
+    missing = np.asarray(data[existing * step::step])
+    if len(missing) > 0:
+        npy.append(filename, missing)
+
+
+def assert_sorted_append(data, values):
+    """
+    Check that appending `values` to `data` keeps it sorted.
+    """
+    values = np.asarray(values)
+    if len(values) == 0:
+        return
+    if np.any(values[1:] < values[:-1]) or (len(data) > 0 and values[0] < data[-1]):
+        raise ValueError(
+            "Cannot append unsorted values to a dataset with a sorted index"
+        )
+
+
+def _search(data, value, side, index, step):
+    if index is None:
+        return int(np.searchsorted(data, value, side=side))
+    position = int(np.searchsorted(index, value, side=side))
+    start = max(position - 1, 0) * step
+    stop = min(position * step, len(data))
+    # the index entries before and after bracket the result,
+    # so only the values between them need to be read
+    return start + int(np.searchsorted(np.asarray(data[start:stop]), value, side=side))
+
+
+def bounds(dataset_directory, data, step, start_value, stop_value):
+    """
+    Find the first row with a value of at least `start_value` and the first
+    row with a value of at least `stop_value` in the sorted `data`.
+
+    If `step` is None, the search is performed directly on `data`.
+    """
+    assert_indexable(data)
+    index = None
+    if step is not None:
+        index = np.load(
+            str(index_filename(dataset_directory)),
+            mmap_mode="r",
+            allow_pickle=False
+        )
+    start = _search(data, start_value, "left", index, step)
+    stop = _search(data, stop_value, "left", index, step)
+    return start, max(start, stop)
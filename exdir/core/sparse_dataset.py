@@ -0,0 +1,355 @@
+import numbers
+import numpy as np
+
+from . import exdir_object as exob
+from . import pread
+from .mode import assert_file_open, OpenMode
+
+SPARSE_METANAME = "sparse"
+SHAPE_METANAME = "shape"
+
+
+def _indptr_filename(directory):
+    return directory / "indptr.npy"
+
+
+def _indices_filename(directory):
+    return directory / "indices.npy"
+
+
+def _values_filename(directory):
+    return directory / "values.npy"
+
+
+def _import_scipy_sparse():
+    try:
+        import scipy.sparse
+    except ImportError:
+        raise ImportError(
+            "SciPy is required to read sparse datasets in sparse formats. "
+            "Use format='dense' or install scipy."
+        )
+    return scipy.sparse
+
+
+def _to_csr(data, shape=None, dtype=None):
+    """
+    Convert `data` to the compressed sparse row arrays (indptr, indices, values).
+
+    `data` can be a dense array, a SciPy sparse matrix or a tuple
+    (values, (rows, columns)) of coordinates.
+    Duplicate coordinates are summed.
+    """
+    if hasattr(data, "tocoo"):
+        coo = data.tocoo()
+        shape = shape or coo.shape
+        values, rows, columns = coo.data, coo.row, coo.col
+    elif isinstance(data, tuple):
+        values, (rows, columns) = data
+        values = np.asarray(values)
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = np.asarray(columns, dtype=np.int64)
+        if shape is None:
+            shape = (
+                int(rows.max()) + 1 if len(rows) > 0 else 0,
+                int(columns.max()) + 1 if len(columns) > 0 else 0
+            )
+    else:
+        dense = np.asarray(data)
+        if dense.ndim != 2:
+            raise ValueError(
+                "Sparse datasets must be two-dimensional, got shape {}".format(dense.shape)
+            )
+        shape = shape or dense.shape
+        rows, columns = np.nonzero(dense)
+        values = dense[rows, columns]
+
+    shape = tuple(int(size) for size in shape)
+    if len(shape) != 2:
+        raise ValueError(
+            "Sparse datasets must be two-dimensional, got shape {}".format(shape)
+        )
+    if len(rows) > 0 and (
+            rows.min() < 0 or rows.max() >= shape[0] or
+            columns.min() < 0 or columns.max() >= shape[1]):
+        raise ValueError("Coordinates are out of bounds for shape {}".format(shape))
+
+    values = np.asarray(values, dtype=dtype or values.dtype)
+    order = np.lexsort((columns, rows))
+    rows, columns, values = rows[order], columns[order], values[order]
+    if len(rows) > 0:
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = (rows[1:] != rows[:-1]) | (columns[1:] != columns[:-1])
+        starts = np.flatnonzero(first)
+        values = np.add.reduceat(values, starts).astype(values.dtype)
+        rows, columns = rows[starts], columns[starts]
+
+    indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=shape[0]), out=indptr[1:])
+    return shape, indptr, columns.astype(np.int64), values
+
+
+def _selection(key, size):
+    """
+    Convert an index along one axis to an array of positions.
+
+    Returns
+    -------
+    tuple
+        The positions and whether the axis should be removed from the result.
+    """
+    if isinstance(key, numbers.Integral):
+        index = int(key)
+        if index < -size or index >= size:
+            raise IndexError("Index {} is out of range for size {}".format(index, size))
+        return np.array([index % size], dtype=np.int64), True
+    if isinstance(key, slice):
+        return np.arange(*key.indices(size), dtype=np.int64), False
+    if key is Ellipsis:
+        return np.arange(size, dtype=np.int64), False
+    positions = np.asarray(key)
+    if positions.dtype == bool:
+        if len(positions) != size:
+            raise IndexError(
+                "Boolean index of length {} does not match size {}".format(len(positions), size)
+            )
+        return np.flatnonzero(positions).astype(np.int64), False
+    positions = positions.astype(np.int64).ravel()
+    if np.any((positions < -size) | (positions >= size)):
+        raise IndexError("Indices are out of range for size {}".format(size))
+    return np.where(positions < 0, positions + size, positions), False
+
+
+class SparseDataset(exob.Object):
+    """
+    A two-dimensional dataset where most values are zero, such as
+    connectivity matrices.
+
+    Only the nonzero values are stored, in compressed sparse row format:
+    :code:`values.npy` holds the nonzero values row by row,
+    :code:`indices.npy` holds their column indices and
+    :code:`indptr.npy` holds the start of each row.
+    Reading a range of rows or columns therefore scales with the number of
+    nonzero values in the range, not with the shape of the dataset.
+
+    Indexing returns dense NumPy arrays.
+    Unlike NumPy, indexing with a list of rows and a list of columns
+    selects every combination of the rows and columns.
+    Use :code:`read` to get SciPy sparse matrices instead.
+
+    Note
+    ----
+    Dataset plugins are not applied to sparse datasets.
+    """
+    def __init__(self, root_directory, parent_path, object_name, file):
+        super(SparseDataset, self).__init__(
+            root_directory=root_directory,
+            parent_path=parent_path,
+            object_name=object_name,
+            file=file
+        )
+        self._shape = None
+        self._memmaps = None
+
+    def _reset_data(self, data, shape=None, dtype=None):
+        assert_file_open(self.file)
+        shape, indptr, indices, values = _to_csr(data, shape, dtype)
+        storage = self.file._storage
+        with self.file._locks.local(self.directory):
+            self._release_data()
+            storage.write_array(_indptr_filename(self.directory), indptr)
+            storage.write_array(_indices_filename(self.directory), indices)
+            storage.write_array(_values_filename(self.directory), values)
+            for filename in [_indptr_filename, _indices_filename, _values_filename]:
+                self.file._syncer.written(filename(self.directory), created=True)
+            self.meta[SPARSE_METANAME] = {SHAPE_METANAME: list(shape)}
+            self._shape = None
+
+    def _release_data(self):
+        """
+        Drop the arrays, which are opened again on the next access.
+
+        Takes no locks, since it is called when other objects are opened.
+        Arrays already returned to other threads stay valid.
+        """
+        self._shape = None
+        if self._memmaps is not None:
+            self._memmaps = None
+            self.file._open_maps.remove(self)
+
+    def _reload_data(self):
+        """
+        Open the arrays and return them, which are also kept until they
+        are released.
+        """
+        assert_file_open(self.file)
+        memmaps = tuple(
+            self.file._storage.load_array(
+                filename(self.directory), "r", cache=self.file._block_cache
+            )
+            for filename in [_indptr_filename, _indices_filename, _values_filename]
+        )
+        self._memmaps = memmaps
+        # arrays read with requests map nothing
+        mapped_bytes = sum(
+            array.nbytes for array in memmaps
+            if not isinstance(array, pread.PreadArray)
+        )
+        self.file._open_maps.add(self, len(memmaps), mapped_bytes)
+        return memmaps
+
+    @property
+    def _csr(self):
+        assert_file_open(self.file)
+        # the arrays may be released by another thread at any time, so
+        # they are read once
+        memmaps = self._memmaps
+        if memmaps is not None:
+            self.file._open_maps.touch(self)
+            return memmaps
+        with self.file._locks.local(self.directory):
+            memmaps = self._memmaps
+            if memmaps is None:
+                memmaps = self._reload_data()
+        return memmaps
+
+    @property
+    def shape(self):
+        """
+        The shape of the dataset.
+
+        Returns
+        -------
+        tuple
+        """
+        assert_file_open(self.file)
+        shape = self._shape
+        if shape is None:
+            shape = tuple(self.meta[SPARSE_METANAME][SHAPE_METANAME])
+            self._shape = shape
+        return shape
+
+    @property
+    def dtype(self):
+        """
+        The NumPy data type of the dataset.
+        """
+        return self._csr[2].dtype
+
+    @property
+    def nnz(self):
+        """
+        The number of stored nonzero values.
+        """
+        return len(self._csr[2])
+
+    def __len__(self):
+        """The number of rows."""
+        return self.shape[0]
+
+    def _gather(self, rows, columns):
+        """
+        Read the stored values in the given rows and sorted unique columns.
+
+        Returns
+        -------
+        tuple
+            The positions of the values in `rows` and `columns` and the values.
+        """
+        indptr, indices, values = self._csr
+        if len(rows) == 0 or len(columns) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0, dtype=values.dtype)
+
+        starts = np.asarray(indptr[rows])
+        stops = np.asarray(indptr[rows + 1])
+        lengths = stops - starts
+        if np.all(rows[1:] == rows[:-1] + 1):
+            # contiguous rows can be read as one block
+            positions = slice(starts[0], stops[-1])
+        else:
+            ends = np.cumsum(lengths)
+            positions = np.repeat(starts - (ends - lengths), lengths)
+            positions += np.arange(len(positions), dtype=np.int64)
+        row_positions = np.repeat(np.arange(len(rows), dtype=np.int64), lengths)
+
+        stored_columns = np.asarray(indices[positions])
+        column_positions = np.searchsorted(columns, stored_columns)
+        column_positions = np.minimum(column_positions, len(columns) - 1)
+        selected = columns[column_positions] == stored_columns
+        stored_values = np.asarray(values[positions])[selected]
+        return row_positions[selected], column_positions[selected], stored_values
+
+    def read(self, rows=slice(None), columns=slice(None), format="dense"):
+        """
+        Read a block of the dataset.
+
+        Parameters
+        ----------
+        rows: int, slice, list or numpy.ndarray, optional
+            The rows to read. All rows are read if not set.
+        columns: int, slice, list or numpy.ndarray, optional
+            The columns to read. All columns are read if not set.
+        format: str, optional
+            One of :code:`"dense"`, :code:`"csr"` or :code:`"coo"`.
+            The sparse formats return SciPy sparse matrices and require
+            SciPy to be installed.
+
+        Returns
+        -------
+        numpy.ndarray or scipy.sparse matrix
+            The selected block.
+        """
+        assert_file_open(self.file)
+        shape = self.shape
+        row_selection, drop_row = _selection(rows, shape[0])
+        column_selection, drop_column = _selection(columns, shape[1])
+        unique_columns, column_inverse = np.unique(column_selection, return_inverse=True)
+        reordered = len(unique_columns) != len(column_selection) or np.any(
+            unique_columns != column_selection
+        )
+        row_positions, column_positions, values = self._gather(row_selection, unique_columns)
+        block_shape = (len(row_selection), len(unique_columns))
+
+        if format == "dense":
+            block = np.zeros(block_shape, dtype=values.dtype)
+            block[row_positions, column_positions] = values
+            if reordered:
+                block = block[:, column_inverse]
+            if drop_row and drop_column:
+                return block[0, 0]
+            if drop_row:
+                return block[0]
+            if drop_column:
+                return block[:, 0]
+            return block
+
+        if format not in ("csr", "coo"):
+            raise ValueError(
+                "Format must be 'dense', 'csr' or 'coo', got '{}'".format(format)
+            )
+        sparse = _import_scipy_sparse()
+        block = sparse.coo_matrix(
+            (values, (row_positions, column_positions)),
+            shape=block_shape
+        )
+        if reordered:
+            block = block.tocsr()[:, column_inverse]
+        if format == "csr":
+            return block.tocsr()
+        return block.tocoo()
+
+    def __getitem__(self, args):
+        if not isinstance(args, tuple):
+            args = (args,)
+        if len(args) > 2:
+            raise IndexError("Sparse datasets are two-dimensional, got {}".format(args))
+        if len(args) == 1:
+            args = args + (slice(None),)
+        return self.read(args[0], args[1])
+
+    def __repr__(self):
+        if self.file.io_mode == OpenMode.FILE_CLOSED:
+            return "<Closed Exdir SparseDataset>"
+        return "<Exdir SparseDataset {} shape {} nnz {} dtype {}>".format(
+            self.name, self.shape, self.nnz, self.dtype)
@@ -0,0 +1,676 @@
+"""
+Storage backends for the folders and files of Exdir objects.
+
+Objects, attributes and datasets read and write their folders and files
+through the storage of their File:
+
+- :code:`PosixStorage`: folders and files on the file system, with datasets
+  memory-mapped from their NumPy files. The default.
+- :code:`MemoryStorage`: folders and files in memory, for tests and
+  pipelines that do not need to keep their results on disk.
+- :code:`ZipStorage`: read-only access to an Exdir file stored in a zip
+  archive. Datasets in uncompressed archives are memory-mapped directly
+  from the archive, so nothing is extracted.
+
+Paths passed to a storage are the same paths as on the file system, that
+is the directory of the File joined with the path of the object.
+"""
+
+import io
+import os
+import pathlib
+import shutil
+import struct
+import threading
+import zipfile
+
+import numpy as np
+
+from . import disk_cache as disk_cache_module
+from . import npy
+from .constants import META_FILENAME
+
+STORAGES = ["posix", "memory", "zip"]
+
+
+def _is_text_mode(mode):
+    return "b" not in mode
+
+
+class StoragePath:
+    """
+    A path in a storage that is not on the file system.
+
+    Supports the parts of the :code:`pathlib` interface used by name
+    validation functions, see :mod:`exdir.core.validation`.
+    """
+    def __init__(self, storage, path):
+        self.storage = storage
+        self._path = pathlib.PurePath(str(path))
+
+    def __truediv__(self, name):
+        return StoragePath(self.storage, self._path / str(name))
+
+    @property
+    def name(self):
+        return self._path.name
+
+    @property
+    def parent(self):
+        return StoragePath(self.storage, self._path.parent)
+
+    def exists(self):
+        return self.storage.exists(self._path)
+
+    def listdir(self):
+        return self.storage.listdir(self._path)
+
+    def __fspath__(self):
+        return str(self._path)
+
+    def __str__(self):
+        return str(self._path)
+
+    def __repr__(self):
+        return "StoragePath({!r})".format(str(self._path))
+
+
+class Storage:
+    """
+    Interface of the storage of the folders and files of a File.
+
+    Attributes
+    ----------
+    local: bool
+        True if the paths are paths on the file system, which is required
+        by features that work directly with files, such as packs, the
+        'pread' IO backend and sorted indexes.
+    readonly: bool
+        True if nothing can be written.
+    disk_cache: DiskCache
+        The local cache of files read from the storage, if any.
+    """
+    local = False
+    readonly = False
+    disk_cache = None
+
+    def exists(self, path):
+        raise NotImplementedError
+
+    def is_dir(self, path):
+        raise NotImplementedError
+
+    def listdir(self, path):
+        """
+        The names of the folders and files in the folder `path`.
+        """
+        raise NotImplementedError
+
+    def subdirectories(self, path):
+        """
+        The names of the folders in the folder `path`.
+        """
+        path = pathlib.PurePath(str(path))
+        return [name for name in self.listdir(path) if self.is_dir(path / name)]
+
+    def mkdir(self, path):
+        raise NotImplementedError
+
+    def rmtree(self, path):
+        raise NotImplementedError
+
+    def open(self, path, mode="r"):
+        """
+        Open the file `path` in one of the modes 'r', 'w', 'a', 'rb', 'wb'
+        or 'ab'.
+        Text is encoded as UTF-8.
+        """
+        raise NotImplementedError
+
+    def write_text(self, path, text):
+        """
+        Write `text` to the file `path`, replacing its contents at once, so
+        that readers in other threads see either the old or the new
+        contents and never a partially written file.
+        """
+        with self.open(path, "w") as text_file:
+            text_file.write(text)
+
+    def size(self, path):
+        raise NotImplementedError
+
+    def load_array(self, path, mode, cache=None):
+        """
+        Open the array in the NumPy file `path`, with mode 'r' for read
+        access and 'r+' for read and write access.
+        Storages that read arrays with explicit requests serve the reads
+        from the :code:`BlockCache` `cache` if it is set.
+        """
+        raise NotImplementedError
+
+    def save_array(self, path, value):
+        """
+        Write `value` to a new NumPy file `path` and return the stored
+        array, opened for read and write access.
+        """
+        raise NotImplementedError
+
+    def write_array(self, path, value):
+        """
+        Write `value` to a new NumPy file `path` that will be appended to.
+        """
+        self.save_array(path, np.asarray(value))
+
+    def append_array(self, path, values):
+        """
+        Append `values` along the first axis of the array in `path`.
+        Storages that cannot grow files in place rewrite the whole array.
+        """
+        data = self.load_array(path, "r")
+        if data.ndim == 0:
+            raise TypeError("Cannot append to a scalar array in '{}'".format(path))
+        values = np.asarray(values, dtype=data.dtype)
+        if values.shape[1:] != data.shape[1:]:
+            raise ValueError(
+                "Cannot append values with shape {} to array with shape {}".format(
+                    values.shape, data.shape
+                )
+            )
+        self.save_array(path, np.concatenate([data, values]))
+
+    def truncate_array(self, path, length):
+        """
+        Shrink the array in `path` to `length` elements along the first
+        axis.
+        Storages that cannot shrink files in place rewrite the whole array.
+        """
+        data = self.load_array(path, "r")
+        if data.ndim == 0 or len(data) < length:
+            raise ValueError(
+                "Cannot truncate array with shape {} to length {}".format(
+                    data.shape, length
+                )
+            )
+        self.save_array(path, np.array(data[:length]))
+
+    def path(self, path):
+        """
+        A path that name validation functions can check for existing names.
+        """
+        return StoragePath(self, path)
+
+    def with_disk_cache(self, disk_cache):
+        """
+        The storage with reads served from the :code:`DiskCache`
+        `disk_cache`.
+        """
+        raise ValueError(
+            "{} does not support disk caches".format(type(self).__name__)
+        )
+
+    def close(self):
+        """
+        Release the resources held by the storage.
+        It can still be used afterwards.
+        """
+        pass
+
+
+class PosixStorage(Storage):
+    """
+    Folders and files on the file system.
+
+    Parameters
+    ----------
+    disk_cache: DiskCache, optional
+        A local cache of the metadata and attribute files that are read,
+        for files on network file systems.
+        Entries are validated with the modification time and size of the
+        files.
+    """
+    local = True
+
+    def __init__(self, disk_cache=None):
+        self.disk_cache = disk_cache
+
+    def exists(self, path):
+        return os.path.exists(str(path))
+
+    def is_dir(self, path):
+        return os.path.isdir(str(path))
+
+    def listdir(self, path):
+        return os.listdir(str(path))
+
+    def subdirectories(self, path):
+        # NOTE os.walk is way faster than os.listdir + os.path.isdir
+        return next(os.walk(str(path)))[1]
+
+    def mkdir(self, path):
+        os.mkdir(str(path))
+
+    def rmtree(self, path):
+        shutil.rmtree(str(path))  # NOTE str needed for Python 3.5
+
+    def open(self, path, mode="r"):
+        if self.disk_cache is not None:
+            path = os.path.abspath(str(path))
+            if mode.replace("b", "") == "r":
+                return self._open_cached(path, mode)
+            if os.path.exists(path):
+                self.disk_cache.discard(path, disk_cache_module.file_version(path)[0])
+        if _is_text_mode(mode):
+            return open(str(path), mode, encoding="utf-8")
+        return open(str(path), mode)
+
+    def _open_cached(self, path, mode):
+        def fetch():
+            with open(path, "rb") as cached_file:
+                return cached_file.read()
+        version, _ = disk_cache_module.file_version(path)
+        stream = io.BytesIO(self.disk_cache.get(path, version, fetch))
+        if _is_text_mode(mode):
+            return io.TextIOWrapper(stream, encoding="utf-8")
+        return stream
+
+    def write_text(self, path, text):
+        path = str(path)
+        if self.disk_cache is not None and os.path.exists(path):
+            path = os.path.abspath(path)
+            self.disk_cache.discard(path, disk_cache_module.file_version(path)[0])
+        folder, name = os.path.split(path)
+        temporary_filename = os.path.join(
+            folder, ".{}.{}.{}.tmp".format(name, os.getpid(), threading.get_ident())
+        )
+        # created like open would, so that the permissions follow the umask
+        descriptor = os.open(temporary_filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        try:
+            with os.fdopen(descriptor, "w", encoding="utf-8") as text_file:
+                text_file.write(text)
+            os.replace(temporary_filename, path)
+        except BaseException:
+            if os.path.exists(temporary_filename):
+                os.remove(temporary_filename)
+            raise
+
+    def size(self, path):
+        return os.path.getsize(str(path))
+
+    def load_array(self, path, mode, cache=None):
+        return np.load(str(path), mmap_mode=mode, allow_pickle=False)
+
+    def save_array(self, path, value):
+        memmap = np.lib.format.open_memmap(
+            str(path),
+            mode="w+",
+            dtype=value.dtype,
+            shape=value.shape
+        )
+        if len(value.shape) == 0:
+            # scalars need to be set with itemset
+            memmap.itemset(value)
+        else:
+            # replace the contents with the value
+            memmap[:] = value
+        return memmap
+
+    def write_array(self, path, value):
+        # with room in the header for appending
+        npy.write(path, value)
+
+    def append_array(self, path, values):
+        npy.append(path, values)
+
+    def truncate_array(self, path, length):
+        npy.truncate(path, length)
+
+    def path(self, path):
+        return pathlib.Path(path)
+
+    def with_disk_cache(self, disk_cache):
+        return PosixStorage(disk_cache)
+
+    def close(self):
+        if self.disk_cache is not None:
+            self.disk_cache.flush()
+
+
+POSIX = PosixStorage()
+
+
+def _npy_header_size(prefix):
+    """
+    The size of the NumPy header that starts with the bytes `prefix`,
+    which must be at least 12 bytes long.
+    """
+    if prefix[6] == 1:
+        return 10 + struct.unpack("<H", bytes(prefix[8:10]))[0]
+    return 12 + struct.unpack("<I", bytes(prefix[8:12]))[0]
+
+
+def _array_from_buffer(buffer, path, mode):
+    """
+    An array that shares memory with the NumPy file contents in `buffer`.
+    """
+    prefix = bytes(buffer[:12])
+    header = io.BytesIO(bytes(buffer[:_npy_header_size(prefix)]))
+    _, shape, fortran_order, dtype, offset = npy._read_header(header)
+    if dtype.hasobject:
+        raise ValueError("Object arrays cannot be loaded from '{}'".format(path))
+    count = int(np.prod(shape, dtype=np.int64))
+    if count == 0:
+        array = np.zeros(shape, dtype=dtype)
+    else:
+        array = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+        array = array.reshape(shape, order="F" if fortran_order else "C")
+    if mode == "r":
+        array.flags.writeable = False
+    return array
+
+
+class _MemoryWriter(io.BytesIO):
+    """
+    A file opened for writing in a MemoryStorage, stored when it is closed.
+    """
+    def __init__(self, folder, name, initial=b""):
+        super().__init__(initial)
+        self.seek(0, io.SEEK_END)
+        self._folder = folder
+        self._name = name
+
+    def close(self):
+        if not self.closed:
+            self._folder[self._name] = bytearray(self.getvalue())
+        super().close()
+
+
+class MemoryStorage(Storage):
+    """
+    Folders and files kept in memory.
+
+    Each File opened with :code:`storage="memory"` gets its own storage.
+    To open the same files again, create a :code:`MemoryStorage` and pass
+    it to every File:
+
+        >>> storage = exdir.core.storage.MemoryStorage()
+        >>> f = exdir.File("pipeline.exdir", storage=storage)
+
+    Datasets share memory with the stored files, so writes to them are
+    stored directly.
+    Appending to a dataset copies it.
+    Folders are created together with the folders that contain them.
+    """
+    def __init__(self):
+        self._root = {}
+
+    def _parts(self, path):
+        return pathlib.PurePath(str(path)).parts
+
+    def _lookup(self, path):
+        node = self._root
+        for part in self._parts(path):
+            if not isinstance(node, dict):
+                return None
+            node = node.get(part)
+            if node is None:
+                return None
+        return node
+
+    def _parent(self, path):
+        """
+        The folder containing `path` and the name of `path` in it.
+        """
+        parts = self._parts(path)
+        if len(parts) == 0:
+            raise ValueError("The root of the storage has no parent")
+        folder = self._lookup(pathlib.PurePath(*parts[:-1])) if len(parts) > 1 else self._root
+        if not isinstance(folder, dict):
+            raise FileNotFoundError("No such folder: '{}'".format(pathlib.PurePath(path).parent))
+        return folder, parts[-1]
+
+    def _file(self, path):
+        node = self._lookup(path)
+        if node is None:
+            raise FileNotFoundError("No such file: '{}'".format(path))
+        if isinstance(node, dict):
+            raise IsADirectoryError("Is a folder: '{}'".format(path))
+        return node
+
+    def exists(self, path):
+        return self._lookup(path) is not None
+
+    def is_dir(self, path):
+        return isinstance(self._lookup(path), dict)
+
+    def listdir(self, path):
+        node = self._lookup(path)
+        if not isinstance(node, dict):
+            return []
+        return list(node.keys())
+
+    def subdirectories(self, path):
+        node = self._lookup(path)
+        if not isinstance(node, dict):
+            return []
+        return [name for name, child in node.items() if isinstance(child, dict)]
+
+    def mkdir(self, path):
+        node = self._root
+        parts = self._parts(path)
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+            if not isinstance(node, dict):
+                raise NotADirectoryError("Not a folder: '{}'".format(part))
+        if parts[-1] in node:
+            raise FileExistsError("'{}' already exists".format(path))
+        node[parts[-1]] = {}
+
+    def rmtree(self, path):
+        folder, name = self._parent(path)
+        if name not in folder:
+            raise FileNotFoundError("No such folder: '{}'".format(path))
+        del folder[name]
+
+    def open(self, path, mode="r"):
+        binary_mode = mode.replace("b", "")
+        if binary_mode == "r":
+            stream = io.BytesIO(bytes(self._file(path)))
+        elif binary_mode in ("w", "a"):
+            folder, name = self._parent(path)
+            initial = b""
+            if binary_mode == "a" and name in folder:
+                initial = bytes(self._file(path))
+            stream = _MemoryWriter(folder, name, initial)
+        else:
+            raise ValueError("Unsupported mode '{}'".format(mode))
+        if _is_text_mode(mode):
+            return io.TextIOWrapper(stream, encoding="utf-8")
+        return stream
+
+    def size(self, path):
+        return len(self._file(path))
+
+    def load_array(self, path, mode, cache=None):
+        return _array_from_buffer(self._file(path), path, mode)
+
+    def save_array(self, path, value):
+        value = np.asarray(value)
+        if value.dtype.hasobject:
+            raise ValueError("Object arrays cannot be saved to '{}'".format(path))
+        folder, name = self._parent(path)
+        contents = bytearray(npy._header_bytes(value.dtype, value.shape, (1, 0)))
+        contents += np.asarray(value, order="C").tobytes()
+        folder[name] = contents
+        return self.load_array(path, "r+")
+
+
+class ZipStorage(Storage):
+    """
+    Read-only access to an Exdir file stored in a zip archive.
+
+    The archive contains the folder of the File, either at the top level
+    or as the only folder at the top level, for instance as created by
+    :code:`shutil.make_archive`.
+
+    Datasets stored without compression are memory-mapped from the archive.
+    Compressed datasets are decompressed into memory when they are opened.
+
+    Parameters
+    ----------
+    filename: str
+        The zip archive, which is also the directory of the File.
+    """
+    readonly = True
+
+    def __init__(self, filename):
+        self.filename = pathlib.Path(filename)
+        self._zip = None
+        self._files = {}
+        self._folders = {"": set()}
+        with zipfile.ZipFile(str(self.filename)) as archive:
+            infos = archive.infolist()
+        for info in infos:
+            name = info.filename.rstrip("/")
+            if not name:
+                continue
+            parts = name.split("/")
+            for depth in range(len(parts)):
+                parent = "/".join(parts[:depth])
+                self._folders.setdefault(parent, set()).add(parts[depth])
+            if info.is_dir():
+                self._folders.setdefault(name, set())
+            else:
+                self._files[name] = info
+        self._prefix = ""
+        top = self._folders[""]
+        if META_FILENAME not in self._files and len(top) == 1:
+            folder = next(iter(top))
+            if folder + "/" + META_FILENAME in self._files:
+                self._prefix = folder
+
+    def _archive(self):
+        if self._zip is None:
+            self._zip = zipfile.ZipFile(str(self.filename))
+        return self._zip
+
+    def _member(self, path):
+        relative = pathlib.PurePath(str(path)).relative_to(pathlib.PurePath(str(self.filename)))
+        return "/".join(part for part in (self._prefix,) + relative.parts if part)
+
+    def _info(self, path):
+        info = self._files.get(self._member(path))
+        if info is None:
+            raise FileNotFoundError("No such file in '{}': '{}'".format(self.filename, path))
+        return info
+
+    def _assert_writable(self):
+        raise IOError("The zip archive '{}' is read-only".format(self.filename))
+
+    def exists(self, path):
+        member = self._member(path)
+        return member in self._files or member in self._folders
+
+    def is_dir(self, path):
+        return self._member(path) in self._folders
+
+    def listdir(self, path):
+        return list(self._folders.get(self._member(path), []))
+
+    def subdirectories(self, path):
+        member = self._member(path)
+        prefix = member + "/" if member else ""
+        return [
+            name for name in self._folders.get(member, [])
+            if prefix + name in self._folders
+        ]
+
+    def mkdir(self, path):
+        self._assert_writable()
+
+    def rmtree(self, path):
+        self._assert_writable()
+
+    def open(self, path, mode="r"):
+        if mode.replace("b", "") != "r":
+            self._assert_writable()
+        stream = self._archive().open(self._info(path))
+        if _is_text_mode(mode):
+            return io.TextIOWrapper(stream, encoding="utf-8")
+        return stream
+
+    def size(self, path):
+        return self._info(path).file_size
+
+    def _data_offset(self, info):
+        """
+        The position of the contents of the member `info` in the archive.
+        """
+        with open(str(self.filename), "rb") as archive_file:
+            archive_file.seek(info.header_offset)
+            header = archive_file.read(30)
+        name_length, extra_length = struct.unpack("<HH", header[26:30])
+        return info.header_offset + 30 + name_length + extra_length
+
+    def load_array(self, path, mode, cache=None):
+        if mode != "r":
+            self._assert_writable()
+        info = self._info(path)
+        if info.compress_type != zipfile.ZIP_STORED:
+            with self._archive().open(info) as member:
+                return _array_from_buffer(bytearray(member.read()), path, mode)
+
+        with self._archive().open(info) as member:
+            _, shape, fortran_order, dtype, offset = npy._read_header(member)
+        if dtype.hasobject:
+            raise ValueError("Object arrays cannot be loaded from '{}'".format(path))
+        if int(np.prod(shape, dtype=np.int64)) == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(
+            str(self.filename),
+            dtype=dtype,
+            mode="r",
+            offset=self._data_offset(info) + offset,
+            shape=shape,
+            order="F" if fortran_order else "C"
+        )
+
+    def save_array(self, path, value):
+        self._assert_writable()
+
+    def append_array(self, path, values):
+        self._assert_writable()
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+
+
+def from_url(url):
+    """
+    Create the storage of a URL and return it together with the
+    directory of the File in it.
+    """
+    scheme = url.split("://", 1)[0]
+    if scheme == "s3":
+        from . import object_store
+        return object_store.from_url(url)
+    if scheme in ("http", "https"):
+        from . import web
+        return web.from_url(url)
+    raise ValueError("Unsupported URL scheme in '{}'".format(url))
+
+
+def from_name(name, directory):
+    """
+    Create the storage with the given name for a File in `directory`.
+    """
+    if name == "posix":
+        return POSIX
+    if name == "memory":
+        return MemoryStorage()
+    if name == "zip":
+        return ZipStorage(directory)
+    raise ValueError(
+        "Storage {} not recognized, storage must be one of {}".format(name, STORAGES)
+    )
@@ -0,0 +1,190 @@
+"""
+Durability policies for the files written by a File.
+
+By default, the operating system decides when written data reaches the
+disk.
+The sync mode of a File decides when exdir asks for it explicitly:
+
+- :code:`"none"`: never, not even when the File is closed, which only
+  flushes the memory maps of its datasets. This is the default.
+- :code:`"close"`: when the File is closed.
+- :code:`"batch"`: in a background thread every `sync_interval` seconds
+  and when the File is closed. A folder is synced once per batch, however
+  many objects are created in it.
+- :code:`"always"`: right after each file is written.
+
+When a file or folder is created, the folder that contains it is synced as
+well, so that the new entry survives a crash.
+
+Files written in the staging folder of a transaction are instead synced
+once each when the transaction is committed, see :meth:`.Group.transaction`.
+"""
+
+import os
+import threading
+
+SYNC_MODES = ["none", "close", "batch", "always"]
+
+
+def fsync_path(path):
+    """
+    Flush a file or folder to disk.
+    Paths that no longer exist are ignored.
+    """
+    try:
+        descriptor = os.open(str(path), os.O_RDONLY)
+    except FileNotFoundError:
+        return
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+class Syncer:
+    """
+    Keeps track of the files and folders written by a File and syncs them
+    according to the sync mode.
+
+    Parameters
+    ----------
+    mode: str
+        One of :code:`"none"`, :code:`"close"`, :code:`"batch"` or
+        :code:`"always"`.
+    interval: float
+        Seconds between syncs in batch mode.
+    """
+    def __init__(self, mode="none", interval=1.0):
+        if mode not in SYNC_MODES:
+            raise ValueError(
+                "Sync mode {} not recognized, "
+                "mode must be one of {}".format(mode, SYNC_MODES)
+            )
+        if interval <= 0:
+            raise ValueError("Sync interval must be positive, got {}".format(interval))
+        self.mode = mode
+        self.interval = interval
+        self.syncs = 0
+        self._files = set()
+        self._directories = set()
+        # staging folder -> the files and folders written in it
+        self._staged = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def written(self, path, created=False):
+        """
+        Record that the file or folder at `path` was written.
+        If `created` is True, the folder containing it is synced as well.
+        """
+        if self.mode == "none":
+            return
+        if self._staged and self._stage(path, created):
+            return
+        if self.mode == "always":
+            fsync_path(path)
+            if created:
+                fsync_path(os.path.dirname(str(path)))
+            self.syncs += 1
+            return
+        with self._lock:
+            self._files.add(str(path))
+            if created:
+                self._directories.add(os.path.dirname(str(path)))
+        if self.mode == "batch" and self._thread is None:
+            self._start()
+
+    def memmap_written(self, memmap, path):
+        """
+        Record that the memory map `memmap` of the file at `path` was
+        written to.
+        """
+        if self.mode == "none":
+            return
+        if self._staged and self._stage(path, False):
+            return
+        if self.mode == "always":
+            memmap.flush()
+            self.syncs += 1
+        else:
+            # fsync also writes the pages dirtied through memory maps
+            with self._lock:
+                self._files.add(str(path))
+
+    def stage(self, directory):
+        """
+        Start deferring the syncs of the files and folders written in the
+        folder `directory` until :meth:`unstage`.
+        """
+        with self._lock:
+            self._staged[str(directory)] = (set(), set())
+
+    def _stage(self, path, created):
+        path = str(path)
+        with self._lock:
+            for directory, (files, directories) in self._staged.items():
+                if path == directory or path.startswith(directory + os.sep):
+                    files.add(path)
+                    if created:
+                        directories.add(os.path.dirname(path))
+                    return True
+        return False
+
+    def unstage(self, directory, sync=True):
+        """
+        Stop deferring the syncs of the files and folders written in
+        `directory` and, if `sync` is True and the mode is not
+        :code:`"none"`, sync each of them once.
+        """
+        with self._lock:
+            files, directories = self._staged.pop(str(directory), (set(), set()))
+        if not sync or self.mode == "none":
+            return
+        for path in sorted(files - directories):
+            fsync_path(path)
+        for path in sorted(directories, key=len, reverse=True):
+            fsync_path(path)
+        self.syncs += 1
+
+    def sync(self):
+        """
+        Sync all files and folders written since the last sync.
+        Files are synced before the folders that contain them.
+        """
+        with self._lock:
+            files, self._files = self._files, set()
+            directories, self._directories = self._directories, set()
+        for path in sorted(files - directories):
+            fsync_path(path)
+        for path in sorted(directories, key=len, reverse=True):
+            fsync_path(path)
+        if len(files) > 0 or len(directories) > 0:
+            self.syncs += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run,
+                name="exdir-sync",
+                daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sync()
+
+    def close(self):
+        """
+        Stop the background thread and sync the remaining files,
+        unless the mode is :code:`"none"`.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.mode != "none":
+            self.sync()
@@ -0,0 +1,334 @@
+import io
+import numbers
+import numpy as np
+try:
+    import ruamel_yaml as yaml
+except ImportError:
+    import ruamel.yaml as yaml
+
+from . import exdir_object as exob
+from . import pread
+from .mode import assert_file_open, OpenMode, assert_file_writable
+
+TABLE_METANAME = "table"
+COLUMNS_METANAME = "columns"
+LENGTH_METANAME = "length"
+
+
+def _column_filename(directory, column):
+    return directory / (column + ".npy")
+
+
+def _columns_from_data(data):
+    """
+    Convert a dictionary of columns or a structured array to a
+    dictionary of arrays that all have the same length.
+    """
+    if isinstance(data, np.ndarray) and data.dtype.names is not None:
+        columns = {name: data[name] for name in data.dtype.names}
+    else:
+        columns = {name: np.asarray(value) for name, value in data.items()}
+
+    lengths = set()
+    for name, value in columns.items():
+        if value.ndim == 0:
+            raise ValueError("Column '{}' must be at least one-dimensional".format(name))
+        lengths.add(len(value))
+    if len(lengths) > 1:
+        raise ValueError(
+            "All columns must have the same length, got lengths {}".format(
+                sorted(lengths)
+            )
+        )
+    return columns
+
+
+def _committed_rows(rows, length):
+    """
+    Limit an index of rows to the first `length` rows,
+    so that only committed rows are read.
+    """
+    if isinstance(rows, slice) and (rows.step is None or rows.step > 0):
+        return slice(*rows.indices(length))
+    return np.arange(length)[rows]
+
+
+def _write_layout(storage, meta_filename, meta):
+    """
+    Write the metadata of a table atomically,
+    since the table length stored there marks which rows are committed.
+    """
+    with io.StringIO() as buffer:
+        yaml.YAML(typ="safe", pure=True).dump(meta, buffer)
+        text = buffer.getvalue()
+    storage.write_text(meta_filename, text)
+
+
+class Table(exob.Object):
+    """
+    A table of named columns that share the same length, such as the
+    timestamps and positions in tracking data.
+
+    Each column is stored in its own NumPy file in the table folder.
+    The column names and the number of committed rows are stored in the
+    :code:`exdir.yaml` file of the table.
+
+    The table can be indexed by a column name, a list of column names,
+    rows or a tuple of columns and rows:
+
+        >>> table["x"]
+        >>> table[["t", "x"]]
+        >>> table[100:200]
+        >>> table[["t", "x"], 100:200]
+
+    Indexing with a single column name returns an array, while the other
+    forms return a dictionary from column names to arrays.
+
+    Note
+    ----
+    Dataset plugins are not applied to tables.
+    """
+    def __init__(self, root_directory, parent_path, object_name, file):
+        super(Table, self).__init__(
+            root_directory=root_directory,
+            parent_path=parent_path,
+            object_name=object_name,
+            file=file
+        )
+        # the layout and the arrays of the columns opened so far, which
+        # are replaced together
+        self._opened = None
+
+    def _reset_data(self, columns):
+        assert_file_open(self.file)
+        for name in columns:
+            self.file.name_validation(self.file._storage.path(self.directory), name)
+        with self.file._locks.local(self.directory):
+            self._release_data()
+            for name, value in columns.items():
+                self.file._storage.write_array(_column_filename(self.directory, name), value)
+                self.file._syncer.written(_column_filename(self.directory, name), created=True)
+            meta = self.meta.to_dict()
+            meta[TABLE_METANAME] = {
+                COLUMNS_METANAME: list(columns.keys()),
+                LENGTH_METANAME: len(next(iter(columns.values()))) if columns else 0
+            }
+            _write_layout(self.file._storage, self.meta_filename, meta)
+            self.file._syncer.written(self.meta_filename, created=True)
+
+    def _release_data(self):
+        """
+        Drop the layout and the column arrays, which are opened again on
+        the next access.
+
+        Takes no locks, since it is called when other objects are opened.
+        Arrays already returned to other threads stay valid.
+        """
+        opened = self._opened
+        if opened is not None:
+            self._opened = None
+            if len(opened[1]) > 0:
+                self.file._open_maps.remove(self)
+
+    def _open_table(self):
+        """
+        The layout of the table and a dictionary of the column arrays
+        opened so far, which always cover the length in the layout.
+        """
+        assert_file_open(self.file)
+        # released by another thread at any time, so it is read once
+        opened = self._opened
+        if opened is not None:
+            return opened
+        with self.file._locks.local(self.directory):
+            opened = self._opened
+            if opened is None:
+                opened = (self.meta[TABLE_METANAME].to_dict(), {})
+                self._opened = opened
+        return opened
+
+    @property
+    def _table_meta(self):
+        return self._open_table()[0]
+
+    @property
+    def columns(self):
+        """
+        The names of the columns in the table.
+
+        Returns
+        -------
+        list of str
+        """
+        return list(self._table_meta[COLUMNS_METANAME])
+
+    def keys(self):
+        """
+        Returns
+        -------
+        list of str
+            The names of the columns in the table.
+        """
+        return self.columns
+
+    @property
+    def dtypes(self):
+        """
+        The NumPy data types of the columns.
+
+        Returns
+        -------
+        dict
+            The data type of each column.
+        """
+        opened = self._open_table()
+        return {
+            name: self._stored_column(name, opened).dtype
+            for name in opened[0][COLUMNS_METANAME]
+        }
+
+    def __len__(self):
+        """The number of committed rows."""
+        return self._table_meta[LENGTH_METANAME]
+
+    def __contains__(self, column):
+        if self.file.io_mode == OpenMode.FILE_CLOSED:
+            return False
+        return column in self.columns
+
+    def _stored_column(self, name, opened):
+        """
+        The array stored for the column `name`, including any rows of an
+        incomplete append, from the `opened` table.
+        """
+        layout, columns = opened
+        if name not in layout[COLUMNS_METANAME]:
+            raise KeyError("No such column: '{}' in table '{}'".format(name, self.name))
+        column = columns.get(name)
+        if column is not None:
+            self.file._open_maps.touch(self)
+            return column
+        with self.file._locks.local(self.directory):
+            column = columns.get(name)
+            if column is None:
+                column = self.file._storage.load_array(
+                    _column_filename(self.directory, name), "r",
+                    cache=self.file._block_cache
+                )
+                columns[name] = column
+                # arrays read with requests map nothing
+                mapped_bytes = 0 if isinstance(column, pread.PreadArray) else column.nbytes
+                self.file._open_maps.add(self, 1, mapped_bytes)
+        return column
+
+    def _column(self, name, rows=slice(None), opened=None):
+        if opened is None:
+            opened = self._open_table()
+        # rows past the committed length belong to an incomplete append
+        rows = _committed_rows(rows, opened[0][LENGTH_METANAME])
+        return self._stored_column(name, opened)[rows]
+
+    def read(self, columns=None, rows=slice(None)):
+        """
+        Read a range of rows from several columns.
+
+        Parameters
+        ----------
+        columns: list of str, optional
+            The columns to read. All columns are read if not set.
+        rows: slice, int, list or numpy.ndarray, optional
+            The rows to read. All rows are read if not set.
+
+        Returns
+        -------
+        dict
+            The selected rows of each column.
+        """
+        assert_file_open(self.file)
+        opened = self._open_table()
+        if columns is None:
+            columns = opened[0][COLUMNS_METANAME]
+        return {name: self._column(name, rows, opened) for name in columns}
+
+    def __getitem__(self, args):
+        assert_file_open(self.file)
+        if isinstance(args, str):
+            return self._column(args)
+        if isinstance(args, tuple):
+            if len(args) != 2:
+                raise IndexError(
+                    "Tables can only be indexed by (columns, rows), got {}".format(args)
+                )
+            columns, rows = args
+            if isinstance(columns, str):
+                return self._column(columns, rows)
+            return self.read(columns, rows)
+        if isinstance(args, list) and all(isinstance(arg, str) for arg in args):
+            return self.read(args)
+        if isinstance(args, (numbers.Integral, slice, list, np.ndarray)):
+            return self.read(rows=args)
+        raise IndexError("Cannot index table with {}".format(args))
+
+    def append(self, data):
+        """
+        Append rows to all columns of the table.
+
+        The rows are written to every column before the new length is
+        committed to the metadata of the table.
+        Readers therefore never see a partial append, and a failed append
+        is discarded the next time the table is appended to.
+
+        Parameters
+        ----------
+        data: dict or structured numpy.ndarray
+            The new rows of each column.
+            All columns of the table must be present.
+        """
+        assert_file_writable(self.file)
+        columns = _columns_from_data(data)
+        if len(columns) == 0:
+            raise ValueError("Cannot append rows without columns")
+
+        storage = self.file._storage
+        with self.file._locks.local(self.directory):
+            opened = self._open_table()
+            layout = opened[0]
+            if set(columns.keys()) != set(layout[COLUMNS_METANAME]):
+                raise ValueError(
+                    "Appended columns {} do not match table columns {}".format(
+                        sorted(columns.keys()), sorted(layout[COLUMNS_METANAME])
+                    )
+                )
+            length = layout[LENGTH_METANAME]
+            new_length = length + len(next(iter(columns.values())))
+            stored_lengths = {
+                name: len(self._stored_column(name, opened))
+                for name in layout[COLUMNS_METANAME]
+            }
+            # readers keep the arrays they have, which do not cover the
+            # new rows
+            self._release_data()
+            for name, stored_length in stored_lengths.items():
+                filename = _column_filename(self.directory, name)
+                if stored_length > length:
+                    storage.truncate_array(filename, length)
+                storage.append_array(filename, columns[name])
+                self.file._syncer.written(filename)
+
+            meta = self.meta.to_dict()
+            meta[TABLE_METANAME][LENGTH_METANAME] = new_length
+            _write_layout(storage, self.meta_filename, meta)
+            self.file._syncer.written(self.meta_filename, created=True)
+
+    def __iter__(self):
+        """
+        Iterate over the column names.
+        """
+        for name in self.columns:
+            yield name
+
+    def __repr__(self):
+        if self.file.io_mode == OpenMode.FILE_CLOSED:
+            return "<Closed Exdir Table>"
+        return "<Exdir Table {} columns {} length {}>".format(
+            self.name, self.columns, len(self))
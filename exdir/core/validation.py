@@ -18,6 +18,14 @@ class NamingRule(Enum):
     THOROUGH = 3
     NONE = 4
 
+def _listdir(parent_path):
+    if hasattr(parent_path, "listdir"):
+        # a path in a storage that is not on the file system
+        return parent_path.listdir()
+    # os.listdir is much faster here than os.walk or parent_path.iterdir
+    return os.listdir(str(parent_path))
+
+
 def _assert_unique(parent_path, name):
     try:
         name_str = str(name)
@@ -50,7 +58,8 @@ def _assert_nonreserved(name):
     reserved_names = [
         exob.META_FILENAME,
         exob.ATTRIBUTES_FILENAME,
-        exob.RAW_FOLDER_NAME
+        exob.RAW_FOLDER_NAME,
+        exob.PACK_INDEX_FILENAME
     ]
 
     if name_str in reserved_names:
@@ -108,8 +117,7 @@ def thorough(parent_path, name):
         _assert_unique(parent_path, name)
         return
 
-    # os.listdir is much faster here than os.walk or parent_path.iterdir
-    for item in os.listdir(str(parent_path)):
+    for item in _listdir(parent_path):
         if name_lower == item.lower():
             raise RuntimeError(
                 "A directory with name (case independent) '{}' already exists "
@@ -0,0 +1,508 @@
+"""
+Notifications of changes to the objects of a File.
+
+A watcher keeps a snapshot of the folders of the watched objects: the
+files in each folder and their sizes and modification times, the
+subfolders and the names of packed datasets.
+When folders may have changed, they are read again and compared with the
+snapshot, and an event is reported for each object that was created or
+deleted and for each object whose data, metadata or attributes changed.
+
+On Linux, inotify tells which folders have changed, so that only those are
+read again.
+Events that arrive within the debounce time of the first one are handled
+together, so a burst of writes to an object is reported once.
+Elsewhere, or if inotify cannot be used, all folders are checked every
+poll interval.
+Folders are only listed again when their modification time has changed,
+so a check costs one :code:`stat` per file.
+
+Changes made through memory maps do not trigger inotify events, and are
+only reported by the poller when the operating system updates the
+modification time of the file.
+"""
+
+import collections
+import ctypes
+import ctypes.util
+import os
+import pathlib
+import posixpath
+import select
+import struct
+import threading
+import time
+
+from . import exdir_object as exob
+from . import pack
+from .constants import ATTRIBUTES_FILENAME, META_FILENAME, PACK_INDEX_FILENAME
+
+CREATED = "created"
+DELETED = "deleted"
+MODIFIED = "modified"
+
+BACKENDS = ["inotify", "poll"]
+
+# inotify flags from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0)
+
+WATCH_MASK = (
+    IN_MODIFY | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+    IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+
+EVENT_HEADER = struct.Struct("iIII")
+
+# folders changed this recently are listed again, since another change in
+# the same tick of the clock would not change their modification time
+RECENT_NANOSECONDS = 2 * 10**9
+
+Event = collections.namedtuple("Event", ["kind", "name", "attributes"])
+Event.__doc__ = """
+A change to an object reported by :func:`watch`.
+
+kind: str
+    'created', 'deleted' or 'modified'.
+name: str
+    The name of the object in its File, such as '/session_12/lfp'.
+attributes: bool
+    True if the attributes of the object were modified, False if the
+    object was created or deleted or its data or metadata were modified.
+"""
+
+
+def _load_inotify():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        functions = (libc.inotify_init1, libc.inotify_add_watch, libc.inotify_rm_watch)
+    except (OSError, AttributeError, TypeError):
+        return None
+    init, add_watch, rm_watch = functions
+    init.argtypes = [ctypes.c_int]
+    init.restype = ctypes.c_int
+    add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    add_watch.restype = ctypes.c_int
+    rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    rm_watch.restype = ctypes.c_int
+    return functions
+
+
+_inotify_functions = _load_inotify()
+
+
+def _raise_errno(filename=None):
+    errno = ctypes.get_errno()
+    raise OSError(errno, os.strerror(errno), filename)
+
+
+class _Inotify:
+    """
+    An inotify instance, which reports changes to the watched folders.
+    """
+    def __init__(self):
+        if _inotify_functions is None:
+            raise OSError("inotify is not available on this platform")
+        self._init, self._add_watch, self._rm_watch = _inotify_functions
+        self.descriptor = self._init(IN_NONBLOCK | IN_CLOEXEC)
+        if self.descriptor < 0:
+            _raise_errno()
+
+    def add(self, path):
+        watch = self._add_watch(self.descriptor, os.fsencode(path), WATCH_MASK)
+        if watch < 0:
+            _raise_errno(path)
+        return watch
+
+    def remove(self, watch):
+        # fails if the folder is already gone, which removes the watch
+        self._rm_watch(self.descriptor, watch)
+
+    def read(self):
+        """
+        The pending events as tuples of the watch, the flags and the name
+        of the file in the folder.
+        """
+        try:
+            buffer = os.read(self.descriptor, 1 << 16)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(buffer):
+            watch, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = buffer[offset:offset + length].rstrip(b"\0")
+            offset += length
+            events.append((watch, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.descriptor)
+
+
+def _ignored(name):
+    # lock files and the temporary files of atomic writes
+    return name.startswith(".") or name.endswith(".tmp")
+
+
+def _file_key(stat):
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class _Folder:
+    """
+    The snapshot of a folder.
+    """
+    __slots__ = ["mtime", "files", "folders", "packed"]
+
+    def __init__(self, mtime, files, folders, packed):
+        self.mtime = mtime
+        # name -> key of each file
+        self.files = files
+        self.folders = folders
+        self.packed = packed
+
+    @property
+    def is_object(self):
+        return META_FILENAME in self.files
+
+    def data_files(self):
+        return {
+            name: key for name, key in self.files.items()
+            if name != ATTRIBUTES_FILENAME and not name.startswith("__pack__.")
+        }
+
+
+class _Tree:
+    """
+    Snapshots of the folders of the objects in `directory`, which is the
+    folder of the object `name`.
+
+    `added` and `removed` are called with the path of each folder that is
+    added to or removed from the snapshot, before it is read.
+    """
+    def __init__(self, directory, name, added=None, removed=None):
+        self.directory = str(directory)
+        self.name = name
+        self.folders = {}
+        self._added = added
+        self._removed = removed
+        self.refresh(self.directory, None)
+
+    def _object_name(self, path):
+        relative = os.path.relpath(path, self.directory)
+        if relative == ".":
+            return self.name
+        return posixpath.join(self.name, pathlib.PurePath(relative).as_posix())
+
+    def _read(self, path, previous):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        files = {}
+        if (previous is not None and mtime == previous.mtime and
+                time.time_ns() - mtime > RECENT_NANOSECONDS):
+            # no files were added or removed, but they may have changed
+            folders = previous.folders
+            for name in previous.files:
+                try:
+                    files[name] = _file_key(os.stat(os.path.join(path, name)))
+                except FileNotFoundError:
+                    pass
+        else:
+            folders = set()
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if _ignored(entry.name):
+                            continue
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                folders.add(entry.name)
+                            else:
+                                files[entry.name] = _file_key(entry.stat(follow_symlinks=False))
+                        except FileNotFoundError:
+                            continue
+            except (FileNotFoundError, NotADirectoryError):
+                return None
+
+        packed = set()
+        index_key = files.get(PACK_INDEX_FILENAME)
+        if index_key is not None:
+            if previous is not None and previous.files.get(PACK_INDEX_FILENAME) == index_key:
+                packed = previous.packed
+            else:
+                group_pack = pack.Pack(pathlib.Path(path))
+                group_pack.refresh()
+                packed = set(group_pack.names())
+        return _Folder(mtime, files, folders, packed)
+
+    def refresh(self, path, events):
+        """
+        Read the folder `path` again and add the changes since the last
+        read to `events`, or only take the snapshot if `events` is None.
+        New object folders in it are read as well.
+        """
+        previous = self.folders.get(path)
+        if previous is None and self._added is not None:
+            self._added(path)
+        current = self._read(path, previous)
+        if current is None:
+            self._remove(path, events)
+            return
+        self.folders[path] = current
+
+        name = self._object_name(path)
+        was_object = previous is not None and previous.is_object
+        if events is not None:
+            if current.is_object and not was_object:
+                events.append(Event(CREATED, name, False))
+            elif was_object and not current.is_object:
+                events.append(Event(DELETED, name, False))
+            elif was_object:
+                if previous.data_files() != current.data_files():
+                    events.append(Event(MODIFIED, name, False))
+                if previous.files.get(ATTRIBUTES_FILENAME) != current.files.get(ATTRIBUTES_FILENAME):
+                    events.append(Event(MODIFIED, name, True))
+            previous_packed = previous.packed if was_object else set()
+            for packed_name in sorted(current.packed - previous_packed):
+                events.append(Event(CREATED, posixpath.join(name, packed_name), False))
+            for packed_name in sorted(previous_packed - current.packed):
+                events.append(Event(DELETED, posixpath.join(name, packed_name), False))
+
+        previous_folders = previous.folders if previous is not None else set()
+        for folder in sorted(previous_folders - current.folders):
+            self._remove(os.path.join(path, folder), events)
+        if current.is_object:
+            # the contents of raw folders are not watched
+            for folder in sorted(current.folders):
+                child = os.path.join(path, folder)
+                if child not in self.folders:
+                    self.refresh(child, events)
+
+    def _remove(self, path, events):
+        removed = [
+            folder for folder in self.folders
+            if folder == path or folder.startswith(path + os.sep)
+        ]
+        # contained objects first
+        for folder in sorted(removed, reverse=True):
+            snapshot = self.folders.pop(folder)
+            if self._removed is not None:
+                self._removed(folder)
+            if events is not None and snapshot.is_object:
+                name = self._object_name(folder)
+                for packed_name in sorted(snapshot.packed):
+                    events.append(Event(DELETED, posixpath.join(name, packed_name), False))
+                events.append(Event(DELETED, name, False))
+
+
+class Watcher:
+    """
+    Reports changes to an object and the objects in it to a callback from
+    a background thread.
+    Use :func:`watch` to create a watcher.
+
+    The watcher is stopped by :meth:`close` or when it is used as a
+    context manager and the block ends.
+    """
+    def __init__(self, directory, name, callback, debounce=0.05, interval=1.0, backend=None):
+        if backend is not None and backend not in BACKENDS:
+            raise ValueError(
+                "Watch backend {} not recognized, "
+                "backend must be one of {}".format(backend, BACKENDS)
+            )
+        if debounce < 0:
+            raise ValueError("Debounce time must not be negative, got {}".format(debounce))
+        if interval <= 0:
+            raise ValueError("Poll interval must be positive, got {}".format(interval))
+        self.callback = callback
+        self.debounce = debounce
+        self.interval = interval
+        self._inotify = None
+        # watch -> folder and folder -> watch
+        self._paths = {}
+        self._watches = {}
+        self._dirty = set()
+        self._deadline = None
+        self._error = None
+        self._stop = threading.Event()
+
+        if backend in (None, "inotify"):
+            try:
+                self._inotify = _Inotify()
+                self._tree = _Tree(directory, name, self._add_watch, self._remove_watch)
+            except OSError:
+                if backend == "inotify":
+                    self._close_inotify()
+                    raise
+                self._close_inotify()
+        if self._inotify is None:
+            self._tree = _Tree(directory, name)
+        self.backend = "poll" if self._inotify is None else "inotify"
+
+        self._wakeup = os.pipe()
+        self._thread = threading.Thread(target=self._run, name="exdir-watcher", daemon=True)
+        self._thread.start()
+
+    def _add_watch(self, path):
+        try:
+            watch = self._inotify.add(path)
+        except (FileNotFoundError, NotADirectoryError):
+            # already removed, which the snapshot shows
+            return
+        self._paths[watch] = path
+        self._watches[path] = watch
+
+    def _remove_watch(self, path):
+        watch = self._watches.pop(path, None)
+        if watch is not None and self._paths.get(watch) == path:
+            del self._paths[watch]
+            self._inotify.remove(watch)
+
+    def _close_inotify(self):
+        if self._inotify is not None:
+            self._inotify.close()
+        self._inotify = None
+        self._paths = {}
+        self._watches = {}
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                if self._inotify is not None:
+                    self._wait_inotify()
+                elif not self._stop.wait(self.interval):
+                    events = []
+                    for path in list(self._tree.folders):
+                        if path in self._tree.folders:
+                            self._tree.refresh(path, events)
+                    self._report(events)
+        except BaseException as error:
+            self._error = error
+
+    def _wait_inotify(self):
+        timeout = None
+        if self._deadline is not None:
+            timeout = max(0.0, self._deadline - time.monotonic())
+        ready, _, _ = select.select([self._inotify.descriptor, self._wakeup[0]], [], [], timeout)
+        if self._inotify.descriptor in ready:
+            for watch, mask, name in self._inotify.read():
+                if mask & IN_Q_OVERFLOW:
+                    # events were lost, check all folders
+                    self._dirty.update(self._tree.folders)
+                elif mask & IN_IGNORED:
+                    path = self._paths.pop(watch, None)
+                    if path is not None and self._watches.get(path) == watch:
+                        del self._watches[path]
+                elif watch in self._paths and not _ignored(name):
+                    self._dirty.add(self._paths[watch])
+            if len(self._dirty) > 0 and self._deadline is None:
+                self._deadline = time.monotonic() + self.debounce
+        if self._deadline is None or time.monotonic() < self._deadline:
+            return
+
+        dirty = self._dirty
+        self._dirty = set()
+        self._deadline = None
+        events = []
+        try:
+            # containing folders first
+            for path in sorted(dirty):
+                if path in self._tree.folders:
+                    self._tree.refresh(path, events)
+        except OSError:
+            # out of watches, fall back to polling
+            self._close_inotify()
+            self._tree._added = None
+            self._tree._removed = None
+            self.backend = "poll"
+        self._report(events)
+
+    def _report(self, events):
+        for event in events:
+            self.callback(event)
+
+    def close(self):
+        """
+        Stop the watcher.
+        An exception raised by the callback, which stops the watcher, is
+        raised again.
+        """
+        if not self._stop.is_set():
+            self._stop.set()
+            os.write(self._wakeup[1], b"\0")
+            self._thread.join()
+            self._close_inotify()
+            for descriptor in self._wakeup:
+                os.close(descriptor)
+        if self._error is not None:
+            error = self._error
+            self._error = None
+            raise error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def watch(obj, callback, debounce=0.05, interval=1.0, backend=None):
+    """
+    Report objects that are created, deleted or modified in a File or
+    Group, at any depth, and objects whose attributes are modified.
+
+        >>> def changed(event):
+        ...     if event.kind == "created":
+        ...         process(f[event.name])
+        >>> watcher = exdir.watch(f, changed)
+        >>> ...
+        >>> watcher.close()
+
+    The callback is called from a background thread with an
+    :class:`Event` for each change made after :code:`watch` returns.
+    Changes to an object within `debounce` seconds are reported as one
+    event, and objects that are created and deleted in that time are not
+    reported.
+    The contents of raw folders are not watched.
+
+    Parameters
+    ----------
+    obj: exdir.File or exdir.Group
+        The object to watch.
+    callback: function
+        Called with each :class:`Event`.
+        If it raises an exception, the watcher stops and the exception is
+        raised by :meth:`Watcher.close`.
+    debounce: float, optional
+        Seconds that events are collected for before they are reported,
+        with inotify. The default is 50 milliseconds.
+    interval: float, optional
+        Seconds between checks of the folders when inotify is not used.
+        The default is 1 second.
+    backend: str, optional
+        'inotify' or 'poll'. By default, inotify is used where it is
+        available and polling elsewhere.
+
+    Returns
+    -------
+    Watcher
+        The running watcher.
+    """
+    exob._assert_local_storage(obj.file, "Watches")
+    if getattr(obj, "_packed", False):
+        raise TypeError("Packed datasets cannot be watched, watch their group instead")
+    return Watcher(obj.directory, obj.name, callback, debounce, interval, backend)
@@ -0,0 +1,185 @@
+"""
+Read-only storage of Exdir files published on web servers.
+
+Metadata and attribute files are fetched with :code:`GET` requests and
+datasets are read with range requests for the bytes covered by each
+selection, so any static web server that supports range requests can
+serve Exdir files.
+Objects are looked up by their path, which needs no directory listings.
+Iterating over groups and raw folders needs listings generated by the
+server, such as those of :code:`autoindex` in nginx or
+:code:`Options +Indexes` in Apache.
+"""
+
+import html.parser
+import urllib.parse
+
+from . import exdir_object as exob
+from . import remote
+
+
+class _LinkParser(html.parser.HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            for name, value in attrs:
+                if name == "href" and value:
+                    self.links.append(value)
+
+
+def _parse_listing(page):
+    """
+    The sets of folder and file names linked from a directory listing.
+    """
+    parser = _LinkParser()
+    parser.feed(page)
+    folders = set()
+    files = set()
+    for link in parser.links:
+        parsed = urllib.parse.urlsplit(link)
+        if parsed.scheme or parsed.netloc or parsed.query or not parsed.path:
+            # sorting links and links to other sites
+            continue
+        name = urllib.parse.unquote(parsed.path)
+        if name.startswith("/") or name.startswith("."):
+            # the parent folder and hidden files
+            continue
+        if name.endswith("/"):
+            if "/" not in name[:-1]:
+                folders.add(name[:-1])
+        elif "/" not in name:
+            files.add(name)
+    return folders, files
+
+
+class WebStorage(remote.RemoteStorage):
+    """
+    Read-only access to Exdir files on a web server.
+
+        >>> f = exdir.File("https://data.example.com/2019/session_12.exdir")
+
+    or with an explicit storage, for instance to keep fetched data in a
+    local cache folder:
+
+        >>> store = exdir.core.web.WebStorage(
+        ...     "https://data.example.com", cache_directory="~/.cache/exdir"
+        ... )
+        >>> f = exdir.File("2019/session_12.exdir", mode="r", storage=store)
+
+    The directory of the File is relative to `url`.
+    Files are checked with :code:`HEAD` requests, which also give their
+    size and version, and each result is kept until the storage is closed.
+
+    Parameters
+    ----------
+    url: str
+        The URL of the folder on the server that File paths are relative to.
+    max_connections: int, optional
+        The maximum number of idle connections kept open.
+
+    See :class:`.RemoteStorage` for the other parameters.
+    """
+    def __init__(self, url, max_connections=8, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = url.rstrip("/")
+        self._base_path = urllib.parse.urlsplit(self.base_url).path
+        self._pool = remote.ConnectionPool(self.base_url, max_connections)
+        self._stats = {}
+
+    def url(self, key):
+        return "{}/{}".format(self.base_url, urllib.parse.quote(key))
+
+    def _request(self, method, key, headers=None):
+        path = "{}/{}".format(self._base_path, urllib.parse.quote(key))
+        return self._pool.request(method, path, headers)
+
+    def _stat(self, key):
+        with self._lock:
+            if key in self._stats:
+                return self._stats[key]
+        stat = None
+        if key != "":
+            status, reason, headers, _ = self._request("HEAD", key)
+            if status == 200:
+                # servers without ETags change the modification time and
+                # usually the size when a file is replaced
+                version = headers.get("etag") or "{} {}".format(
+                    headers.get("last-modified"), headers.get("content-length")
+                )
+                stat = (int(headers.get("content-length", 0)), version)
+            elif status not in (301, 302, 307, 308, 403, 404):
+                remote._raise_for_status(status, reason, self.url(key))
+        with self._lock:
+            self._stats[key] = stat
+        return stat
+
+    def _list(self, key):
+        status, reason, headers, body = self._request("GET", key + "/" if key else "")
+        if status in (403, 404):
+            return None
+        remote._raise_for_status(status, reason, self.url(key + "/"))
+        if "html" not in headers.get("content-type", ""):
+            return None
+        charset = "utf-8"
+        if "charset=" in headers["content-type"]:
+            charset = headers["content-type"].split("charset=", 1)[1].split(";")[0].strip()
+        folders, files = _parse_listing(body.decode(charset, errors="replace"))
+        return folders, dict.fromkeys(files)
+
+    def _listing_or_raise(self, key):
+        listing = self._listing(key)
+        if listing is None:
+            raise IOError(
+                "The server does not list the folder '{}'".format(self.url(key + "/"))
+            )
+        return listing
+
+    def exists(self, path):
+        key = self._key(path)
+        return self._stat(key) is not None or self.is_dir(path)
+
+    def is_dir(self, path):
+        key = self._key(path)
+        if key == "" or self._stat(key + "/" + exob.META_FILENAME) is not None:
+            return True
+        if self._stat(key) is not None:
+            return False
+        # raw folders have no metadata file, only a listing shows them
+        return self._listing(key) is not None
+
+    def listdir(self, path):
+        folders, files = self._listing_or_raise(self._key(path))
+        return sorted(folders) + sorted(files)
+
+    def subdirectories(self, path):
+        return sorted(self._listing_or_raise(self._key(path))[0])
+
+    def _get(self, key, start=None, stop=None):
+        headers = {}
+        if start is not None:
+            headers["range"] = "bytes={}-{}".format(start, stop - 1)
+        status, reason, _, body = self._request("GET", key, headers)
+        remote._raise_for_status(status, reason, self.url(key))
+        if start is not None and status == 200:
+            # the server ignored the range and sent the whole file
+            body = body[start:stop]
+        return body
+
+    def close(self):
+        super().close()
+        with self._lock:
+            self._stats = {}
+        self._pool.close()
+
+
+def from_url(url, **kwargs):
+    """
+    Create the storage of a URL like :code:`https://example.com/path` and
+    return it together with the directory of the File in it.
+    """
+    parsed = urllib.parse.urlsplit(url)
+    store = WebStorage("{}://{}".format(parsed.scheme, parsed.netloc), **kwargs)
+    return store, urllib.parse.unquote(parsed.path).lstrip("/")
@@ -2,6 +2,7 @@ import exdir
 import pytest
 import os
 import shutil
+import threading
 import time
 import numpy as np
 import h5py
@@ -236,3 +237,37 @@ benchmark(
     lambda dataset, f, path: teardown_h5py(f, path),
     iterations=200
 )
+
+def threaded_reads(dataset, thread_count):
+    def read_rows(first):
+        for start in range(first * 10, dataset.shape[0], thread_count * 10):
+            dataset[start:start + 10]
+
+    threads = [
+        threading.Thread(target=read_rows, args=(first,))
+        for first in range(thread_count)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def create_setup_shared_dataset(io_backend):
+    def setup():
+        testpath = "/tmp/ramdisk/test.exdir"
+        if os.path.exists(testpath):
+            shutil.rmtree(testpath)
+        f = exdir.File(testpath, io_backend=io_backend)
+        f.create_dataset("foo", data=np.zeros((1000, 100, 100)))
+        return f["foo"], f, testpath
+    return setup
+
+for io_backend in ["mmap", "pread"]:
+    for thread_count in [1, 2, 4, 8]:
+        benchmark(
+            "exdir_threaded_reads_{}_{}".format(io_backend, thread_count),
+            lambda dataset, f, path: threaded_reads(dataset, thread_count),
+            create_setup_shared_dataset(io_backend),
+            lambda dataset, f, path: teardown_exdir(f, path),
+            iterations=20
+        )
@@ -14,6 +14,7 @@ except ImportError as e:
 import time
 
 import exdir
+from exdir.core import sync
 
 
 def remove(name):
@@ -55,6 +56,21 @@ def setup_teardown_file(tmpdir):
 
     remove(testpath)
 
+@pytest.fixture
+def fsynced(monkeypatch):
+    """
+    The paths synced with fsync during the test, in order.
+    """
+    paths = []
+    original = sync.fsync_path
+
+    def fsync_path(path):
+        paths.append(str(path))
+        original(path)
+    monkeypatch.setattr(sync, "fsync_path", fsync_path)
+    return paths
+
+
 @pytest.fixture
 def exdir_tmpfile(tmpdir):
     testpath = pathlib.Path(tmpdir.strpath) / "test.exdir"
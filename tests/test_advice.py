@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Exdir, the Experimental Directory Structure.
+#
+# License: MIT, see "LICENSE" file for the full license terms.
+
+import pytest
+import numpy as np
+
+import exdir
+from exdir.core import advice
+
+
+@pytest.fixture
+def advised(monkeypatch):
+    calls = []
+    original_memmap = advice.advise_memmap
+    original_file = advice.advise_file
+
+    def advise_memmap(memmap, hint, start=0, stop=None):
+        calls.append(("memmap", hint, start, stop))
+        original_memmap(memmap, hint, start, stop)
+
+    def advise_file(path, hint, offset=0, length=0, written=False):
+        calls.append(("file", hint, offset, length))
+        original_file(path, hint, offset, length, written)
+    monkeypatch.setattr(advice, "advise_memmap", advise_memmap)
+    monkeypatch.setattr(advice, "advise_file", advise_file)
+    return calls
+
+
+def test_advise_whole_dataset(setup_teardown_file, advised):
+    f = setup_teardown_file[3]
+    dset = f.create_dataset("data", data=np.arange(1000, dtype=np.float64))
+    for hint in advice.ADVICE:
+        del advised[:]
+        dset.advise(hint)
+        offset = dset._data.offset
+        assert advised == [
+            ("memmap", hint, 0, 8000),
+            ("file", hint, offset, 8000)
+        ]
+    assert np.array_equal(dset[:], np.arange(1000))
+
+
+def test_advise_selection(setup_teardown_file, advised):
+    f = setup_teardown_file[3]
+    dset = f.create_dataset("data", data=np.zeros((100, 10), dtype=np.float32))
+    dset.advise("willneed", slice(10, 20))
+    assert advised[0] == ("memmap", "willneed", 10 * 40, 20 * 40)
+    assert dset._advice is None
+
+
+def test_invalid_advice(setup_teardown_file):
+    f = setup_teardown_file[3]
+    dset = f.create_dataset("data", data=np.zeros(10))
+    with pytest.raises(ValueError):
+        dset.advise("soon")
+
+
+def test_advice_is_kept_on_remap(setup_teardown_folder, advised):
+    f = exdir.File(setup_teardown_folder[1], mode="w", max_open_maps=1)
+    a = f.create_dataset("a", data=np.zeros(10))
+    b = f.create_dataset("b", data=np.zeros(10))
+    a.advise("random")
+    b[:]
+    del advised[:]
+    a[:]
+    assert ("memmap", "random", 0, 80) in advised
+    f.close()
+
+
+def test_file_default(setup_teardown_folder, advised):
+    f = exdir.File(setup_teardown_folder[1], mode="w", advice="sequential")
+    f.create_dataset("data", data=np.zeros(10))
+    f.close()
+
+    f = exdir.File(setup_teardown_folder[1], mode="r", advice="sequential")
+    del advised[:]
+    f["data"][:]
+    assert ("memmap", "sequential", 0, 80) in advised
+    f.close()
+
+    with pytest.raises(ValueError):
+        exdir.File(setup_teardown_folder[1], mode="r", advice="soon")
+
+
+def test_dontneed_drops_written_data(setup_teardown_folder, advised):
+    f = exdir.File(setup_teardown_folder[1], mode="w", advice="dontneed")
+    dset = f.create_dataset("data", data=np.zeros((100, 4)))
+    del advised[:]
+    dset[10:20] = 1
+    assert ("memmap", "dontneed", 10 * 32, 20 * 32) in advised
+
+    del advised[:]
+    size = (dset.directory / "data.npy").stat().st_size
+    dset.append(np.ones((5, 4)))
+    assert ("file", "dontneed", size, 5 * 32) in advised
+    f.close()
+
+    f = exdir.File(setup_teardown_folder[1], mode="r")
+    assert np.array_equal(f["data"][10:20], np.ones((10, 4)))
+    assert np.array_equal(f["data"][100:], np.ones((5, 4)))
+    f.close()
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Exdir, the Experimental Directory Structure.
+#
+# License: MIT, see "LICENSE" file for the full license terms.
+
+import pytest
+import numpy as np
+
+import exdir
+from exdir.core import pread
+from exdir.core.block_cache import BlockCache
+
+
+class Source:
+    def __init__(self, size):
+        self.data = (np.arange(size) % 251).astype(np.uint8)
+        self.requests = []
+
+    def read_range(self, start, stop):
+        self.requests.append((start, stop))
+        return self.data[start:stop].copy()
+
+
+def test_hits_and_misses():
+    source = Source(10000)
+    cache = BlockCache(max_bytes=4096, block_bytes=100)
+    assert np.array_equal(cache.read("a", 150, 420, source.read_range), source.data[150:420])
+    assert source.requests == [(100, 500)]
+    assert cache.statistics()["misses"] == 4
+
+    assert np.array_equal(cache.read("a", 120, 480, source.read_range), source.data[120:480])
+    assert len(source.requests) == 1
+    assert cache.statistics()["hits"] == 4
+
+    # only the missing blocks are read, one run at a time
+    assert np.array_equal(cache.read("a", 0, 700, source.read_range), source.data[:700])
+    assert source.requests[1:] == [(0, 100), (500, 700)]
+
+
+def test_budget():
+    source = Source(10000)
+    cache = BlockCache(max_bytes=300, block_bytes=100)
+    cache.read("a", 0, 100, source.read_range)
+    cache.read("a", 100, 200, source.read_range)
+    cache.read("a", 0, 50, source.read_range)
+    cache.read("a", 200, 300, source.read_range)
+    cache.read("a", 300, 400, source.read_range)
+    statistics = cache.statistics()
+    assert statistics["cached_bytes"] <= 300
+    assert statistics["evictions"] == 1
+    # the least recently used block was dropped
+    del source.requests[:]
+    cache.read("a", 0, 100, source.read_range)
+    assert source.requests == []
+    cache.read("a", 100, 200, source.read_range)
+    assert source.requests == [(100, 200)]
+
+
+def test_large_reads_bypass_the_cache():
+    source = Source(10000)
+    cache = BlockCache(max_bytes=1000, block_bytes=100)
+    assert np.array_equal(cache.read("a", 0, 800, source.read_range), source.data[:800])
+    assert source.requests == [(0, 800)]
+    assert cache.statistics()["cached_bytes"] == 0
+
+
+def test_partial_blocks_are_not_cached():
+    source = Source(250)
+    cache = BlockCache(max_bytes=1000, block_bytes=100)
+    assert np.array_equal(cache.read("a", 150, 250, source.read_range), source.data[150:250])
+    assert cache.statistics()["cached_bytes"] == 100
+
+
+def test_invalidate():
+    source = Source(10000)
+    cache = BlockCache(max_bytes=10000, block_bytes=100)
+    cache.read("a", 0, 1000, source.read_range)
+    cache.read("b", 0, 1000, source.read_range)
+    cache.invalidate("a", 250, 420)
+    assert cache.statistics()["invalidations"] == 3
+    del source.requests[:]
+    cache.read("a", 0, 1000, source.read_range)
+    assert source.requests == [(200, 500)]
+    cache.invalidate("b")
+    assert cache.statistics()["cached_bytes"] == 1000
+
+
+@pytest.mark.parametrize("invalidate", [
+    lambda cache: cache.invalidate("a", 0, 100),
+    lambda cache: cache.clear()
+])
+def test_write_during_read(invalidate):
+    source = Source(1000)
+    cache = BlockCache(max_bytes=10000, block_bytes=100)
+
+    def read_then_write(start, stop):
+        data = source.read_range(start, stop)
+        # written and invalidated after the old bytes were read
+        source.data[:] = 1
+        invalidate(cache)
+        return data
+
+    assert np.all(cache.read("a", 0, 200, read_then_write)[:3] == [0, 1, 2])
+    # the old bytes are not cached
+    assert np.all(cache.read("a", 0, 200, source.read_range) == 1)
+    assert np.all(cache.read("a", 0, 200, source.read_range) == 1)
+    assert cache.statistics()["cached_bytes"] == 200
+
+
+def test_invalid_size():
+    with pytest.raises(ValueError):
+        BlockCache(max_bytes=0)
+
+
+def test_dataset_reads(setup_teardown_folder, monkeypatch):
+    requests = []
+    read_into = pread._read_into
+
+    def counting_read_into(descriptor, buffer, offset):
+        requests.append(offset)
+        return read_into(descriptor, buffer, offset)
+    monkeypatch.setattr(pread, "_read_into", counting_read_into)
+
+    f = exdir.File(
+        setup_teardown_folder[1], mode="w", io_backend="pread",
+        cache_size=1 << 20, cache_block_size=4096
+    )
+    data = np.arange(10000.0)
+    dset = f.create_dataset("data", data=data)
+    del requests[:]
+    for start in range(0, 1000, 100):
+        assert np.array_equal(dset[start:start + 500], data[start:start + 500])
+    assert len(requests) <= 2
+    statistics = f.cache_statistics()
+    assert statistics["hits"] > statistics["misses"]
+
+    # writes invalidate the blocks they touch
+    dset[200:210] = -1
+    data[200:210] = -1
+    assert np.array_equal(dset[:1000], data[:1000])
+    assert f.cache_statistics()["invalidations"] > 0
+
+    # other handles to the same data share the cache
+    del requests[:]
+    assert np.array_equal(f["data"][:1000], data[:1000])
+    assert requests == []
+
+    dset.append(np.ones(10))
+    assert np.array_equal(dset[-20:], np.concatenate([data[-10:], np.ones(10)]))
+
+    dset.data = np.zeros(10)
+    assert np.array_equal(dset[:], np.zeros(10))
+    f.close()
+    assert f.cache_statistics()["cached_bytes"] == 0
+
+
+def test_disabled_by_default(setup_teardown_file):
+    f = setup_teardown_file[3]
+    assert f.cache_statistics() == {}
@@ -611,3 +611,278 @@ def test_modify_all(setup_teardown_file):
     dset = f.create_dataset("test", data=np.arange(10))
     dset.data = np.ones(4)
     assert np.all(dset.data == np.ones(4))
+
+
+# Feature: Appending to datasets
+
+def test_append(setup_teardown_file):
+    f = setup_teardown_file[3]
+    dset = f.create_dataset("foo", data=np.arange(6).reshape(3, 2))
+
+    dset.append([[6, 7]])
+    dset.append(np.arange(8, 12).reshape(2, 2))
+
+    assert dset.shape == (6, 2)
+    assert np.array_equal(dset[:], np.arange(12).reshape(6, 2))
+    assert np.array_equal(f["foo"][:], np.arange(12).reshape(6, 2))
+
+    with pytest.raises(ValueError):
+        dset.append(np.zeros((1, 3)))
+
+
+def test_append_scalar(setup_teardown_file):
+    f = setup_teardown_file[3]
+    dset = f.create_dataset("foo", data=1.0)
+
+    with pytest.raises(TypeError):
+        dset.append([2.0])
+
+
+# Feature: Sorted index for time range queries
+
+def test_time_slice(setup_teardown_file):
+    f = setup_teardown_file[3]
+    times = np.sort(np.random.uniform(0, 100, 1000))
+    dset = f.create_dataset("times", data=times)
+    dset.build_index(step=16)
+
+    assert (dset.directory / "index.npy").exists()
+    assert dset.meta["sorted_index"]["step"] == 16
+
+    for start, stop in [(10, 20), (-5, 3), (99, 200), (50, 50), (20, 10)]:
+        expected = times[(times >= start) & (times < stop)]
+        assert np.array_equal(dset.time_slice(start, stop), expected)
+
+    first, last = dset.time_bounds(times[100], times[200])
+    assert (first, last) == (100, 200)
+
+
+def test_time_slice_without_index(setup_teardown_file):
+    f = setup_teardown_file[3]
+    times = np.arange(100) * 0.5
+    dset = f.create_dataset("times", data=times)
+
+    assert np.array_equal(dset.time_slice(2, 4), [2.0, 2.5, 3.0, 3.5])
+
+
+def test_time_slice_duplicates(setup_teardown_file):
+    f = setup_teardown_file[3]
+    times = np.repeat(np.arange(10), 7)
+    dset = f.create_dataset("times", data=times)
+    dset.build_index(step=4)
+
+    assert dset.time_bounds(3, 5) == (21, 35)
+
+
+def test_index_append(setup_teardown_file):
+    f = setup_teardown_file[3]
+    dset = f.create_dataset("times", data=np.arange(10))
+    dset.build_index(step=4)
+
+    for i in range(10):
+        dset.append(np.arange(10 + i * 7, 17 + i * 7))
+
+    index = np.load(str(dset.directory / "index.npy"))
+    assert np.array_equal(index, np.arange(0, 80, 4))
+    assert np.array_equal(dset.time_slice(33, 41), np.arange(33, 41))
+
+    with pytest.raises(ValueError):
+        dset.append([1, 2])
+    with pytest.raises(ValueError):
+        dset.append([100, 99])
+    assert len(dset) == 80
+
+
+def test_index_write(setup_teardown_file):
+    f = setup_teardown_file[3]
+    dset = f.create_dataset("times", data=np.arange(20))
+    dset.build_index(step=4)
+
+    dset[8:13] = np.arange(8, 13) * 10
+    index = np.load(str(dset.directory / "index.npy"))
+    assert np.array_equal(index, [0, 4, 80, 120, 16])
+
+    dset.data = np.arange(6) * 2
+    index = np.load(str(dset.directory / "index.npy"))
+    assert np.array_equal(index, [0, 8])
+
+    with pytest.raises(ValueError):
+        dset.data = np.zeros((3, 2))
+    assert np.array_equal(dset[:], np.arange(6) * 2)
+    assert np.array_equal(dset.time_slice(4, 9), [4, 6, 8])
+
+
+def test_index_multidimensional(setup_teardown_file):
+    f = setup_teardown_file[3]
+    dset = f.create_dataset("foo", data=np.zeros((3, 2)))
+
+    with pytest.raises(ValueError):
+        dset.build_index()
+
+
+# Feature: Block statistics
+
+def assert_stats(result, values):
+    values = np.asarray(values, dtype=np.float64)
+    valid = values[~np.isnan(values)]
+    assert result["count"] == valid.size
+    assert result["nan_count"] == values.size - valid.size
+    assert np.isclose(result["sum"], valid.sum())
+    if valid.size > 0:
+        assert result["min"] == valid.min()
+        assert result["max"] == valid.max()
+        assert np.isclose(result["mean"], valid.mean())
+
+
+def test_stats(setup_teardown_file):
+    f = setup_teardown_file[3]
+    data = np.random.normal(size=(1000, 3))
+    data[17, 1] = np.nan
+    dset = f.create_dataset("signal", data=data)
+    dset.build_stats(block_size=64)
+
+    assert (dset.directory / "stats.npy").exists()
+    assert dset.meta["block_stats"]["block_size"] == 64
+
+    assert_stats(dset.stats(), data)
+    for selection in [slice(10, 20), slice(0, 128), slice(5, 900), slice(-100, None)]:
+        assert_stats(dset.stats(selection), data[selection])
+
+    with pytest.raises(ValueError):
+        dset.stats(slice(0, 100, 2))
+
+
+def test_stats_without_blocks(setup_teardown_file):
+    f = setup_teardown_file[3]
+    dset = f.create_dataset("signal", data=np.arange(10))
+
+    assert_stats(dset.stats(slice(2, 5)), [2, 3, 4])
+
+
+def test_stats_reads_only_edges(setup_teardown_file):
+    f = setup_teardown_file[3]
+    data = np.arange(1000.0)
+    dset = f.create_dataset("signal", data=data)
+    dset.build_stats(block_size=100)
+
+    # modify the data behind the back of the statistics to show
+    # that fully covered blocks are not read
+    np.asarray(dset._data)[250:650] = 0
+    result = dset.stats(slice(250, 650))
+    assert result["count"] == 400
+    assert result["min"] == 0
+    assert result["max"] == 599
+
+
+def test_stats_update(setup_teardown_file):
+    f = setup_teardown_file[3]
+    data = np.arange(250.0)
+    dset = f.create_dataset("signal", data=data)
+    dset.build_stats(block_size=100)
+
+    dset[120:130] = np.nan
+    data[120:130] = np.nan
+    dset[-1] = 1000
+    data[-1] = 1000
+    assert_stats(dset.stats(), data)
+
+    dset.append(np.arange(75.0))
+    data = np.concatenate([data, np.arange(75.0)])
+    assert len(np.load(str(dset.directory / "stats.npy"))) == 4
+    assert_stats(dset.stats(), data)
+    assert_stats(dset.stats(slice(100, 300)), data[100:300])
+
+    dset.data = np.ones(10)
+    assert_stats(dset.stats(), np.ones(10))
+
+
+def test_stats_invalid_type(setup_teardown_file):
+    f = setup_teardown_file[3]
+    dset = f.create_dataset("names", data=np.array(["a", "b"]))
+
+    with pytest.raises(ValueError):
+        dset.build_stats()
+
+
+# Feature: Downsampled pyramid levels
+
+def reference_level(data, factor):
+    buckets = [data[i:i + factor] for i in range(0, len(data), factor)]
+    return (
+        np.array([b.min(axis=0) for b in buckets]),
+        np.array([b.max(axis=0) for b in buckets]),
+        np.array([b.mean(axis=0) for b in buckets]),
+    )
+
+
+def assert_level(dset, data, factor):
+    level = np.load(str(dset.directory / "pyramid_{}.npy".format(factor)))
+    minimum, maximum, mean = reference_level(data, factor)
+    assert np.array_equal(level[:, 0], minimum)
+    assert np.array_equal(level[:, 1], maximum)
+    assert np.allclose(level[:, 2], mean)
+
+
+def test_build_pyramid(setup_teardown_file):
+    f = setup_teardown_file[3]
+    data = np.random.normal(size=(1000, 2))
+    dset = f.create_dataset("signal", data=data)
+    dset.build_pyramid(factors=[4, 16, 24, 100])
+
+    assert dset.meta["pyramid"]["factors"] == [4, 16, 24, 100]
+    for factor in [4, 16, 24, 100]:
+        assert_level(dset, data, factor)
+
+    dset.build_pyramid(factors=[10])
+    assert not (dset.directory / "pyramid_4.npy").exists()
+    assert_level(dset, data, 10)
+
+    with pytest.raises(ValueError):
+        dset.build_pyramid(factors=[1])
+
+
+def test_read_resolution(setup_teardown_file):
+    f = setup_teardown_file[3]
+    data = np.arange(10000.0)
+    dset = f.create_dataset("signal", data=data)
+    dset.build_pyramid(factors=[10, 100, 1000])
+
+    result = dset.read_resolution(max_points=50)
+    assert result["factor"] == 100
+    assert len(result["min"]) == 100
+    assert np.array_equal(result["rows"], np.arange(0, 10000, 100))
+    assert result["max"][1] == 199
+
+    result = dset.read_resolution(slice(2000, 2500), max_points=40)
+    assert result["factor"] == 10
+    assert np.array_equal(result["min"], np.arange(2000, 2500, 10))
+
+    result = dset.read_resolution(slice(10, 30), max_points=40)
+    assert result["factor"] == 1
+    assert np.array_equal(result["mean"], data[10:30])
+
+
+def test_read_resolution_without_pyramid(setup_teardown_file):
+    f = setup_teardown_file[3]
+    dset = f.create_dataset("signal", data=np.arange(100))
+
+    result = dset.read_resolution(max_points=10)
+    assert result["factor"] == 1
+    assert len(result["mean"]) == 100
+
+
+def test_pyramid_update(setup_teardown_file):
+    f = setup_teardown_file[3]
+    data = np.random.normal(size=250)
+    dset = f.create_dataset("signal", data=data)
+    dset.build_pyramid(factors=[5, 20, 60])
+
+    for i in range(5):
+        chunk = np.random.normal(size=37)
+        dset.append(chunk)
+        data = np.concatenate([data, chunk])
+    dset[100:103] = 10.0
+    data[100:103] = 10.0
+
+    for factor in [5, 20, 60]:
+        assert_level(dset, data, factor)
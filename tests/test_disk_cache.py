@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Exdir, the Experimental Directory Structure.
+#
+# License: MIT, see "LICENSE" file for the full license terms.
+
+import os
+
+import pytest
+import numpy as np
+
+import exdir
+from exdir.core.disk_cache import DiskCache, MANIFEST_FILENAME
+
+
+def fetcher(contents, calls):
+    def fetch():
+        calls.append(contents)
+        return contents
+    return fetch
+
+
+def test_get(setup_teardown_folder):
+    cache = DiskCache(setup_teardown_folder[0] / "cache")
+    calls = []
+    assert cache.get("a", "1", fetcher(b"first", calls)) == b"first"
+    assert cache.get("a", "1", fetcher(b"other", calls)) == b"first"
+    # a new version is fetched again
+    assert cache.get("a", "2", fetcher(b"second", calls)) == b"second"
+    assert calls == [b"first", b"second"]
+    assert cache.statistics()["hits"] == 1
+    assert cache.statistics()["cached_bytes"] == 11
+
+
+def test_read_blocks(setup_teardown_folder):
+    cache = DiskCache(setup_teardown_folder[0] / "cache", block_bytes=10)
+    contents = bytes(range(95))
+    reads = []
+
+    def read_range(start, stop):
+        reads.append((start, stop))
+        return contents[start:stop]
+    assert cache.read("a", "1", 95, 5, 25, read_range) == contents[5:25]
+    assert reads == [(0, 30)]
+    assert cache.read("a", "1", 95, 15, 45, read_range) == contents[15:45]
+    assert reads == [(0, 30), (30, 50)]
+    assert cache.read("a", "1", 95, 80, 200, read_range) == contents[80:]
+    assert reads[-1] == (80, 95)
+
+
+def test_lru_eviction(setup_teardown_folder):
+    cache = DiskCache(setup_teardown_folder[0] / "cache", max_bytes=250)
+    calls = []
+    cache.get("a", "1", fetcher(b"a" * 100, calls))
+    cache.get("b", "1", fetcher(b"b" * 100, calls))
+    cache.get("a", "1", fetcher(b"a" * 100, calls))
+    cache.get("c", "1", fetcher(b"c" * 100, calls))
+    # b was used least recently
+    assert cache.statistics()["evictions"] == 1
+    assert cache.statistics()["cached_bytes"] == 200
+    cache.get("a", "1", fetcher(b"a" * 100, calls))
+    cache.get("b", "1", fetcher(b"b" * 100, calls))
+    assert calls == [b"a" * 100, b"b" * 100, b"c" * 100, b"b" * 100]
+    # entries larger than the cache are not kept
+    cache.get("d", "1", fetcher(b"d" * 300, calls))
+    assert cache.statistics()["cached_bytes"] <= 250
+
+
+def test_manifest(setup_teardown_folder):
+    directory = setup_teardown_folder[0] / "cache"
+    cache = DiskCache(directory, max_bytes=250)
+    calls = []
+    cache.get("a", "1", fetcher(b"a" * 100, calls))
+    cache.get("b", "1", fetcher(b"b" * 100, calls))
+    cache.get("a", "1", fetcher(b"a" * 100, calls))
+    cache.flush()
+
+    cache = DiskCache(directory, max_bytes=250)
+    assert cache.statistics()["cached_bytes"] == 200
+    # the order of use survives
+    cache.get("c", "1", fetcher(b"c" * 100, calls))
+    cache.get("a", "1", fetcher(b"a" * 100, calls))
+    assert calls == [b"a" * 100, b"b" * 100, b"c" * 100]
+
+    # without a manifest, the entries are found in the folder
+    os.remove(str(directory / MANIFEST_FILENAME))
+    cache = DiskCache(directory)
+    assert cache.statistics()["cached_bytes"] == 200
+    assert cache.get("a", "1", fetcher(b"x", calls)) == b"a" * 100
+
+    with pytest.raises(ValueError):
+        DiskCache(directory, max_bytes=0)
+
+
+def test_file(setup_teardown_folder):
+    cache_directory = setup_teardown_folder[0] / "cache"
+    f = exdir.File(setup_teardown_folder[1], mode="w")
+    data = f.create_dataset("data", data=np.arange(1000.0))
+    data.attrs["unit"] = "mV"
+    f.close()
+
+    for attempt in range(2):
+        f = exdir.File(
+            setup_teardown_folder[1], mode="r", io_backend="pread",
+            cache_directory=cache_directory, cache_block_size=1024
+        )
+        data = f["data"]
+        assert data.attrs["unit"] == "mV"
+        assert np.array_equal(data[100:110], np.arange(100.0, 110.0))
+        statistics = f.cache_statistics()
+        if attempt == 0:
+            assert statistics["disk_misses"] > 0
+        else:
+            # a new session starts with the entries of the last one
+            assert statistics["disk_misses"] == 0
+            assert statistics["disk_hits"] > 0
+            assert data._data.reads == 0
+        f.close()
+
+    # changes by others are detected
+    f = exdir.File(setup_teardown_folder[1], mode="a")
+    f["data"].data = np.arange(2000.0) * 2
+    f["data"].attrs["unit"] = "V"
+    f.close()
+    f = exdir.File(
+        setup_teardown_folder[1], mode="a", io_backend="pread",
+        cache_directory=cache_directory, cache_block_size=1024, cache_size=1 << 20
+    )
+    data = f["data"]
+    assert data.attrs["unit"] == "V"
+    assert np.array_equal(data[100:102], [200, 202])
+    # and so are changes through the File itself
+    data[100] = -1
+    data.attrs["unit"] = "uV"
+    assert data[100] == -1
+    assert data.attrs["unit"] == "uV"
+    f.close()
+
+
+def test_unsupported(setup_teardown_folder):
+    with pytest.raises(ValueError):
+        exdir.File(
+            setup_teardown_folder[1], storage="memory",
+            cache_directory=setup_teardown_folder[0] / "cache"
+        )
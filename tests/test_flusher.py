@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Exdir, the Experimental Directory Structure.
+#
+# License: MIT, see "LICENSE" file for the full license terms.
+
+import time
+
+import pytest
+import numpy as np
+
+import exdir
+from exdir.core import flusher
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_disabled_by_default(setup_teardown_file):
+    f = setup_teardown_file[3]
+    assert f._flusher is None
+    dset = f.create_dataset("data", data=np.zeros(10))
+    dset[2] = 1
+
+
+def test_tracks_written_rows(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w", flush_interval=1000)
+    dset = f.create_dataset("data", data=np.zeros((100, 4)))
+    header = dset._data.offset
+    dset[10:20] = 1
+    assert f._flusher._dirty == {
+        dset.data_filename: [header + 10 * 32, header + 20 * 32]
+    }
+    dset[50, 2] = 1
+    assert f._flusher._dirty[dset.data_filename] == [header + 10 * 32, header + 51 * 32]
+
+    size = (dset.directory / "data.npy").stat().st_size
+    dset.append(np.ones((10, 4)))
+    assert f._flusher._dirty[dset.data_filename] == [header + 10 * 32, size + 10 * 32]
+    f.close()
+    assert f._flusher._dirty == {}
+
+
+def test_background_flush(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w", flush_interval=0.01)
+    dset = f.create_dataset("data", data=np.zeros((1000, 10)))
+    dset[:500] = 1
+    assert wait_for(lambda: f._flusher.flushed_bytes >= 500 * 10 * 8)
+    assert f._flusher.dirty_bytes == 0
+    thread = f._flusher._thread
+    assert thread.is_alive()
+    f.close()
+    assert not thread.is_alive()
+
+    f = exdir.File(setup_teardown_folder[1], mode="r")
+    assert np.all(f["data"][:500] == 1)
+    f.close()
+
+
+def test_rate_limit(setup_teardown_folder, monkeypatch):
+    ranges = []
+
+    def sync_range(descriptor, offset, nbytes):
+        ranges.append((offset, nbytes))
+    monkeypatch.setattr(flusher, "sync_range", sync_range)
+
+    rate = 100000
+    f = exdir.File(
+        setup_teardown_folder[1], mode="w",
+        flush_interval=0.02, flush_rate=rate
+    )
+    dset = f.create_dataset("data", data=np.zeros(1000000, dtype=np.uint8))
+    start = time.monotonic()
+    dset[:] = 1
+    assert wait_for(lambda: len(ranges) >= 3)
+    elapsed = time.monotonic() - start
+    flushed = sum(nbytes for offset, nbytes in ranges)
+    assert flushed <= rate * (elapsed + 0.1)
+    assert f._flusher.dirty_bytes > 0
+    # ranges are written back in order
+    offsets = [offset for offset, nbytes in ranges]
+    assert offsets == sorted(offsets)
+    f.close()
+
+
+def test_invalid_settings(setup_teardown_folder):
+    with pytest.raises(ValueError):
+        exdir.File(setup_teardown_folder[1], mode="w", flush_interval=0)
+    with pytest.raises(ValueError):
+        exdir.File(setup_teardown_folder[1], mode="w", flush_interval=1, flush_rate=-1)
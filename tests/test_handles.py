@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Exdir, the Experimental Directory Structure.
+#
+# License: MIT, see "LICENSE" file for the full license terms.
+
+import concurrent.futures
+import multiprocessing
+import os
+import pathlib
+import pickle
+
+import numpy as np
+import pytest
+
+import exdir
+from exdir.core import handles
+
+try:
+    fork = multiprocessing.get_context("fork")
+except ValueError:
+    fork = None
+
+needs_fork = pytest.mark.skipif(fork is None, reason="needs the fork start method")
+
+
+def total(dataset):
+    return float(dataset[:].sum()), id(dataset.file)
+
+
+def add_attribute(group):
+    group.attrs["done"] = True
+
+
+def record_close(group, directory):
+    close = exdir.File.close
+
+    def record(file):
+        (pathlib.Path(directory) / "closed_{}".format(os.getpid())).touch()
+        close(file)
+    # only in this worker
+    exdir.File.close = record
+    return os.getpid()
+
+
+def test_pickle(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], pack_threshold=1024, io_backend="pread")
+    group = f.create_group("group")
+    dataset = group.create_dataset("data", data=np.arange(100000))
+    packed = group.create_dataset("small", data=np.arange(3))
+    raw = group.create_raw("raw")
+    np.asarray(dataset[:])
+
+    pickled = pickle.dumps(dataset)
+    # a handle, not the data
+    assert len(pickled) < 2000
+
+    handles.close_all()
+    copy = pickle.loads(pickled)
+    assert isinstance(copy, exdir.core.Dataset)
+    assert copy.file is not f
+    assert copy.file.io_backend == "pread"
+    assert copy.file.pack_threshold == 1024
+    assert np.array_equal(copy[:], np.arange(100000))
+
+    # handles of the same file share one File
+    copies = pickle.loads(pickle.dumps([f, group, packed, raw]))
+    assert all(obj.file is copy.file for obj in copies)
+    assert copies[0] is copy.file
+    assert isinstance(copies[1], exdir.core.Group)
+    assert copies[2]._packed
+    assert np.array_equal(copies[2][:], np.arange(3))
+    assert isinstance(copies[3], exdir.core.Raw)
+    assert copies[1].name == "/group"
+
+    copy.file.close()
+    assert pickle.loads(pickled).file is not copy.file
+    handles.close_all()
+    f.close()
+
+
+def test_modes(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w")
+    f.create_group("group").attrs["kept"] = True
+    copy = pickle.loads(pickle.dumps(f["group"]))
+    # not created again
+    assert copy.file.user_mode == "r+"
+    assert copy.attrs["kept"]
+    f.close()
+
+    f = exdir.File(setup_teardown_folder[1], mode="r")
+    copy = pickle.loads(pickle.dumps(f["group"]))
+    assert copy.file.user_mode == "r"
+    f.close()
+    handles.close_all()
+
+    f = exdir.File(setup_teardown_folder[1], storage=exdir.core.storage.MemoryStorage())
+    with pytest.raises(TypeError):
+        pickle.dumps(f)
+
+
+@needs_fork
+def test_process_pool(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1])
+    group = f.create_group("group")
+    for index in range(8):
+        group.create_dataset("data{}".format(index), data=np.arange(1000) * index)
+
+    with concurrent.futures.ProcessPoolExecutor(2, mp_context=fork) as executor:
+        results = list(executor.map(total, group.values()))
+        list(executor.map(add_attribute, [group]))
+
+    assert [value for value, _ in results] == [
+        float(np.arange(1000).sum() * index) for index in range(8)
+    ]
+    # each worker opened the file once
+    assert len(set(file_id for _, file_id in results)) <= 2
+    assert group.attrs["done"]
+    f.close()
+
+
+@needs_fork
+def test_workers_close_files(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1])
+    group = f.create_group("group")
+    with concurrent.futures.ProcessPoolExecutor(1, mp_context=fork) as executor:
+        pid = executor.submit(record_close, group, setup_teardown_folder[0]).result()
+    # the worker closed the file when it exited
+    assert (setup_teardown_folder[0] / "closed_{}".format(pid)).exists()
+    f.close()
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Exdir, the Experimental Directory Structure.
+#
+# License: MIT, see "LICENSE" file for the full license terms.
+
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+import exdir
+
+fcntl = pytest.importorskip("fcntl")
+
+try:
+    fork = multiprocessing.get_context("fork")
+except ValueError:
+    fork = None
+
+needs_fork = pytest.mark.skipif(fork is None, reason="needs the fork start method")
+
+
+def run_workers(target, directory, count):
+    processes = [
+        fork.Process(target=target, args=(str(directory), worker))
+        for worker in range(count)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+
+def update_attributes(directory, worker):
+    f = exdir.File(directory, mode="a", locking=True)
+    for index in range(20):
+        f["group"].attrs["worker{}_{}".format(worker, index)] = index
+    f.close()
+
+
+def create_groups(directory, worker):
+    f = exdir.File(directory, mode="a", locking=True)
+    for index in range(20):
+        name = "group{}".format(index)
+        try:
+            f.create_group(name if worker % 2 == 0 else name.upper())
+        except (RuntimeError, FileExistsError):
+            pass
+        f.require_group("shared{}".format(index))
+    f.close()
+
+
+@needs_fork
+def test_attribute_updates(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w")
+    f.create_group("group")
+    f.close()
+    run_workers(update_attributes, setup_teardown_folder[1], 4)
+    f = exdir.File(setup_teardown_folder[1], mode="r")
+    # no update is lost
+    assert len(f["group"].attrs) == 80
+    f.close()
+
+
+@needs_fork
+def test_create(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w")
+    f.close()
+    run_workers(create_groups, setup_teardown_folder[1], 4)
+    f = exdir.File(setup_teardown_folder[1], mode="r")
+    names = list(f)
+    # names that only differ in case are never both created
+    assert len(names) == 40
+    assert len(set(name.lower() for name in names)) == 40
+    f.close()
+
+
+def test_statistics(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w", locking=True)
+    f.attrs["a"] = 1
+    assert f.lock_statistics()["acquisitions"] > 0
+    assert f.lock_statistics()["contended"] == 0
+
+    # another process would use another open file, like this thread
+    other = exdir.core.locking.Locks(True)
+    held = threading.Event()
+
+    def hold():
+        with other.exclusive(f.directory):
+            held.set()
+            time.sleep(0.2)
+    thread = threading.Thread(target=hold)
+    thread.start()
+    held.wait()
+    f.create_group("group")
+    thread.join()
+    statistics = f.lock_statistics()
+    assert statistics["contended"] == 1
+    assert statistics["max_wait_seconds"] > 0.1
+    assert statistics["wait_seconds"] >= statistics["max_wait_seconds"]
+    f.close()
+
+
+def test_reentrant(setup_teardown_folder):
+    locks = exdir.core.locking.Locks(True)
+    with locks.exclusive(setup_teardown_folder[0]):
+        with locks.shared(setup_teardown_folder[0]):
+            with locks.exclusive(setup_teardown_folder[0]):
+                pass
+    assert locks.statistics()["acquisitions"] == 1
+    # a read lock is never upgraded, since flock would release it first
+    with locks.shared(setup_teardown_folder[0]):
+        with pytest.raises(RuntimeError):
+            with locks.exclusive(setup_teardown_folder[0]):
+                pass
+    assert locks.statistics()["acquisitions"] == 2
+    # nothing is locked when disabled
+    locks = exdir.core.locking.Locks(False)
+    with locks.exclusive(setup_teardown_folder[0] / "missing"):
+        pass
+    assert locks.statistics()["acquisitions"] == 0
+
+
+def test_read_only(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w")
+    f.create_group("group").attrs["a"] = 1
+    f.close()
+    f = exdir.File(setup_teardown_folder[1], mode="r", locking=True)
+    assert f["group"].attrs["a"] == 1
+    assert "group" in f
+    f.close()
+    # readers do not create lock files
+    for _, _, filenames in os.walk(str(setup_teardown_folder[1])):
+        assert exdir.core.locking.LOCK_FILENAME not in filenames
+
+
+def test_unsupported(setup_teardown_folder):
+    with pytest.raises(ValueError):
+        exdir.File(setup_teardown_folder[1], storage="memory", locking=True)
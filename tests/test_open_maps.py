@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Exdir, the Experimental Directory Structure.
+#
+# License: MIT, see "LICENSE" file for the full license terms.
+
+import pytest
+import numpy as np
+
+import exdir
+
+
+def test_unbounded_by_default(setup_teardown_file):
+    f = setup_teardown_file[3]
+    datasets = [f.create_dataset("d{}".format(i), data=np.arange(10)) for i in range(20)]
+    for dset in datasets:
+        dset[:]
+    statistics = f.map_statistics()
+    assert statistics["open_maps"] == 20
+    assert statistics["mapped_bytes"] == 20 * np.arange(10).nbytes
+    assert statistics["evictions"] == 0
+
+
+def test_max_open_maps(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w", max_open_maps=5)
+    for i in range(20):
+        f.create_dataset("d{}".format(i), data=np.full(10, i))
+    assert f.map_statistics()["open_maps"] <= 5
+
+    datasets = [f["d{}".format(i)] for i in range(20)]
+    for i, dset in enumerate(datasets):
+        assert np.array_equal(dset[:], np.full(10, i))
+        assert f.map_statistics()["open_maps"] <= 5
+
+    # evicted datasets map their data again on the next access
+    datasets[0][3] = 100
+    assert datasets[0][3] == 100
+    statistics = f.map_statistics()
+    assert statistics["open_maps"] <= 5
+    assert statistics["evictions"] > 0
+    assert statistics["remaps"] >= 1
+    f.close()
+
+    f = exdir.File(setup_teardown_folder[1], mode="r")
+    assert f["d0"][3] == 100
+    f.close()
+
+
+def test_least_recently_used_is_evicted(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w", max_open_maps=2)
+    a = f.create_dataset("a", data=np.arange(10))
+    b = f.create_dataset("b", data=np.arange(10))
+    a[0]
+    c = f.create_dataset("c", data=np.arange(10))
+    assert a._data_memmap is not None
+    assert b._data_memmap is None
+    assert c._data_memmap is not None
+    f.close()
+
+
+def test_max_mapped_bytes(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w", max_mapped_bytes=1000)
+    datasets = [
+        f.create_dataset("d{}".format(i), data=np.zeros(50, dtype=np.float64))
+        for i in range(10)
+    ]
+    for dset in datasets:
+        assert np.array_equal(dset[:], np.zeros(50))
+        assert f.map_statistics()["mapped_bytes"] <= 1000
+
+    # a single dataset larger than the budget is kept while it is used
+    large = f.create_dataset("large", data=np.ones(1000))
+    assert np.array_equal(large[:], np.ones(1000))
+    assert f.map_statistics()["open_maps"] == 1
+    f.close()
+
+
+def test_other_objects_are_bounded(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w", max_open_maps=4)
+    ragged = f.create_ragged_dataset("ragged", [[1, 2], [3]])
+    table = f.create_table("table", {"a": np.arange(3), "b": np.arange(3)})
+    sparse = f.create_sparse_dataset("sparse", data=np.eye(3))
+    for i in range(3):
+        assert np.array_equal(ragged[0], [1, 2])
+        assert np.array_equal(table["b"], np.arange(3))
+        assert np.array_equal(sparse[:], np.eye(3))
+        assert f.map_statistics()["open_maps"] <= 4
+    assert f.map_statistics()["remaps"] > 0
+    f.close()
+
+
+def test_collected_datasets_are_removed(setup_teardown_file):
+    f = setup_teardown_file[3]
+    dset = f.create_dataset("data", data=np.arange(10))
+    dset[:]
+    assert f.map_statistics()["open_maps"] == 1
+    del dset
+    assert f.map_statistics()["open_maps"] == 0
+
+
+def test_invalid_budget(setup_teardown_folder):
+    with pytest.raises(ValueError):
+        exdir.File(setup_teardown_folder[1], mode="w", max_open_maps=0)
+
+
+def test_close_releases_maps(setup_teardown_folder, monkeypatch):
+    import gc
+    import weakref
+
+    def no_collect(*args):
+        raise AssertionError("close should not run the garbage collector")
+    monkeypatch.setattr(gc, "collect", no_collect)
+
+    f = exdir.File(setup_teardown_folder[1], mode="w")
+    dset = f.create_dataset("data", data=np.arange(10))
+    dset[2] = 5
+    ragged = f.create_ragged_dataset("ragged", [[1, 2], [3]])
+    ragged[0]
+    memmap = weakref.ref(dset._data_memmap)
+    values = weakref.ref(ragged._memmaps[1])
+    f.close()
+
+    assert memmap() is None
+    assert values() is None
+    assert f.map_statistics()["open_maps"] == 0
+    with pytest.raises(IOError):
+        dset[:]
+
+    f = exdir.File(setup_teardown_folder[1], mode="r")
+    assert f["data"][2] == 5
+    f.close()
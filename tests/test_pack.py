@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Exdir, the Experimental Directory Structure.
+#
+# License: MIT, see "LICENSE" file for the full license terms.
+
+import pytest
+import numpy as np
+
+import exdir
+from exdir.core import Dataset
+from exdir.core import locking
+from exdir.core import pack
+from exdir.core.constants import PACK_INDEX_FILENAME
+
+
+def test_small_datasets_are_packed(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w", pack_threshold=1024)
+    grp = f.create_group("group")
+    small = grp.create_dataset("small", data=np.arange(10))
+    large = grp.create_dataset("large", data=np.arange(1000))
+
+    assert isinstance(small, Dataset)
+    assert not (grp.directory / "small").exists()
+    assert (grp.directory / "large").exists()
+    assert (grp.directory / PACK_INDEX_FILENAME).exists()
+
+    assert "small" in grp
+    assert "group/small" in f
+    assert list(grp) == ["large", "small"]
+    assert len(grp) == 2
+    assert np.array_equal(small[:], np.arange(10))
+    assert np.array_equal(grp["small"][2:5], [2, 3, 4])
+    assert np.array_equal(f["group/small"].data, np.arange(10))
+    assert small.shape == (10,)
+    assert small.dtype == np.arange(10).dtype
+    assert np.array_equal(large[:], np.arange(1000))
+    f.close()
+
+
+def test_packing_is_off_by_default(setup_teardown_file):
+    f = setup_teardown_file[3]
+    f.create_dataset("small", data=np.arange(10))
+    assert (f.directory / "small").exists()
+    assert not (f.directory / PACK_INDEX_FILENAME).exists()
+
+
+def test_packed_reopen(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w", pack_threshold=1024)
+    for i in range(20):
+        f.create_dataset("scalar_{}".format(i), data=float(i))
+    f.close()
+
+    # packed datasets are readable without the threshold set
+    f = exdir.File(setup_teardown_folder[1], mode="r")
+    assert len(f) == 20
+    for i in range(20):
+        assert f["scalar_{}".format(i)].data == float(i)
+        assert f["scalar_{}".format(i)].shape == ()
+    f.close()
+
+
+def test_packed_write(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w", pack_threshold=1024)
+    dset = f.create_dataset("small", data=np.zeros(8))
+    dset[2:4] = 5
+    assert not (f.directory / "small").exists()
+    f.close()
+
+    f = exdir.File(setup_teardown_folder[1], mode="r")
+    assert np.array_equal(f["small"][:], [0, 0, 5, 5, 0, 0, 0, 0])
+    f.close()
+
+
+def test_packed_name_conflict(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w", pack_threshold=1024)
+    f.create_dataset("small", data=np.zeros(8))
+    with pytest.raises(RuntimeError):
+        f.create_dataset("small", data=np.zeros(8))
+    with pytest.raises(RuntimeError):
+        f.create_group("small")
+    f.close()
+
+
+def test_unpack_on_attributes(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w", pack_threshold=1024)
+    dset = f.create_dataset("small", data=np.arange(4))
+    assert dset.attrs.to_dict() == {}
+    assert dset.meta["exdir"]["type"] == "dataset"
+
+    dset.attrs["unit"] = "mV"
+    assert (f.directory / "small").exists()
+    assert "small" not in pack.get_pack(f, f.directory)
+    assert list(f) == ["small"]
+    assert f["small"].attrs["unit"] == "mV"
+    assert np.array_equal(f["small"][:], np.arange(4))
+    f.close()
+
+
+def test_unpack_on_reshape(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w", pack_threshold=1024)
+    dset = f.create_dataset("small", data=np.arange(4))
+    other = f["small"]
+    dset.data = np.arange(6)
+    assert (f.directory / "small").exists()
+    assert np.array_equal(f["small"][:], np.arange(6))
+    assert np.array_equal(other[:], np.arange(6))
+    f.close()
+
+
+def test_unpack_on_append(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w", pack_threshold=1024)
+    dset = f.create_dataset("small", data=np.arange(4))
+    dset.append([4, 5])
+    assert (f.directory / "small").exists()
+    assert np.array_equal(f["small"][:], np.arange(6))
+    f.close()
+
+
+def test_delete_packed(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w", pack_threshold=1024)
+    f.create_dataset("a", data=np.arange(4))
+    f.create_dataset("b", data=np.arange(4))
+    del f["a"]
+    assert "a" not in f
+    assert list(f) == ["b"]
+    f.create_dataset("a", data=np.arange(3))
+    assert np.array_equal(f["a"][:], np.arange(3))
+    f.close()
+
+
+def test_repack(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w")
+    for i in range(5):
+        f.create_dataset("small_{}".format(i), data=np.full(4, i))
+    f.create_dataset("large", data=np.arange(1000))
+    attributed = f.create_dataset("attributed", data=np.arange(4))
+    attributed.attrs["unit"] = "s"
+    f.close()
+
+    f = exdir.File(setup_teardown_folder[1], mode="a", pack_threshold=1024)
+    f.repack()
+    for i in range(5):
+        assert not (f.directory / "small_{}".format(i)).exists()
+        assert np.array_equal(f["small_{}".format(i)][:], np.full(4, i))
+    assert (f.directory / "large").exists()
+    assert (f.directory / "attributed").exists()
+
+    del f["small_0"]
+    del f["small_1"]
+    data_filenames = list(f.directory.glob("__pack__.*.data"))
+    size = data_filenames[0].stat().st_size
+    f.repack()
+    data_filenames = list(f.directory.glob("__pack__.*.data"))
+    assert len(data_filenames) == 1
+    assert data_filenames[0].stat().st_size < size
+    assert sorted(f) == ["attributed", "large", "small_2", "small_3", "small_4"]
+    assert np.array_equal(f["small_3"][:], np.full(4, 3))
+    f.close()
+
+
+@pytest.mark.skipif(locking.fcntl is None, reason="needs fcntl")
+def test_repack_locked(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], locking=True)
+    small = f.create_dataset("small", data=np.arange(4))
+    # left behind by writers that lock the dataset folder
+    with f._locks.exclusive(small.directory):
+        pass
+    assert (small.directory / locking.LOCK_FILENAME).exists()
+    f.pack_threshold = 1024
+    f.repack()
+    assert not small.directory.exists()
+    assert np.array_equal(f["small"][:], np.arange(4))
+    f.close()
+
+
+def test_repack_open_handles(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], pack_threshold=1024)
+    group = f.create_group("group")
+    packed = group.create_dataset("packed", data=np.array([10, 1, 2]))
+    f.pack_threshold = None
+    moved = group.create_dataset("moved", data=np.arange(3))
+    f.pack_threshold = 1024
+    np.asarray(packed[:])
+    np.asarray(moved[:])
+
+    group.repack()
+    assert not moved.directory.exists()
+    packed[1] = 20
+    moved[0] = 99
+
+    assert moved._packed
+    assert np.array_equal(group["packed"][:], [10, 20, 2])
+    assert np.array_equal(group["moved"][:], [99, 1, 2])
+    f.close()
+
+    f = exdir.File(setup_teardown_folder[1], mode="r")
+    assert np.array_equal(f["group/packed"][:], [10, 20, 2])
+    assert np.array_equal(f["group/moved"][:], [99, 1, 2])
+    f.close()
+
+
+def test_pack_index_is_reserved(setup_teardown_file):
+    f = setup_teardown_file[3]
+    with pytest.raises(NameError):
+        f.create_group(PACK_INDEX_FILENAME)
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Exdir, the Experimental Directory Structure.
+#
+# License: MIT, see "LICENSE" file for the full license terms.
+
+import concurrent.futures
+import multiprocessing
+import pickle
+
+import numpy as np
+import pytest
+
+import exdir
+
+try:
+    fork = multiprocessing.get_context("fork")
+except ValueError:
+    fork = None
+
+
+def write_channel(writer, channel):
+    writer[:, channel] = np.arange(writer.shape[0]) * channel
+    return channel
+
+
+@pytest.mark.skipif(fork is None, reason="needs the fork start method")
+@pytest.mark.parametrize("io_backend", ["mmap", "pread"])
+def test_process_pool(setup_teardown_folder, io_backend):
+    f = exdir.File(setup_teardown_folder[1], io_backend=io_backend, cache_size=2**20)
+    dataset = f.create_dataset("filtered", data=np.zeros((1000, 16)))
+    dataset.build_stats(block_size=100)
+    dataset.attrs["unit"] = "mV"
+    attributes_mtime = dataset.attributes_filename.stat().st_mtime_ns
+
+    writer = dataset.open_for_parallel_write()
+    with concurrent.futures.ProcessPoolExecutor(4, mp_context=fork) as executor:
+        channels = list(executor.map(write_channel, [writer] * 16, range(16)))
+    assert channels == list(range(16))
+    # the workers did not touch the attributes
+    assert dataset.attributes_filename.stat().st_mtime_ns == attributes_mtime
+
+    writer.commit(attrs={"filter": "bandpass", "channels": 16})
+    expected = np.arange(1000)[:, np.newaxis] * np.arange(16)
+    assert np.array_equal(dataset[:], expected)
+    assert dataset.stats()["max"] == 999 * 15
+    assert dataset.attrs["filter"] == "bandpass"
+    assert dataset.attrs["channels"] == 16
+    f.close()
+
+
+def test_writer(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], pack_threshold=1024)
+    dataset = f.create_dataset("data", data=np.zeros(10))
+    assert dataset._packed
+    writer = dataset.open_for_parallel_write()
+    assert not dataset._packed
+    dataset.attrs["kept"] = True
+
+    copy = pickle.loads(pickle.dumps(writer))
+    copy[2:4] = [1, 2]
+    assert np.array_equal(copy[:4], [0, 0, 1, 2])
+    with pytest.raises(RuntimeError):
+        copy.commit()
+    writer.commit(attrs={"done": True})
+    assert np.array_equal(dataset[:4], [0, 0, 1, 2])
+    assert dataset.attrs.to_dict() == {"kept": True, "done": True}
+
+    # new data replaces the file that is written to
+    writer = dataset.open_for_parallel_write()
+    dataset.data = np.zeros(5)
+    with pytest.raises(RuntimeError):
+        writer[0] = 1
+    with pytest.raises(RuntimeError):
+        writer.commit()
+
+    with pytest.raises(TypeError):
+        f.create_dataset("scalar", data=1.0).open_for_parallel_write()
+    f.close()
+
+    f = exdir.File(setup_teardown_folder[1], mode="r")
+    with pytest.raises(IOError):
+        f["data"].open_for_parallel_write()
+    f.close()
+
+
+@pytest.mark.parametrize("mode", ["none", "close", "batch", "always"])
+def test_commit_syncs(setup_teardown_folder, fsynced, mode):
+    f = exdir.File(setup_teardown_folder[1], sync=mode)
+    dataset = f.create_dataset("data", data=np.zeros(10))
+    writer = dataset.open_for_parallel_write()
+    pickle.loads(pickle.dumps(writer))[:5] = 1
+    del fsynced[:]
+    writer.commit()
+    if mode == "none":
+        assert fsynced == []
+    else:
+        # right away, not when the file is closed
+        assert fsynced == [dataset.data_filename]
+    f.close()
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Exdir, the Experimental Directory Structure.
+#
+# License: MIT, see "LICENSE" file for the full license terms.
+
+import os
+import pathlib
+import shutil
+import tempfile
+import time
+
+import pytest
+import numpy as np
+
+import exdir
+from exdir.core import pread
+
+
+KEYS = [
+    0, -1, 5, (), Ellipsis,
+    slice(None), slice(3, 50), slice(None, None, -3), slice(190, 2, -7), slice(10, 5),
+    [3, 1, 150], [0, 199], np.arange(200) % 3 == 0,
+    (slice(2, 10), 3), (Ellipsis, 2), (4, Ellipsis), (Ellipsis, 4, 2),
+    (slice(None), [1, 2]), (5, slice(1, 3)),
+]
+
+
+@pytest.fixture
+def npy_file(setup_teardown_folder):
+    data = np.arange(200 * 6, dtype=np.float32).reshape(200, 6)
+    filename = setup_teardown_folder[0] / "array.npy"
+    np.save(str(filename), data)
+    yield filename, data
+
+
+@pytest.mark.parametrize("key", KEYS)
+def test_read(npy_file, key):
+    filename, data = npy_file
+    array = pread.PreadArray(filename)
+    result = array[key]
+    assert result.shape == data[key].shape
+    assert np.array_equal(result, data[key])
+    array.close()
+
+
+@pytest.mark.parametrize("key", KEYS)
+def test_write(npy_file, key):
+    filename, data = npy_file
+    array = pread.PreadArray(filename, "r+")
+    value = np.random.uniform(size=data[key].shape).astype(np.float32)
+    array[key] = value
+    data[key] = value
+    array.close()
+    assert np.array_equal(np.load(str(filename)), data)
+
+
+def test_read_only(npy_file):
+    array = pread.PreadArray(npy_file[0])
+    with pytest.raises(ValueError):
+        array[0] = 1
+
+
+def test_dataset(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w", io_backend="pread")
+    data = np.arange(1000.0).reshape(100, 10)
+    dset = f.create_dataset("data", data=data)
+    assert isinstance(dset._data, pread.PreadArray)
+    assert dset.shape == (100, 10)
+    assert dset.dtype == np.float64
+    assert np.array_equal(dset[:], data)
+    assert np.array_equal(dset[5:7, 2], data[5:7, 2])
+
+    dset[10:20] = -1
+    dset[50, 3] = 7
+    data[10:20] = -1
+    data[50, 3] = 7
+    dset.append(np.ones((5, 10)))
+    data = np.concatenate([data, np.ones((5, 10))])
+    assert np.array_equal(dset[:], data)
+
+    scalar = f.create_dataset("scalar", data=2.5)
+    assert scalar.shape == ()
+    assert scalar[...] == 2.5
+    scalar[()] = 3.5
+    f.close()
+
+    f = exdir.File(setup_teardown_folder[1], mode="r")
+    assert np.array_equal(f["data"][:], data)
+    assert f["scalar"].data == 3.5
+    f.close()
+
+
+def test_packed_dataset(setup_teardown_folder):
+    f = exdir.File(
+        setup_teardown_folder[1], mode="w",
+        io_backend="pread", pack_threshold=1024
+    )
+    dset = f.create_dataset("small", data=np.arange(10))
+    assert isinstance(f["small"]._data, pread.PreadArray)
+    f["small"][3] = 30
+    assert np.array_equal(f["small"][2:5], [2, 30, 4])
+    assert not (f.directory / "small").exists()
+    f.close()
+
+
+def test_invalid_backend(setup_teardown_folder):
+    with pytest.raises(ValueError):
+        exdir.File(setup_teardown_folder[1], mode="w", io_backend="aio")
+
+
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="requires tmpfs at /dev/shm")
+def test_tmpfs():
+    directory = pathlib.Path(tempfile.mkdtemp(dir="/dev/shm"))
+    try:
+        f = exdir.File(directory / "test.exdir", mode="w", io_backend="pread")
+        data = np.random.uniform(size=(1000, 16))
+        f.create_dataset("data", data=data)
+        f.close()
+
+        f = exdir.File(directory / "test.exdir", mode="r", io_backend="pread")
+        assert np.array_equal(f["data"][100:200], data[100:200])
+        assert np.array_equal(f["data"][[5, 900]], data[[5, 900]])
+        f.close()
+    finally:
+        shutil.rmtree(str(directory))
+
+
+def test_slow_file_layer(setup_teardown_folder, monkeypatch):
+    """
+    Stand-in for a network file system where every request is slow:
+    reads are served with few large requests.
+    """
+    requests = []
+    read_into = pread._read_into
+
+    def slow_read_into(descriptor, buffer, offset):
+        time.sleep(0.001)
+        count = read_into(descriptor, buffer, offset)
+        requests.append((offset, count))
+        return count
+    monkeypatch.setattr(pread, "_read_into", slow_read_into)
+
+    f = exdir.File(setup_teardown_folder[1], mode="w", io_backend="pread")
+    data = np.random.uniform(size=(100000, 8))
+    f.create_dataset("data", data=data)
+    f.close()
+
+    f = exdir.File(setup_teardown_folder[1], mode="r", io_backend="pread")
+    dset = f["data"]
+    del requests[:]
+    assert np.array_equal(dset[:], data)
+    assert len(requests) == 1
+    assert requests[0][0] % pread.ALIGNMENT == 0
+
+    del requests[:]
+    assert np.array_equal(dset[1000:2000], data[1000:2000])
+    assert len(requests) == 1
+
+    # rows far apart are read one run at a time instead of everything between
+    del requests[:]
+    assert np.array_equal(dset[[0, 1, 99999]], data[[0, 1, 99999]])
+    assert len(requests) == 2
+    assert sum(count for offset, count in requests) <= 4 * pread.ALIGNMENT
+    f.close()
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Exdir, the Experimental Directory Structure.
+#
+# License: MIT, see "LICENSE" file for the full license terms.
+
+import pytest
+import numpy as np
+
+from exdir.core import File, RaggedDataset
+from exdir.core import npy
+
+
+def test_create_ragged(setup_teardown_file):
+    f = setup_teardown_file[3]
+    rows = [np.arange(3.0), np.arange(5.0), np.array([])]
+    ragged = f.create_ragged_dataset("spikes", data=rows)
+
+    assert isinstance(ragged, RaggedDataset)
+    assert len(ragged) == 3
+    assert ragged.dtype == np.float64
+    assert np.array_equal(ragged.offsets, [0, 3, 8, 8])
+    assert np.array_equal(ragged.lengths, [3, 5, 0])
+    assert (ragged.directory / "values.npy").exists()
+    assert (ragged.directory / "offsets.npy").exists()
+
+
+def test_create_empty_ragged(setup_teardown_file):
+    f = setup_teardown_file[3]
+    ragged = f.create_ragged_dataset("spikes", dtype=np.int32, row_shape=(4,))
+
+    assert len(ragged) == 0
+    assert ragged.dtype == np.int32
+    assert ragged.row_shape == (4,)
+    assert ragged[:] == []
+
+
+def test_ragged_row_access(setup_teardown_file):
+    f = setup_teardown_file[3]
+    rows = [np.arange(i) for i in range(10)]
+    ragged = f.create_ragged_dataset("spikes", data=rows)
+
+    for i, row in enumerate(rows):
+        assert np.array_equal(ragged[i], row)
+    assert np.array_equal(ragged[-1], rows[-1])
+
+    with pytest.raises(IndexError):
+        ragged[10]
+    with pytest.raises(IndexError):
+        ragged[-11]
+
+
+def test_ragged_gather(setup_teardown_file):
+    f = setup_teardown_file[3]
+    rows = [np.arange(i) * i for i in range(10)]
+    ragged = f.create_ragged_dataset("spikes", data=rows)
+
+    for result, expected in zip(ragged[2:5], rows[2:5]):
+        assert np.array_equal(result, expected)
+
+    indices = [7, 1, 7, -2]
+    result = ragged[indices]
+    assert len(result) == len(indices)
+    for value, index in zip(result, indices):
+        assert np.array_equal(value, rows[index])
+
+    mask = np.arange(10) % 3 == 0
+    result = ragged[mask]
+    assert len(result) == 4
+    for value, index in zip(result, [0, 3, 6, 9]):
+        assert np.array_equal(value, rows[index])
+
+    assert ragged[[]] == []
+
+
+def test_ragged_row_shape(setup_teardown_file):
+    f = setup_teardown_file[3]
+    rows = [np.ones((2, 3)), np.zeros((4, 3))]
+    ragged = f.create_ragged_dataset("waveforms", data=rows)
+
+    assert ragged.row_shape == (3,)
+    assert ragged[1].shape == (4, 3)
+
+    with pytest.raises(ValueError):
+        ragged.append(np.ones((2, 4)))
+
+
+def test_ragged_append(setup_teardown_file):
+    f = setup_teardown_file[3]
+    ragged = f.create_ragged_dataset("spikes", data=[[1, 2]])
+
+    ragged.append([3, 4, 5])
+    ragged.extend([[6], [], [7, 8]])
+
+    assert len(ragged) == 5
+    assert np.array_equal(ragged[1], [3, 4, 5])
+    assert np.array_equal(ragged[4], [7, 8])
+    assert np.array_equal(ragged.offsets, [0, 2, 5, 6, 6, 8])
+    assert [len(row) for row in ragged] == [2, 3, 1, 0, 2]
+
+
+def test_ragged_interrupted_extend(setup_teardown_file):
+    f = setup_teardown_file[3]
+    ragged = f.create_ragged_dataset("spikes", data=[[1, 2]])
+
+    # interrupted after the values were appended, before the offsets
+    npy.append(ragged.directory / "values.npy", np.array([9, 9]))
+    ragged._release_data()
+    assert len(ragged) == 1
+
+    ragged.append([3, 4])
+    assert np.array_equal(ragged[1], [3, 4])
+    assert np.array_equal(ragged.values, [1, 2, 3, 4])
+
+
+def test_ragged_append_many(setup_teardown_file):
+    f = setup_teardown_file[3]
+    ragged = f.create_ragged_dataset("spikes", dtype=np.int64)
+
+    for i in range(200):
+        ragged.append(np.arange(i))
+
+    assert len(ragged) == 200
+    assert np.array_equal(ragged[199], np.arange(199))
+
+
+def test_ragged_reopen(setup_teardown_folder):
+    f = File(setup_teardown_folder[1], "w")
+    grp = f.create_group("unit")
+    grp.create_ragged_dataset("spikes", data=[[1.0, 2.0], [3.0]])
+    f.close()
+
+    f = File(setup_teardown_folder[1], "r")
+    ragged = f["unit/spikes"]
+    assert isinstance(ragged, RaggedDataset)
+    assert np.array_equal(ragged[0], [1.0, 2.0])
+
+    with pytest.raises(IOError):
+        ragged.append([4.0])
+    f.close()
+
+
+def test_ragged_attrs(setup_teardown_file):
+    f = setup_teardown_file[3]
+    ragged = f.create_ragged_dataset("spikes", data=[[1.0]])
+    ragged.attrs["unit"] = "s"
+
+    assert f["spikes"].attrs["unit"] == "s"
+
+
+def test_ragged_exists(setup_teardown_file):
+    f = setup_teardown_file[3]
+    f.create_ragged_dataset("spikes", data=[[1.0]])
+
+    with pytest.raises(RuntimeError):
+        f.create_ragged_dataset("spikes", data=[[1.0]])
+
+
+def test_npy_append(tmpdir):
+    filename = str(tmpdir / "data.npy")
+    npy.write(filename, np.zeros(3))
+
+    npy.append(filename, np.ones(10**6))
+    npy.append(filename, np.ones(1))
+
+    data = np.load(filename)
+    assert data.shape == (10**6 + 4,)
+    assert np.sum(data) == 10**6 + 1
+
+
+def test_npy_append_header_overflow(tmpdir):
+    """Rewrite the file when the header has no room for the new shape."""
+    filename = str(tmpdir / "data.npy")
+    # find a field name that makes the header fill exactly 128 bytes
+    for length in range(1, 128):
+        dtype = np.dtype([("a" * length, np.int64)])
+        header = npy._header_bytes(dtype, (3,), (1, 0), size=128)
+        if header is not None and header.endswith(b"}\n"):
+            break
+    data = np.zeros(3, dtype=dtype)
+    with open(filename, "wb") as npy_file:
+        npy_file.write(header)
+        npy_file.write(data.tobytes())
+
+    npy.append(filename, np.ones(10, dtype=dtype))
+
+    result = np.load(filename)
+    assert result.shape == (13,)
+    assert np.array_equal(result["a" * length], [0] * 3 + [1] * 10)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Exdir, the Experimental Directory Structure.
+#
+# License: MIT, see "LICENSE" file for the full license terms.
+
+import pytest
+import numpy as np
+
+from exdir.core import File, SparseDataset
+
+
+def random_sparse(shape, density=0.05, seed=0):
+    random = np.random.RandomState(seed)
+    dense = random.uniform(size=shape)
+    dense[random.uniform(size=shape) > density] = 0
+    return dense
+
+
+def test_create_from_dense(setup_teardown_file):
+    f = setup_teardown_file[3]
+    dense = random_sparse((50, 40))
+    sparse = f.create_sparse_dataset("connectivity", data=dense)
+
+    assert isinstance(sparse, SparseDataset)
+    assert sparse.shape == (50, 40)
+    assert len(sparse) == 50
+    assert sparse.dtype == np.float64
+    assert sparse.nnz == np.count_nonzero(dense)
+    assert np.array_equal(sparse[:], dense)
+    for name in ["indptr.npy", "indices.npy", "values.npy"]:
+        assert (sparse.directory / name).exists()
+    assert not (sparse.directory / "data.npy").exists()
+
+
+def test_create_from_coordinates(setup_teardown_file):
+    f = setup_teardown_file[3]
+    values = np.array([1, 2, 3, 4], dtype=np.int32)
+    rows = [3, 0, 3, 0]
+    columns = [1, 2, 1, 0]
+    sparse = f.create_sparse_dataset("counts", data=(values, (rows, columns)), shape=(100000, 100000))
+
+    assert sparse.shape == (100000, 100000)
+    assert sparse.nnz == 3
+    assert sparse.dtype == np.int32
+    assert sparse[3, 1] == 4
+    assert sparse[0, 2] == 2
+    assert np.array_equal(sparse[0, :4], [4, 0, 2, 0])
+    assert sparse.directory.stat().st_size < 10**6
+
+
+def test_create_empty(setup_teardown_file):
+    f = setup_teardown_file[3]
+    sparse = f.create_sparse_dataset("empty", shape=(10, 5))
+
+    assert sparse.nnz == 0
+    assert sparse.dtype == np.float32
+    assert np.array_equal(sparse[:], np.zeros((10, 5)))
+
+    with pytest.raises(TypeError):
+        f.create_sparse_dataset("missing")
+    with pytest.raises(ValueError):
+        f.create_sparse_dataset("outside", data=([1.0], ([5], [0])), shape=(2, 2))
+    with pytest.raises(ValueError):
+        f.create_sparse_dataset("three", data=np.zeros((2, 2, 2)))
+
+
+def test_slicing(setup_teardown_file):
+    f = setup_teardown_file[3]
+    dense = random_sparse((60, 30), density=0.2)
+    sparse = f.create_sparse_dataset("connectivity", data=dense)
+
+    selections = [
+        (slice(10, 20), slice(None)),
+        (slice(None), slice(5, 9)),
+        (slice(3, 40, 3), slice(29, 0, -2)),
+        (dense[:, 0] > 0, slice(None)),
+        (7, slice(None)),
+        (slice(None), -1),
+    ]
+    for rows, columns in selections:
+        assert np.array_equal(sparse[rows, columns], dense[rows, columns])
+
+    # lists of rows and columns select the outer product, unlike NumPy
+    assert np.array_equal(sparse[[5, 1, 5], [2, 2, 0]], dense[np.ix_([5, 1, 5], [2, 2, 0])])
+    assert np.array_equal(sparse[4], dense[4])
+    assert sparse[-1, -1] == dense[-1, -1]
+
+    with pytest.raises(IndexError):
+        sparse[60]
+    with pytest.raises(IndexError):
+        sparse[0, 0, 0]
+
+
+def test_read_sparse_formats(setup_teardown_file):
+    scipy_sparse = pytest.importorskip("scipy.sparse")
+    f = setup_teardown_file[3]
+    dense = random_sparse((40, 40), density=0.1)
+    sparse = f.create_sparse_dataset("connectivity", data=scipy_sparse.csr_matrix(dense))
+
+    block = sparse.read(slice(5, 25), slice(10, 30), format="csr")
+    assert scipy_sparse.isspmatrix_csr(block)
+    assert np.array_equal(block.toarray(), dense[5:25, 10:30])
+
+    block = sparse.read(columns=[3, 1, 3], format="coo")
+    assert scipy_sparse.isspmatrix_coo(block)
+    assert np.array_equal(block.toarray(), dense[:, [3, 1, 3]])
+
+    with pytest.raises(ValueError):
+        sparse.read(format="dok")
+
+
+def test_reopen(setup_teardown_folder):
+    f = File(setup_teardown_folder[1], "w")
+    dense = random_sparse((20, 20))
+    f.create_sparse_dataset("group/connectivity", data=dense)
+    f.close()
+
+    f = File(setup_teardown_folder[1], "r")
+    sparse = f["group/connectivity"]
+    assert isinstance(sparse, SparseDataset)
+    assert sparse.shape == (20, 20)
+    assert np.array_equal(sparse[:], dense)
+    f.close()
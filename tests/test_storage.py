@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Exdir, the Experimental Directory Structure.
+#
+# License: MIT, see "LICENSE" file for the full license terms.
+
+import os
+import shutil
+import zipfile
+
+import pytest
+import numpy as np
+
+import exdir
+from exdir.core import storage
+
+
+@pytest.fixture(params=["posix", "memory"])
+def open_file(request, setup_teardown_folder):
+    """
+    Open the same File with a writable storage, as many times as needed.
+    """
+    if request.param == "posix":
+        file_storage = storage.POSIX
+    else:
+        file_storage = storage.MemoryStorage()
+
+    def open_file(mode="a"):
+        return exdir.File(setup_teardown_folder[1], mode=mode, storage=file_storage)
+    return open_file
+
+
+def write_objects(f):
+    grp = f.create_group("group")
+    grp.attrs["experiment"] = {"subject": "rat", "trials": 3}
+    dset = grp.create_dataset("data", data=np.arange(10.0))
+    dset.attrs["unit"] = "mV"
+    dset[2] = 7
+    dset.append([10.0, 11.0])
+    f.create_dataset("scalar", data=2.5)
+    f.create_dataset("zeros", shape=(2, 3), dtype=np.int16)
+    f.require_group("group/nested")
+    f.create_raw("raw")
+
+
+def test_round_trip(open_file):
+    f = open_file("w")
+    write_objects(f)
+    f.close()
+
+    f = open_file("r")
+    assert sorted(f) == ["group", "raw", "scalar", "zeros"]
+    assert sorted(f["group"]) == ["data", "nested"]
+    expected = np.arange(12.0)
+    expected[2] = 7
+    assert np.array_equal(f["group/data"][:], expected)
+    assert f["group/data"].attrs["unit"] == "mV"
+    assert f["group"].attrs["experiment"]["trials"] == 3
+    assert f["scalar"].data == 2.5
+    assert f["zeros"].dtype == np.int16
+    assert isinstance(f["raw"], exdir.core.Raw)
+    assert "group/nested" in f
+    assert "missing" not in f
+    f.close()
+
+    f = open_file("a")
+    f["scalar"].data = np.arange(3)
+    del f["group"]
+    assert sorted(f) == ["raw", "scalar", "zeros"]
+    f.close()
+
+    f = open_file("r")
+    assert np.array_equal(f["scalar"][:], np.arange(3))
+    f.close()
+
+
+def write_structured(f):
+    grp = f.create_group("structured")
+    spikes = grp.create_ragged_dataset("spikes", data=[[1.0, 2.0], [3.0]])
+    spikes.extend([[4.0, 5.0, 6.0], []])
+    tracking = grp.create_table("tracking", data={"t": np.arange(3.0), "x": np.arange(3)})
+    tracking.append({"t": [3.0, 4.0], "x": [30, 40]})
+    grp.create_sparse_dataset("connections", data=np.eye(4) * 2)
+
+
+def check_structured(f):
+    spikes = f["structured/spikes"]
+    assert len(spikes) == 4
+    assert np.array_equal(spikes[2], [4, 5, 6])
+    assert [len(row) for row in spikes[:]] == [2, 1, 3, 0]
+    tracking = f["structured/tracking"]
+    assert len(tracking) == 5
+    assert np.array_equal(tracking["x"], [0, 1, 2, 30, 40])
+    assert np.array_equal(tracking["t", -2:], [3, 4])
+    assert tracking[4] == {"t": 4.0, "x": 40}
+    connections = f["structured/connections"]
+    assert connections.nnz == 4
+    assert np.array_equal(connections[1:3, 1:3], [[2, 0], [0, 2]])
+
+
+def test_structured_round_trip(open_file):
+    f = open_file("w")
+    write_structured(f)
+    f.close()
+
+    f = open_file("r")
+    check_structured(f)
+    f.close()
+
+    f = open_file("a")
+    f["structured/spikes"].append([7.0])
+    f["structured/tracking"].append({"t": [5.0], "x": [50]})
+    f.close()
+
+    f = open_file("r")
+    assert np.array_equal(f["structured/spikes"][-1], [7])
+    assert np.array_equal(f["structured/tracking"]["x"][-2:], [40, 50])
+    f.close()
+
+
+def test_name_validation(open_file):
+    f = open_file("w")
+    f.create_group("group")
+    with pytest.raises(RuntimeError):
+        f.create_group("GROUP")
+    with pytest.raises(RuntimeError):
+        f.create_group("group")
+    f.close()
+
+
+def test_memory_storage_writes_nothing(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], storage="memory")
+    write_objects(f)
+    assert np.array_equal(f["group/data"][:3], [0, 1, 7])
+    f.close()
+    assert os.listdir(str(setup_teardown_folder[0])) == []
+
+
+def test_memory_storage_views(setup_teardown_folder):
+    memory = storage.MemoryStorage()
+    f = exdir.File(setup_teardown_folder[1], storage=memory)
+    data = f.create_dataset("data", data=np.zeros(4))
+    data[:][1] = 5
+    f.close()
+    f = exdir.File(setup_teardown_folder[1], mode="r", storage=memory)
+    assert np.array_equal(f["data"][:], [0, 5, 0, 0])
+    with pytest.raises(ValueError):
+        f["data"]._data[0] = 1
+    f.close()
+
+
+def test_memory_storage_limits(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], storage="memory")
+    with pytest.raises(NotImplementedError):
+        f.create_dataset("times", data=np.arange(10)).build_index()
+    with pytest.raises(ValueError):
+        exdir.File(setup_teardown_folder[1], storage="memory", pack_threshold=1024)
+    with pytest.raises(ValueError):
+        exdir.File(setup_teardown_folder[1], storage="memory", io_backend="pread")
+    with pytest.raises(ValueError):
+        exdir.File(setup_teardown_folder[1], storage="disk")
+    f.close()
+
+
+@pytest.fixture
+def archived_file(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w")
+    write_objects(f)
+    write_structured(f)
+    f["group/data"].build_index(step=4)
+    f.close()
+    return setup_teardown_folder
+
+
+def zip_folder(folder, archive, compression, prefix):
+    with zipfile.ZipFile(str(archive), "w", compression) as zip_file:
+        for root, directories, filenames in os.walk(str(folder)):
+            for filename in directories + filenames:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, str(folder))
+                if prefix:
+                    name = os.path.join(folder.name, name)
+                zip_file.write(path, name)
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+@pytest.mark.parametrize("prefix", [False, True])
+def test_zip_storage(archived_file, compression, prefix):
+    archive = archived_file[0] / "session.zip"
+    zip_folder(archived_file[1], archive, compression, prefix)
+    shutil.rmtree(str(archived_file[1]))
+
+    f = exdir.File(archive)
+    assert f.user_mode == "r"
+    assert sorted(f) == ["group", "raw", "scalar", "structured", "zeros"]
+    data = f["group/data"]
+    assert data.attrs["unit"] == "mV"
+    assert np.array_equal(data[:3], [0, 1, 7])
+    assert f["scalar"].data == 2.5
+    assert f["zeros"].shape == (2, 3)
+    # the index is not read from the archive, but searching still works
+    assert np.array_equal(data.time_slice(3.5, 6.5), [4, 5, 6])
+    if compression == zipfile.ZIP_STORED:
+        assert isinstance(data._data, np.memmap)
+    check_structured(f)
+    with pytest.raises(IOError):
+        f.create_group("new")
+    with pytest.raises(IOError):
+        f["structured/spikes"].append([7.0])
+    with pytest.raises(IOError):
+        f["structured/tracking"].append({"t": [5.0], "x": [50]})
+    f.close()
+
+    with pytest.raises(ValueError):
+        exdir.File(archive, mode="a")
+
+
+def test_storage_path(setup_teardown_folder):
+    memory = storage.MemoryStorage()
+    memory.mkdir(setup_teardown_folder[0] / "a" / "b")
+    path = memory.path(setup_teardown_folder[0]) / "a"
+    assert path.exists()
+    assert path.listdir() == ["b"]
+    assert not (path / "c").exists()
+    with memory.open(setup_teardown_folder[0] / "a" / "text", "w") as text_file:
+        text_file.write("hello")
+    with memory.open(setup_teardown_folder[0] / "a" / "text", "a") as text_file:
+        text_file.write(" world")
+    with memory.open(setup_teardown_folder[0] / "a" / "text") as text_file:
+        assert text_file.read() == "hello world"
+    assert sorted(memory.subdirectories(setup_teardown_folder[0] / "a")) == ["b"]
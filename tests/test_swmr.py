@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Exdir, the Experimental Directory Structure.
+#
+# License: MIT, see "LICENSE" file for the full license terms.
+
+import multiprocessing
+import time
+
+import numpy as np
+import pytest
+
+import exdir
+
+try:
+    fork = multiprocessing.get_context("fork")
+except ValueError:
+    fork = None
+
+needs_fork = pytest.mark.skipif(fork is None, reason="needs the fork start method")
+
+ROW = np.arange(1000)
+
+
+def append_rows(directory, count):
+    f = exdir.File(directory, mode="a", swmr=True)
+    log = f["log"]
+    for index in range(count):
+        # every value of a row is its index, so partial rows show
+        log.append((index + ROW * 0)[np.newaxis])
+    f.close()
+
+
+@needs_fork
+@pytest.mark.parametrize("io_backend", ["mmap", "pread"])
+def test_reader_sees_committed_rows(setup_teardown_folder, io_backend):
+    f = exdir.File(setup_teardown_folder[1], mode="w", swmr=True)
+    f.create_dataset("log", data=np.zeros((0, len(ROW)), dtype=int))
+    f.close()
+
+    writer = fork.Process(target=append_rows, args=(str(setup_teardown_folder[1]), 100))
+    reader = exdir.File(
+        setup_teardown_folder[1], mode="r", swmr=True, io_backend=io_backend,
+        cache_size=1 << 20
+    )
+    log = reader["log"]
+    assert log.shape == (0, len(ROW))
+    writer.start()
+    lengths = []
+    deadline = time.monotonic() + 60
+    while writer.is_alive() or log.shape[0] < 100:
+        assert time.monotonic() < deadline
+        log.refresh()
+        rows = log[:]
+        lengths.append(len(rows))
+        # only complete rows, in order
+        assert np.all(rows == np.arange(len(rows))[:, np.newaxis])
+    writer.join(60)
+    assert writer.exitcode == 0
+    assert lengths == sorted(lengths)
+    assert log.shape == (100, len(ROW))
+    assert not log.refresh()
+    reader.close()
+
+
+def test_refresh(setup_teardown_folder):
+    writer = exdir.File(setup_teardown_folder[1], mode="w", swmr=True)
+    writer.create_dataset("data", data=np.arange(10))
+    reader = exdir.File(setup_teardown_folder[1], mode="r", swmr=True)
+    data = reader["data"]
+    values = data[:]
+    assert not data.refresh()
+
+    writer["data"].append([10, 11])
+    assert data.shape == (10,)
+    assert data.refresh()
+    assert np.array_equal(data[:], np.arange(12))
+    assert np.array_equal(values, np.arange(10))
+
+    # replaced, not overwritten, so arrays read before are unchanged
+    writer["data"].data = np.arange(5) * 2
+    assert np.array_equal(values, np.arange(10))
+    assert data.refresh()
+    assert np.array_equal(data[:], np.arange(5) * 2)
+    reader.close()
+    writer.close()
+
+
+def test_refresh_interval(setup_teardown_folder):
+    writer = exdir.File(setup_teardown_folder[1], mode="w", swmr=True)
+    writer.create_dataset("data", data=np.arange(10))
+    reader = exdir.File(setup_teardown_folder[1], mode="r", swmr=True, refresh_interval=0)
+    data = reader["data"]
+    assert data.shape == (10,)
+    writer["data"].append([10])
+    assert data.shape == (11,)
+    reader.close()
+    writer.close()
+
+    with pytest.raises(ValueError):
+        exdir.File(setup_teardown_folder[1], mode="r", refresh_interval=1)
+    with pytest.raises(ValueError):
+        exdir.File(setup_teardown_folder[1], mode="r", swmr=True, storage="memory")
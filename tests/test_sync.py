@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Exdir, the Experimental Directory Structure.
+#
+# License: MIT, see "LICENSE" file for the full license terms.
+
+import os
+import time
+
+import pytest
+import numpy as np
+
+import exdir
+
+
+def write_objects(f):
+    grp = f.create_group("group")
+    dset = grp.create_dataset("data", data=np.arange(10))
+    dset.attrs["unit"] = "mV"
+    dset[2] = 7
+    return dset
+
+
+def test_invalid_mode(setup_teardown_folder):
+    with pytest.raises(ValueError):
+        exdir.File(setup_teardown_folder[1], mode="w", sync="sometimes")
+
+
+@pytest.mark.parametrize("options", [{}, {"sync": "none"}])
+def test_none(setup_teardown_folder, fsynced, monkeypatch, options):
+    flushed = []
+    original = np.memmap.flush
+
+    def flush(memmap):
+        flushed.append(memmap.filename)
+        original(memmap)
+    monkeypatch.setattr(np.memmap, "flush", flush)
+
+    f = exdir.File(setup_teardown_folder[1], mode="w", **options)
+    assert f._syncer.mode == "none"
+    dset = write_objects(f)
+    assert flushed == []
+    f.close()
+    assert fsynced == []
+    # memory maps are flushed on close like before sync modes existed
+    assert flushed == [str(dset.directory / "data.npy")]
+
+
+def test_close(setup_teardown_folder, fsynced):
+    f = exdir.File(setup_teardown_folder[1], mode="w", sync="close")
+    dset = write_objects(f)
+    assert fsynced == []
+    f.close()
+
+    assert str(dset.directory / "data.npy") in fsynced
+    assert str(dset.directory / "attributes.yaml") in fsynced
+    assert str(dset.directory / "exdir.yaml") in fsynced
+    # folders are synced after the files they contain
+    assert fsynced.index(str(dset.directory)) > fsynced.index(str(dset.directory / "data.npy"))
+    assert str(dset.directory.parent) in fsynced
+
+
+def test_always(setup_teardown_folder, fsynced):
+    f = exdir.File(setup_teardown_folder[1], mode="w", sync="always")
+    grp = f.create_group("group")
+    assert str(grp.directory / "exdir.yaml") in fsynced
+    assert str(grp.directory) in fsynced
+    assert str(f.directory) in fsynced
+
+    dset = grp.create_dataset("data", data=np.arange(10))
+    assert str(dset.directory / "data.npy") in fsynced
+
+    del fsynced[:]
+    dset.attrs["unit"] = "mV"
+    assert fsynced == [str(dset.directory / "attributes.yaml"), str(dset.directory)]
+
+    # attributes are replaced atomically, which changes the folder as well
+    del fsynced[:]
+    dset.attrs["unit"] = "V"
+    assert fsynced == [str(dset.directory / "attributes.yaml"), str(dset.directory)]
+    f.close()
+    assert fsynced == [str(dset.directory / "attributes.yaml"), str(dset.directory)]
+
+
+def test_batch(setup_teardown_folder, fsynced):
+    f = exdir.File(setup_teardown_folder[1], mode="w", sync="batch", sync_interval=0.01)
+    dset = write_objects(f)
+    deadline = time.time() + 5
+    while str(dset.directory / "data.npy") not in fsynced and time.time() < deadline:
+        time.sleep(0.01)
+    assert str(dset.directory / "data.npy") in fsynced
+    assert f._syncer._thread.is_alive()
+
+    thread = f._syncer._thread
+    dset.attrs["channel"] = 2
+    f.close()
+    assert not thread.is_alive()
+    assert str(dset.directory / "attributes.yaml") in fsynced
+
+    f = exdir.File(setup_teardown_folder[1], mode="r")
+    assert f["group/data"][2] == 7
+    assert f["group/data"].attrs["channel"] == 2
+    f.close()
+
+
+def test_removed_paths_are_ignored(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w", sync="close")
+    f.create_dataset("data", data=np.arange(10))
+    del f["data"]
+    f.close()
+    assert not os.path.exists(str(setup_teardown_folder[1] / "data"))
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Exdir, the Experimental Directory Structure.
+#
+# License: MIT, see "LICENSE" file for the full license terms.
+
+import pytest
+import numpy as np
+
+from exdir.core import File, Table
+from exdir.core import npy
+
+
+def tracking():
+    t = np.linspace(0, 1, 11)
+    return {"t": t, "x": np.sin(t), "y": np.cos(t)}
+
+
+def test_create_table(setup_teardown_file):
+    f = setup_teardown_file[3]
+    table = f.create_table("tracking", data=tracking())
+
+    assert isinstance(table, Table)
+    assert table.columns == ["t", "x", "y"]
+    assert len(table) == 11
+    assert table.dtypes["t"] == np.float64
+    for name in ["t", "x", "y"]:
+        assert (table.directory / (name + ".npy")).exists()
+
+
+def test_create_table_structured(setup_teardown_file):
+    f = setup_teardown_file[3]
+    data = np.zeros(5, dtype=[("t", np.float64), ("led", np.int8, (2,))])
+    data["led"][:, 1] = 1
+    table = f.create_table("tracking", data=data)
+
+    assert table.columns == ["t", "led"]
+    assert table["led"].shape == (5, 2)
+    assert np.all(table["led"][:, 1] == 1)
+
+
+def test_create_empty_table(setup_teardown_file):
+    f = setup_teardown_file[3]
+    table = f.create_table("tracking", dtype=[("t", np.float64), ("x", np.float32)])
+
+    assert len(table) == 0
+    assert table.dtypes == {"t": np.float64, "x": np.float32}
+
+
+def test_create_table_errors(setup_teardown_file):
+    f = setup_teardown_file[3]
+
+    with pytest.raises(TypeError):
+        f.create_table("a")
+    with pytest.raises(ValueError):
+        f.create_table("b", data={"t": np.arange(3), "x": np.arange(4)})
+
+
+def test_table_projection(setup_teardown_file):
+    f = setup_teardown_file[3]
+    data = tracking()
+    table = f.create_table("tracking", data=data)
+
+    assert np.array_equal(table["x"], data["x"])
+    assert np.array_equal(table["x", 2:4], data["x"][2:4])
+
+    result = table[["t", "y"]]
+    assert list(result.keys()) == ["t", "y"]
+    assert np.array_equal(result["y"], data["y"])
+
+    with pytest.raises(KeyError):
+        table["z"]
+
+
+def test_table_rows(setup_teardown_file):
+    f = setup_teardown_file[3]
+    data = tracking()
+    table = f.create_table("tracking", data=data)
+
+    result = table[3:7]
+    assert list(result.keys()) == ["t", "x", "y"]
+    for name in data:
+        assert np.array_equal(result[name], data[name][3:7])
+
+    result = table[["t", "x"], [0, 10]]
+    assert np.array_equal(result["x"], data["x"][[0, 10]])
+
+    result = table.read(columns=["y"], rows=5)
+    assert result["y"] == data["y"][5]
+
+
+def test_table_append(setup_teardown_file):
+    f = setup_teardown_file[3]
+    data = tracking()
+    table = f.create_table("tracking", data=data)
+
+    table.append({"t": [2.0, 3.0], "x": [0.5, 0.6], "y": [0.1, 0.2]})
+
+    assert len(table) == 13
+    assert np.array_equal(table["t"][-2:], [2.0, 3.0])
+    assert len(f["tracking"]) == 13
+
+    with pytest.raises(ValueError):
+        table.append({"t": [4.0]})
+    with pytest.raises(ValueError):
+        table.append({"t": [4.0], "x": [1.0, 2.0], "y": [3.0]})
+    with pytest.raises(ValueError):
+        table.append({})
+    with pytest.raises(ValueError):
+        table.append(np.zeros(2, dtype=[("t", float)]))
+    assert len(table) == 13
+    assert len(table["t"]) == 13
+
+
+def test_table_incomplete_append(setup_teardown_file):
+    """Rows from an append that was not committed are never visible."""
+    f = setup_teardown_file[3]
+    table = f.create_table("tracking", data={"t": [0.0, 1.0], "x": [5.0, 6.0]})
+
+    # simulate a writer that crashed after writing only one column
+    npy.append(table.directory / "t.npy", [2.0])
+
+    table = f["tracking"]
+    assert len(table) == 2
+    assert np.array_equal(table["t"], [0.0, 1.0])
+
+    table.append({"t": [3.0], "x": [7.0]})
+    assert np.array_equal(table["t"], [0.0, 1.0, 3.0])
+    assert np.array_equal(table["x"], [5.0, 6.0, 7.0])
+
+
+def test_table_reopen(setup_teardown_folder):
+    f = File(setup_teardown_folder[1], "w")
+    f.create_table("session/tracking", data=tracking())
+    f.close()
+
+    f = File(setup_teardown_folder[1], "r")
+    table = f["session"]["tracking"]
+    assert isinstance(table, Table)
+    assert "x" in table
+    assert list(table) == ["t", "x", "y"]
+
+    with pytest.raises(IOError):
+        table.append(tracking())
+    f.close()
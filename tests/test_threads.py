@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Exdir, the Experimental Directory Structure.
+#
+# License: MIT, see "LICENSE" file for the full license terms.
+
+import threading
+
+import numpy as np
+import pytest
+
+import exdir
+
+
+def run_threads(target, count):
+    errors = []
+
+    def run(worker):
+        try:
+            target(worker)
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=run, args=(worker,)) for worker in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(60)
+        assert not thread.is_alive()
+    if len(errors) > 0:
+        raise errors[0]
+
+
+def test_attribute_updates(setup_teardown_file):
+    f = setup_teardown_file[3]
+    group = f.create_group("group")
+
+    def update(worker):
+        for index in range(10):
+            group.attrs["worker{}_{}".format(worker, index)] = index
+
+    run_threads(update, 8)
+
+    attrs = group.attrs.to_dict()
+    assert len(attrs) == 8 * 10
+    for worker in range(8):
+        for index in range(10):
+            assert attrs["worker{}_{}".format(worker, index)] == index
+
+
+def test_create_objects(setup_teardown_file):
+    f = setup_teardown_file[3]
+    created = []
+
+    def create(worker):
+        for index in range(20):
+            try:
+                f.create_group("group{}".format(index))
+                created.append(index)
+            except (RuntimeError, OSError):
+                # created by another thread
+                pass
+            f.require_group("shared{}".format(index))
+            f.require_dataset("dataset{}".format(index), data=np.arange(10))
+
+    run_threads(create, 8)
+
+    assert sorted(created) == list(range(20))
+    assert sorted(f) == sorted(
+        ["group{}".format(index) for index in range(20)] +
+        ["shared{}".format(index) for index in range(20)] +
+        ["dataset{}".format(index) for index in range(20)]
+    )
+
+
+@pytest.mark.parametrize("io_backend", ["mmap", "pread"])
+def test_mixed_reads_and_writes(setup_teardown_folder, io_backend):
+    # few open maps, so datasets are evicted while other threads use them
+    f = exdir.File(setup_teardown_folder[1], max_open_maps=2, io_backend=io_backend)
+    datasets = [
+        f.create_dataset("dataset{}".format(index), data=np.zeros((100, 10)))
+        for index in range(6)
+    ]
+    log = f.create_dataset("log", data=np.zeros((0, 2)))
+
+    def work(worker):
+        for iteration in range(12):
+            dataset = datasets[(worker + iteration) % len(datasets)]
+            # each worker writes its own rows
+            dataset[worker * 10:(worker + 1) * 10] = iteration
+            assert np.all(dataset[worker * 10:(worker + 1) * 10] == iteration)
+            dataset.attrs["worker{}".format(worker)] = iteration
+            log.append([[worker, iteration]])
+            np.asarray(datasets[iteration % len(datasets)][:])
+
+    run_threads(work, 8)
+
+    rows = log[:]
+    assert len(rows) == 8 * 12
+    for worker in range(8):
+        assert sorted(rows[rows[:, 0] == worker, 1]) == list(range(12))
+    for worker in range(8):
+        iteration = 11
+        dataset = datasets[(worker + iteration) % len(datasets)]
+        assert np.all(dataset[worker * 10:(worker + 1) * 10] == iteration)
+    for dataset in datasets:
+        # every worker writes to every dataset
+        assert len(dataset.attrs) == 8
+    f.close()
+
+
+@pytest.mark.parametrize("io_backend", ["mmap", "pread"])
+def test_column_writes(setup_teardown_folder, io_backend):
+    f = exdir.File(setup_teardown_folder[1], io_backend=io_backend)
+    dataset = f.create_dataset("data", data=np.zeros((2000, 8)))
+
+    def write(worker):
+        # each worker writes its own column, which shares rows with the
+        # columns of the other workers
+        for start in range(0, 2000, 20):
+            dataset[start:start + 20, worker] = np.arange(start, start + 20) + worker
+
+    run_threads(write, 8)
+
+    expected = np.arange(2000)[:, np.newaxis] + np.arange(8)
+    assert np.array_equal(dataset[:], expected)
+    f.close()
+
+
+def test_packed_datasets(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], pack_threshold=1024)
+    group = f.create_group("group")
+    for index in range(8):
+        group.create_dataset("small{}".format(index), data=np.arange(10))
+
+    def work(worker):
+        dataset = group["small{}".format(worker)]
+        # moves the dataset out of the pack
+        dataset.attrs["worker"] = worker
+        dataset[:] = worker
+        group.create_dataset("new{}".format(worker), data=np.arange(worker))
+
+    run_threads(work, 8)
+
+    for worker in range(8):
+        dataset = group["small{}".format(worker)]
+        assert dataset.attrs["worker"] == worker
+        assert np.all(dataset[:] == worker)
+        assert np.all(group["new{}".format(worker)][:] == np.arange(worker))
+    f.close()
+
+
+def test_structured_datasets(setup_teardown_folder):
+    # few open maps, so objects are evicted while other threads use them
+    f = exdir.File(setup_teardown_folder[1], max_open_maps=2)
+    spikes = f.create_ragged_dataset("spikes", data=[[0.0]], dtype=np.float64)
+    tracking = f.create_table("tracking", data={"worker": [-1], "index": [-1]})
+    connections = f.create_sparse_dataset("connections", data=np.eye(20))
+
+    def work(worker):
+        for index in range(20):
+            spikes.append(np.full(index + 1, worker, dtype=np.float64))
+            tracking.append({"worker": [worker], "index": [index]})
+            # every row is complete, also while other threads append
+            for row in spikes[-5:]:
+                assert np.all(row == row[0])
+            rows = tracking.read(["worker", "index"], slice(-5, None))
+            assert len(rows["worker"]) == len(rows["index"])
+            assert np.array_equal(connections[index], np.eye(20)[index])
+            assert connections.nnz == 20
+
+    run_threads(work, 8)
+
+    assert len(spikes) == 1 + 8 * 20
+    assert len(tracking) == 1 + 8 * 20
+    rows = tracking[1:]
+    for worker in range(8):
+        assert sorted(rows["index"][rows["worker"] == worker]) == list(range(20))
+        lengths = [len(row) for row in spikes[1:] if row[0] == worker]
+        assert sorted(lengths) == list(range(1, 21))
+    f.close()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Exdir, the Experimental Directory Structure.
+#
+# License: MIT, see "LICENSE" file for the full license terms.
+
+import os
+
+import numpy as np
+import pytest
+
+import exdir
+from exdir.core import constants
+
+
+def staging_folders(directory):
+    return [
+        name for name in os.listdir(str(directory))
+        if name.startswith(constants.STAGING_PREFIX)
+    ]
+
+
+def test_commit(setup_teardown_file):
+    f = setup_teardown_file[3]
+    with f.transaction("session") as session:
+        session.create_dataset("lfp", data=np.arange(10))
+        session.create_group("spikes").attrs["unit"] = "s"
+        session.attrs["rat"] = "Ola"
+        # invisible until the transaction is committed
+        assert "session" not in f
+        assert list(f) == []
+        assert len(staging_folders(f.directory)) == 1
+
+    assert list(f) == ["session"]
+    assert staging_folders(f.directory) == []
+    assert np.array_equal(f["session"]["lfp"][:], np.arange(10))
+    assert f["session"]["spikes"].attrs["unit"] == "s"
+    assert f["session"].attrs["rat"] == "Ola"
+
+    with f.transaction("group/session") as session:
+        session.create_group("nested")
+    assert "nested" in f["group"]["session"]
+
+
+def test_rollback(setup_teardown_file):
+    f = setup_teardown_file[3]
+    with pytest.raises(KeyError):
+        with f.transaction("session") as session:
+            session.create_dataset("lfp", data=np.arange(10))
+            raise KeyError("failed")
+    assert "session" not in f
+    assert staging_folders(f.directory) == []
+
+
+def test_conflicts(setup_teardown_file):
+    f = setup_teardown_file[3]
+    f.create_group("existing")
+    with pytest.raises(FileExistsError):
+        with f.transaction("existing"):
+            pass
+
+    with pytest.raises(FileExistsError):
+        with f.transaction("session") as session:
+            session.create_group("group")
+            f.create_group("session")
+    assert list(f["session"]) == []
+    assert staging_folders(f.directory) == []
+
+
+def test_sync_once(setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], sync="always")
+    syncs = f._syncer.syncs
+    with f.transaction("session") as session:
+        for index in range(10):
+            session.attrs["key{}".format(index)] = index
+        session.create_dataset("data", data=np.arange(10))
+        assert f._syncer.syncs == syncs
+    # the staged files, then the new entry of the group
+    assert f._syncer.syncs == syncs + 2
+    assert len(f["session"].attrs) == 10
+    f.close()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Exdir, the Experimental Directory Structure.
+#
+# License: MIT, see "LICENSE" file for the full license terms.
+
+import time
+
+import numpy as np
+import pytest
+
+import exdir
+from exdir.core import watcher as watcher_module
+
+backends = ["poll"]
+if watcher_module._inotify_functions is not None:
+    backends.insert(0, "inotify")
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, event):
+        self.events.append(event)
+
+    def wait(self, *expected):
+        """
+        Wait until the expected events have been reported and return all
+        events reported so far.
+        """
+        deadline = time.monotonic() + 10
+        while not all(event in self.events for event in expected):
+            assert time.monotonic() < deadline, self.events
+            time.sleep(0.01)
+        events = self.events
+        self.events = []
+        return events
+
+
+def start(obj, backend):
+    recorder = Recorder()
+    watcher = exdir.watch(obj, recorder, debounce=0.02, interval=0.02, backend=backend)
+    assert watcher.backend == backend
+    return watcher, recorder
+
+
+@pytest.mark.parametrize("backend", backends)
+def test_objects(setup_teardown_file, backend):
+    f = setup_teardown_file[3]
+    f.create_group("existing")
+    watcher, recorder = start(f, backend)
+
+    group = f.create_group("session")
+    dataset = group.create_dataset("lfp", data=np.arange(10))
+    events = recorder.wait(
+        watcher_module.Event("created", "/session", False),
+        watcher_module.Event("created", "/session/lfp", False)
+    )
+    # the existing group is not reported
+    assert len(events) == 2
+    assert events.index(("created", "/session", False)) < events.index(("created", "/session/lfp", False))
+
+    dataset.append([10, 11])
+    recorder.wait(watcher_module.Event("modified", "/session/lfp", False))
+
+    group.attrs["quality"] = "good"
+    events = recorder.wait(watcher_module.Event("modified", "/session", True))
+    assert events == [("modified", "/session", True)]
+
+    del f["session"]
+    events = recorder.wait(
+        watcher_module.Event("deleted", "/session/lfp", False),
+        watcher_module.Event("deleted", "/session", False)
+    )
+    assert len(events) == 2
+    watcher.close()
+
+
+@pytest.mark.parametrize("backend", backends)
+def test_group(setup_teardown_folder, backend):
+    f = exdir.File(setup_teardown_folder[1], pack_threshold=1024)
+    group = f.create_group("group")
+    watcher, recorder = start(group, backend)
+
+    f.create_group("other")
+    group.create_dataset("packed", data=np.arange(3))
+    group.create_group("raw_parent").create_raw("raw")
+    events = recorder.wait(
+        watcher_module.Event("created", "/group/packed", False),
+        watcher_module.Event("created", "/group/raw_parent", False)
+    )
+    # objects outside the group and raw folders are not reported
+    assert len(events) == 2
+
+    del group["packed"]
+    recorder.wait(watcher_module.Event("deleted", "/group/packed", False))
+    watcher.close()
+    f.close()
+
+
+def test_callback_error(setup_teardown_file):
+    f = setup_teardown_file[3]
+
+    def fail(event):
+        raise KeyError(event.name)
+
+    watcher = exdir.watch(f, fail, debounce=0.01, interval=0.01)
+    f.create_group("group")
+    deadline = time.monotonic() + 10
+    while watcher._thread.is_alive():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    with pytest.raises(KeyError):
+        watcher.close()
+
+    with pytest.raises(ValueError):
+        exdir.watch(f, fail, backend="unknown")
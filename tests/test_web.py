@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Exdir, the Experimental Directory Structure.
+#
+# License: MIT, see "LICENSE" file for the full license terms.
+
+import functools
+import http.server
+import os
+import threading
+
+import pytest
+import numpy as np
+
+import exdir
+from exdir.core import web
+
+
+class StaticHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    A static web server with support for single byte ranges, which
+    records the ranges of the requests.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def list_directory(self, path):
+        if not self.server.listings:
+            self.send_error(403)
+            return None
+        return super().list_directory(path)
+
+    def do_GET(self):
+        byte_range = self.headers.get("range")
+        with self.server.lock:
+            self.server.requests.append((self.command, self.path, byte_range))
+        path = self.translate_path(self.path)
+        if byte_range is None or not os.path.isfile(path):
+            return super().do_GET()
+        start, stop = (int(value) for value in byte_range[len("bytes="):].split("-"))
+        with open(path, "rb") as f:
+            f.seek(start)
+            body = f.read(stop + 1 - start)
+        self.send_response(206)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        with self.server.lock:
+            self.server.requests.append((self.command, self.path, None))
+        return super().do_HEAD()
+
+
+@pytest.fixture(params=[True, False], ids=["listings", "no-listings"])
+def server(request, setup_teardown_folder):
+    f = exdir.File(setup_teardown_folder[1], mode="w")
+    grp = f.create_group("group")
+    grp.attrs["subject"] = "rat"
+    dset = grp.create_dataset("data", data=np.arange(40000, dtype=np.int32).reshape(10000, 4))
+    dset.attrs["unit"] = "mV"
+    grp.create_ragged_dataset("spikes", data=[[1, 2], [3], [4, 5, 6]])
+    grp.create_table("tracking", data={"t": np.arange(100.0), "x": np.arange(100)})
+    grp.create_sparse_dataset("connections", data=np.eye(50))
+    f.create_dataset("scalar", data=2.5)
+    # a NumPy header longer than the bytes fetched to parse it
+    wide = np.zeros(3, dtype=[("channel_{:03d}".format(i), np.float32) for i in range(300)])
+    wide["channel_299"] = [1, 2, 3]
+    f.create_dataset("wide", data=wide)
+    raw = f.create_raw("raw")
+    with open(str(raw.directory / "notes.txt"), "w") as notes:
+        notes.write("notes")
+    f.close()
+
+    handler = functools.partial(StaticHandler, directory=str(setup_teardown_folder[0]))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    server.listings = request.param
+    server.requests = []
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = "http://127.0.0.1:{}".format(server.server_address[1])
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def range_requests(server):
+    return [request for request in server.requests if request[2] is not None]
+
+
+def test_read(server):
+    f = exdir.File(server.url + "/test.exdir")
+    assert isinstance(f._storage, web.WebStorage)
+    assert f.user_mode == "r"
+    assert f["group"].attrs["subject"] == "rat"
+    data = f["group/data"]
+    assert data.attrs["unit"] == "mV"
+    assert data.shape == (10000, 4)
+    assert np.array_equal(data[5000:5002, 1], [20001, 20005])
+    assert f["scalar"].data == 2.5
+    assert np.array_equal(f["wide"]["channel_299"], [1, 2, 3])
+    assert np.array_equal(f["group/spikes"][2], [4, 5, 6])
+    assert np.array_equal(f["group/tracking"]["x", 10:13], [10, 11, 12])
+    assert np.array_equal(f["group/connections"][3, :5], [0, 0, 0, 1, 0])
+    with pytest.raises(IOError):
+        f["group/spikes"].append([7])
+    assert "group" in f
+    assert "missing" not in f
+    assert "group/missing" not in f
+    with pytest.raises(IOError):
+        f.create_group("new")
+    if server.listings:
+        assert sorted(f) == ["group", "raw", "scalar", "wide"]
+        assert isinstance(f["raw"], exdir.core.Raw)
+    else:
+        with pytest.raises(IOError):
+            list(f)
+    # connections are reused between requests
+    assert f._storage._pool.connections < f._storage._pool.requests
+    f.close()
+
+
+def test_range_requests(server):
+    store = web.WebStorage(server.url)
+    f = exdir.File("test.exdir", storage=store)
+    data = f["group/data"]
+    data[0]
+    server.requests = []
+    assert np.array_equal(data[[100, 1100, 2100], 0], [400, 4400, 8400])
+    # the rows are close enough to be read with one request
+    assert len(range_requests(server)) == 1
+    f.close()
+
+    store = web.WebStorage(server.url, coalesce_bytes=0)
+    f = exdir.File("test.exdir", storage=store)
+    data = f["group/data"]
+    data[0]
+    server.requests = []
+    assert np.array_equal(data[[100, 1100, 2100], 0], [400, 4400, 8400])
+    assert len(range_requests(server)) == 3
+    f.close()
+
+
+def test_disk_cache(server, setup_teardown_folder):
+    cache_directory = setup_teardown_folder[0] / "cache"
+    for attempt in range(2):
+        store = web.WebStorage(server.url, cache_directory=cache_directory)
+        f = exdir.File("test.exdir", storage=store)
+        server.requests = []
+        assert np.array_equal(f["group/data"][-1], [39996, 39997, 39998, 39999])
+        f.close()
+        if attempt == 1:
+            # only the HEAD requests that validate the cache are sent
+            assert all(request[0] == "HEAD" for request in server.requests)